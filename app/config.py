@@ -11,15 +11,132 @@ ALLOWED_ORIGINS = [
     "http://127.0.0.1:3000",
 ]
 
-# Database
+# Database (checked when the pool is first opened, so the app imports without it)
 DATABASE_URL = os.getenv("DATABASE_URL")
-if not DATABASE_URL:
-    raise ValueError("DATABASE_URL is not set in environment variables")
+# Apply pending migrations from the lifespan; disable when deployments run
+# `python -m app.migrations` as a release step instead.
+RUN_MIGRATIONS_ON_STARTUP = os.getenv("RUN_MIGRATIONS_ON_STARTUP", "true").lower() in ("1", "true", "yes")
+
+# Connection pool
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "1"))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+DB_POOL_MAX_IDLE = float(os.getenv("DB_POOL_MAX_IDLE", "300"))
+DB_POOL_MAX_LIFETIME = float(os.getenv("DB_POOL_MAX_LIFETIME", "3600"))
+DB_POOL_HEALTH_CHECK_AFTER = float(os.getenv("DB_POOL_HEALTH_CHECK_AFTER", "30"))
+
+# Snapshot partitioning (daily partitions; retention 0 keeps everything)
+SNAPSHOT_PARTITIONS_AHEAD_DAYS = int(os.getenv("SNAPSHOT_PARTITIONS_AHEAD_DAYS", "7"))
+SNAPSHOT_RETENTION_DAYS = int(os.getenv("SNAPSHOT_RETENTION_DAYS", "0"))
+PARTITION_MAINTENANCE_INTERVAL = float(os.getenv("PARTITION_MAINTENANCE_INTERVAL", "3600"))
+
+# Ingestion
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "5000"))
+INGEST_FETCH_CONCURRENCY = int(os.getenv("INGEST_FETCH_CONCURRENCY", "4"))
+INGEST_MAX_PAGES = int(os.getenv("INGEST_MAX_PAGES", "50"))
+# Change-only ingest: write only coins that changed, plus a full keyframe
+# at least every INGEST_KEYFRAME_INTERVAL committed batches
+INGEST_DELTA_MODE = os.getenv("INGEST_DELTA_MODE", "false").lower() in ("1", "true", "yes")
+INGEST_KEYFRAME_INTERVAL = int(os.getenv("INGEST_KEYFRAME_INTERVAL", "60"))
+# Conditional fetching: send the last ETag/Last-Modified of each page and
+# skip writing (and, unless streamed, parsing) when upstream answers 304 or
+# the body is unchanged
+INGEST_CONDITIONAL = os.getenv("INGEST_CONDITIONAL", "true").lower() in ("1", "true", "yes")
+
+# Ingest jobs: POST /ingest enqueues; INGEST_WORKERS jobs run concurrently per
+# process (0 leaves them to `python -m app.worker` processes)
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "2"))
+INGEST_JOB_POLL_INTERVAL = float(os.getenv("INGEST_JOB_POLL_INTERVAL", "2"))
+INGEST_JOB_MAX_ATTEMPTS = int(os.getenv("INGEST_JOB_MAX_ATTEMPTS", "3"))
+INGEST_JOB_RETRY_DELAY = float(os.getenv("INGEST_JOB_RETRY_DELAY", "30"))   # doubles per attempt
+INGEST_JOB_HEARTBEAT = float(os.getenv("INGEST_JOB_HEARTBEAT", "15"))
+# Running jobs without a heartbeat for this long belong to a dead process and are requeued
+INGEST_JOB_STALE_AFTER = float(os.getenv("INGEST_JOB_STALE_AFTER", "120"))
+# Periodic ingests, as JSON: [{"url": "...", "every": "5m", "pages": 4, "delta": true}, ...]
+# Runs fire on multiples of `every` since the epoch (UTC), like cron
+INGEST_SCHEDULE = os.getenv("INGEST_SCHEDULE", "[]")
+INGEST_SCHEDULER_ENABLED = os.getenv("INGEST_SCHEDULER_ENABLED", "true").lower() in ("1", "true", "yes")
+
+# Outbound HTTP
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "15"))
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "20"))
+HTTP_USER_AGENT = os.getenv("HTTP_USER_AGENT", "DataDrive/1.0")
+# Upstream pacing, per host: a token bucket refilling at up to HTTP_RATE_LIMIT
+# requests/s (0 disables pacing), halved on every throttled response and
+# raised by HTTP_RATE_INCREASE per success, never below HTTP_RATE_FLOOR.
+# Per-host ceilings as JSON: {"api.coingecko.com": 0.5}
+HTTP_RATE_LIMIT = float(os.getenv("HTTP_RATE_LIMIT", "10"))
+HTTP_RATE_BURST = int(os.getenv("HTTP_RATE_BURST", "10"))
+HTTP_RATE_FLOOR = float(os.getenv("HTTP_RATE_FLOOR", "0.2"))
+HTTP_RATE_INCREASE = float(os.getenv("HTTP_RATE_INCREASE", "0.1"))
+HTTP_HOST_RATE_LIMITS = os.getenv("HTTP_HOST_RATE_LIMITS", "{}")
+# Retries of idempotent requests on 429/502/503/504 and connection errors:
+# Retry-After when given, else full-jitter exponential backoff. Retry-After
+# beyond HTTP_RETRY_MAX_DELAY is not waited for
+HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "4"))
+HTTP_RETRY_BASE_DELAY = float(os.getenv("HTTP_RETRY_BASE_DELAY", "0.5"))
+HTTP_RETRY_MAX_DELAY = float(os.getenv("HTTP_RETRY_MAX_DELAY", "30"))
+# Retry budget shared by all hosts: each request earns HTTP_RETRY_BUDGET_RATIO
+# of a retry, plus HTTP_RETRY_BUDGET_MIN_PER_SEC regardless of traffic
+HTTP_RETRY_BUDGET_RATIO = float(os.getenv("HTTP_RETRY_BUDGET_RATIO", "0.2"))
+HTTP_RETRY_BUDGET_MIN_PER_SEC = float(os.getenv("HTTP_RETRY_BUDGET_MIN_PER_SEC", "1"))
+
+# Reports
+TIMESERIES_MAX_POINTS = int(os.getenv("TIMESERIES_MAX_POINTS", "5000"))
+EXPORT_CHUNK_ROWS = int(os.getenv("EXPORT_CHUNK_ROWS", "2000"))
+# Analytics: most coins in a returns/correlation request, and longest history
+ANALYTICS_MAX_COINS = int(os.getenv("ANALYTICS_MAX_COINS", "50"))
+ANALYTICS_MAX_DAYS = int(os.getenv("ANALYTICS_MAX_DAYS", "365"))
+
+# Response compression: negotiated brotli (if installed) or gzip above a size threshold
+COMPRESSION_ENABLED = os.getenv("COMPRESSION_ENABLED", "true").lower() in ("1", "true", "yes")
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "5"))
+
+# Metrics: request/query/ingest timings served at /metrics in Prometheus format
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+
+# Slow-query log (opt-in): statements slower than the threshold are kept in a
+# ring buffer, and a sample of slow report queries (SELECTs tagged with a leading
+# `/* name */` comment) is EXPLAIN ANALYZEd in the background
+SLOW_QUERY_THRESHOLD_MS = float(os.getenv("SLOW_QUERY_THRESHOLD_MS", "0"))   # 0 disables
+SLOW_QUERY_LOG_SIZE = int(os.getenv("SLOW_QUERY_LOG_SIZE", "200"))
+SLOW_QUERY_EXPLAIN_SAMPLE = float(os.getenv("SLOW_QUERY_EXPLAIN_SAMPLE", "0.1"))
+SLOW_QUERY_EXPLAIN_TIMEOUT_MS = int(os.getenv("SLOW_QUERY_EXPLAIN_TIMEOUT_MS", "10000"))
+# Users (by email) allowed to use /admin endpoints
+ADMIN_EMAILS = [e.strip().lower() for e in os.getenv("ADMIN_EMAILS", "").split(",") if e.strip()]
+
+# Report cache
+REPORT_CACHE_SIZE = int(os.getenv("REPORT_CACHE_SIZE", "256"))
+REPORT_CACHE_TTL = float(os.getenv("REPORT_CACHE_TTL", "300"))
+# How long a worker trusts its view of the current batch before re-reading it;
+# bounds staleness for ingests committed by other worker processes.
+REPORT_CACHE_BATCH_TTL = float(os.getenv("REPORT_CACHE_BATCH_TTL", "5"))
 
 SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
 
+# Password hashing (dedicated executor, separate from the request threadpool)
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", "2"))
+HASH_MAX_QUEUE = int(os.getenv("HASH_MAX_QUEUE", "32"))
+
 # Entra ID
 AZURE_CLIENT_ID = os.getenv("AZURE_CLIENT_ID")
 AZURE_TENANT_ID = os.getenv("AZURE_TENANT_ID")
+# No key set is fetched without a tenant (or an explicit URL)
+AZURE_JWKS_URL = os.getenv("AZURE_JWKS_URL") or (
+    f"https://login.microsoftonline.com/{AZURE_TENANT_ID}/discovery/v2.0/keys" if AZURE_TENANT_ID else None
+)
+JWKS_REFRESH_INTERVAL = float(os.getenv("JWKS_REFRESH_INTERVAL", "3600"))
+# Minimum gap between refreshes triggered by an unknown `kid`
+JWKS_MIN_REFRESH_INTERVAL = float(os.getenv("JWKS_MIN_REFRESH_INTERVAL", "60"))
+# Optional file keeping the last good key set, loaded at startup so Entra
+# logins work before (or without) a fetch. Off by default: use a path in a
+# directory only the service user can write, never a shared temp dir
+JWKS_CACHE_PATH = os.getenv("JWKS_CACHE_PATH") or None
+
+# Verified-token cache
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
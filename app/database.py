@@ -1,55 +1,478 @@
 """
 Database connections and initialization for PostgreSQL.
 """
+import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta, timezone
+
 import psycopg2
+from psycopg2 import extensions
 from psycopg2.extras import RealDictCursor
-from app.config import DATABASE_URL
+from psycopg2.pool import PoolError
+
+from app.config import (
+    DATABASE_URL,
+    DB_POOL_MIN_SIZE,
+    DB_POOL_MAX_SIZE,
+    DB_POOL_TIMEOUT,
+    DB_POOL_MAX_IDLE,
+    DB_POOL_MAX_LIFETIME,
+    DB_POOL_HEALTH_CHECK_AFTER,
+    SNAPSHOT_PARTITIONS_AHEAD_DAYS,
+    SNAPSHOT_RETENTION_DAYS,
+)
+from app.services.metrics import (
+    DB_CHECKOUT_SECONDS,
+    DB_CONNECT_SECONDS,
+    DB_QUERY_SECONDS,
+    statement_name,
+)
+from app.services.slow_queries import slow_query_log
+
+
+# =================== TIMED CURSORS ===================
+class _TimedMixin:
+    """
+    Records each execute/COPY in `db_query_duration_seconds` by statement
+    name, and hands statements over the slow-query threshold to the log.
+    """
+
+    def execute(self, query, vars=None):
+        started = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            elapsed = time.perf_counter() - started
+            DB_QUERY_SECONDS.observe(elapsed, statement_name(query))
+            slow_query_log.record(query, vars, elapsed, self.rowcount)
+
+    def copy_expert(self, sql, file, size=8192):
+        started = time.perf_counter()
+        try:
+            return super().copy_expert(sql, file, size)
+        finally:
+            DB_QUERY_SECONDS.observe(time.perf_counter() - started, statement_name(sql))
+
+
+class TimedCursor(_TimedMixin, extensions.cursor):
+    """Default cursor of pooled connections."""
+
+
+class TimedRealDictCursor(_TimedMixin, RealDictCursor):
+    """`RealDictCursor` with query timing; use instead of RealDictCursor."""
+
+
+# =================== CONNECTION POOL ===================
+class ConnectionPool:
+    """
+    Thread-safe pool of psycopg2 connections.
+
+    Idle connections are handed out most-recently-used first so that surplus
+    connections age out after `max_idle` seconds. Connections that have been
+    idle for longer than `health_check_after` are pinged before being handed
+    out, and every connection is retired after `max_lifetime` seconds.
+    """
+
+    def __init__(self, dsn, min_size=1, max_size=10, timeout=10.0,
+                 max_idle=300.0, max_lifetime=3600.0, health_check_after=30.0):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError("Invalid pool size: need 0 <= min_size <= max_size and max_size >= 1")
+        self.dsn = dsn
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.max_lifetime = max_lifetime
+        self.health_check_after = health_check_after
+
+        self._cond = threading.Condition()
+        self._idle = deque()     # (conn, created_at, last_used)
+        self._created = {}       # id(conn) -> created_at, for checked-out connections
+        self._size = 0
+        self._waiting = 0
+        self._closed = True
+
+        self._checkouts = 0
+        self._timeouts = 0
+        self._discarded = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    # ---- lifecycle ----
+    def open(self):
+        """Open the pool and pre-create `min_size` connections."""
+        with self._cond:
+            if not self._closed:
+                return
+            self._closed = False
+            missing = self.min_size - self._size
+            self._size += missing
+        for _ in range(missing):
+            try:
+                conn = self._connect()
+            except Exception:
+                with self._cond:
+                    self._size -= 1
+                    self._cond.notify()
+                raise
+            now = time.monotonic()
+            with self._cond:
+                self._idle.append((conn, now, now))
+                self._cond.notify()
+
+    def close(self):
+        """Close idle connections; checked-out ones are closed when returned."""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = list(self._idle), deque()
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for conn, _, _ in idle:
+            _close_quietly(conn)
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    # ---- checkout / return ----
+    def getconn(self):
+        """Borrow a connection, waiting up to `timeout` seconds for one to free up."""
+        started = time.monotonic()
+        deadline = started + self.timeout
+        while True:
+            conn, created_at, last_used = self._checkout(deadline)
+            if conn is None:
+                # Reserved a slot for a brand-new connection
+                try:
+                    conn = self._connect()
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+                created_at = time.monotonic()
+            elif not self._is_healthy(conn, last_used):
+                self._discard(conn)
+                continue
+
+            waited = time.monotonic() - started
+            with self._cond:
+                self._created[id(conn)] = created_at
+                self._checkouts += 1
+                self._wait_total += waited
+                self._wait_max = max(self._wait_max, waited)
+            return conn
+
+    def putconn(self, conn):
+        """Return a borrowed connection, rolling back any open transaction."""
+        with self._cond:
+            created_at = self._created.pop(id(conn), None)
+            closed = self._closed
+        if created_at is None:
+            raise PoolError("Connection does not belong to this pool")
+
+        if not closed and not conn.closed:
+            try:
+                if conn.info.transaction_status != extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except psycopg2.Error:
+                pass
+
+        now = time.monotonic()
+        if (closed or conn.closed
+                or conn.info.transaction_status != extensions.TRANSACTION_STATUS_IDLE
+                or now - created_at > self.max_lifetime):
+            self._discard(conn)
+            return
+        with self._cond:
+            self._idle.append((conn, created_at, now))
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        """Context manager borrowing a connection for the duration of the block."""
+        conn = self.getconn()
+        try:
+            yield conn
+        finally:
+            self.putconn(conn)
+
+    # ---- stats ----
+    def stats(self) -> dict:
+        """Snapshot of pool sizing and wait-time counters."""
+        with self._cond:
+            checkouts = self._checkouts
+            return {
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": len(self._created),
+                "waiting": self._waiting,
+                "checkouts": checkouts,
+                "timeouts": self._timeouts,
+                "discarded": self._discarded,
+                "wait_seconds_total": round(self._wait_total, 6),
+                "wait_seconds_avg": round(self._wait_total / checkouts, 6) if checkouts else 0.0,
+                "wait_seconds_max": round(self._wait_max, 6),
+            }
+
+    # ---- internals ----
+    def _connect(self):
+        with DB_CONNECT_SECONDS.time():
+            return psycopg2.connect(self.dsn, cursor_factory=TimedCursor)
+
+    def _checkout(self, deadline):
+        """
+        Pop a usable idle connection, or reserve a slot for a new one
+        (returned as `(None, None, None)`). Expired idle connections are
+        closed along the way.
+        """
+        expired = []
+        try:
+            with self._cond:
+                while True:
+                    if self._closed:
+                        raise PoolError("Connection pool is closed")
+                    now = time.monotonic()
+                    while self._idle:
+                        conn, created_at, last_used = self._idle.pop()
+                        if now - created_at > self.max_lifetime:
+                            self._forget(conn, expired)
+                            continue
+                        self._recycle_idle(now, expired)
+                        return conn, created_at, last_used
+                    if self._size < self.max_size:
+                        self._size += 1
+                        return None, None, None
+
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        self._timeouts += 1
+                        raise PoolError(
+                            f"Timed out after {self.timeout:.1f}s waiting for a database connection"
+                        )
+                    self._waiting += 1
+                    try:
+                        self._cond.wait(remaining)
+                    finally:
+                        self._waiting -= 1
+        finally:
+            for conn in expired:
+                _close_quietly(conn)
+
+    def _recycle_idle(self, now, expired):
+        """Drop the least-recently-used idle connections past `max_idle` (lock held)."""
+        while (self._idle and self._size > self.min_size
+               and now - self._idle[0][2] > self.max_idle):
+            self._forget(self._idle.popleft()[0], expired)
 
+    def _forget(self, conn, expired):
+        """Stop accounting for `conn` so it can be closed outside the lock (lock held)."""
+        expired.append(conn)
+        self._size -= 1
+        self._discarded += 1
 
+    def _is_healthy(self, conn, last_used) -> bool:
+        if conn.closed:
+            return False
+        if time.monotonic() - last_used < self.health_check_after:
+            return True
+        try:
+            with conn.cursor() as c:
+                c.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _discard(self, conn):
+        _close_quietly(conn)
+        with self._cond:
+            self._size -= 1
+            self._discarded += 1
+            self._cond.notify()
+
+
+def _close_quietly(conn):
+    try:
+        conn.close()
+    except Exception:
+        pass
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ConnectionPool:
+    """Return the process-wide pool, opening it on first use."""
+    global _pool
+    if _pool is None or _pool.closed:
+        with _pool_lock:
+            if _pool is None or _pool.closed:
+                if not DATABASE_URL:
+                    raise ValueError("DATABASE_URL is not set in environment variables")
+                pool = ConnectionPool(
+                    DATABASE_URL,
+                    min_size=DB_POOL_MIN_SIZE,
+                    max_size=DB_POOL_MAX_SIZE,
+                    timeout=DB_POOL_TIMEOUT,
+                    max_idle=DB_POOL_MAX_IDLE,
+                    max_lifetime=DB_POOL_MAX_LIFETIME,
+                    health_check_after=DB_POOL_HEALTH_CHECK_AFTER,
+                )
+                pool.open()
+                _pool = pool
+    return _pool
+
+
+def open_pool() -> ConnectionPool:
+    """Open the pool (called from the app lifespan)."""
+    return get_pool()
+
+
+def close_pool():
+    """Drain and close the pool (called from the app lifespan)."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+
+@contextmanager
 def get_conn():
-    """Get connection to PostgreSQL database."""
-    return psycopg2.connect(DATABASE_URL)
+    """Borrow a pooled connection to PostgreSQL for the duration of the block."""
+    pool = get_pool()
+    started = time.perf_counter()
+    conn = pool.getconn()
+    DB_CHECKOUT_SECONDS.observe(time.perf_counter() - started)
+    try:
+        yield conn
+    finally:
+        pool.putconn(conn)
+
+
+def get_db():
+    """FastAPI dependency yielding a pooled connection."""
+    with get_conn() as conn:
+        yield conn
 
 
-def init_db():
-    """Initialize market_snapshots table."""
-    conn = get_conn()
+# =================== SNAPSHOT PARTITIONS ===================
+# market_snapshots is range-partitioned by timestamp into one partition per
+# UTC day, named market_snapshots_pYYYYMMDD, plus a default partition that
+# only catches rows outside every pre-created range.
+SNAPSHOT_PARTITION_PREFIX = "market_snapshots_p"
+SNAPSHOT_DEFAULT_PARTITION = "market_snapshots_default"
+PARTITION_LOCK_ID = 72170416
+_PARTITION_NAME = re.compile(r"^market_snapshots_p(\d{8})$")
+
+
+def snapshot_partitions(conn) -> dict:
+    """Map of partition day -> partition name for existing daily partitions."""
     c = conn.cursor()
     c.execute("""
-        CREATE TABLE IF NOT EXISTS market_snapshots (
-            id SERIAL PRIMARY KEY,
-            coin_id VARCHAR(100),
-            symbol VARCHAR(20),
-            name VARCHAR(100),
-            current_price DOUBLE PRECISION,
-            market_cap DOUBLE PRECISION,
-            total_volume DOUBLE PRECISION,
-            price_change_24h DOUBLE PRECISION,
-            price_change_pct_24h DOUBLE PRECISION,
-            high_24h DOUBLE PRECISION,
-            low_24h DOUBLE PRECISION,
-            circulating_supply DOUBLE PRECISION,
-            max_supply DOUBLE PRECISION,
-            ath DOUBLE PRECISION,
-            ath_change_pct DOUBLE PRECISION,
-            timestamp VARCHAR(50)
-        )
+        SELECT child.relname
+        FROM pg_inherits
+        JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+        JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+        WHERE parent.relname = 'market_snapshots'
     """)
-    conn.commit()
-    conn.close()
+    partitions = {}
+    for (name,) in c.fetchall():
+        match = _PARTITION_NAME.match(name)
+        if match:
+            partitions[datetime.strptime(match.group(1), "%Y%m%d").date()] = name
+    return partitions
 
 
-def init_db_users():
-    """Initialize users table."""
-    conn = get_conn()
+def create_snapshot_partition(conn, day: date):
+    """
+    Create the partition for `day`. Rows for that day which already landed in
+    the default partition are moved into it first, since PostgreSQL refuses
+    to attach a range that the default partition still holds rows for.
+    """
+    name = f"{SNAPSHOT_PARTITION_PREFIX}{day:%Y%m%d}"
+    lower = datetime.combine(day, datetime.min.time(), tzinfo=timezone.utc)
+    upper = lower + timedelta(days=1)
     c = conn.cursor()
-    c.execute("""
-        CREATE TABLE IF NOT EXISTS users (
-            id SERIAL PRIMARY KEY,
-            email VARCHAR(255) UNIQUE,
-            hashed_password TEXT,
-            created_at VARCHAR(50)
+    c.execute(f"CREATE TABLE {name} (LIKE market_snapshots INCLUDING DEFAULTS INCLUDING CONSTRAINTS)")
+    c.execute(f"""
+        WITH moved AS (
+            DELETE FROM {SNAPSHOT_DEFAULT_PARTITION}
+            WHERE timestamp >= %s AND timestamp < %s
+            RETURNING *
         )
+        INSERT INTO {name} SELECT * FROM moved
+    """, (lower, upper))
+    c.execute(
+        f"ALTER TABLE market_snapshots ATTACH PARTITION {name} FOR VALUES FROM (%s) TO (%s)",
+        (lower, upper)
+    )
+
+
+def ensure_snapshot_partitions(conn, ahead_days: int = SNAPSHOT_PARTITIONS_AHEAD_DAYS) -> list:
+    """Create any missing partitions from today through `ahead_days` days ahead."""
+    today = datetime.now(timezone.utc).date()
+    existing = snapshot_partitions(conn)
+    created = []
+    for offset in range(ahead_days + 1):
+        day = today + timedelta(days=offset)
+        if day not in existing:
+            create_snapshot_partition(conn, day)
+            created.append(day)
+    return created
+
+
+def current_chain_since(conn):
+    """
+    Earliest snapshot time in the current batch's chain (its keyframe and
+    the change-only batches since), or None before the first ingest.
+    """
+    c = conn.cursor()
+    c.execute("""
+        SELECT min(x.started_at)
+        FROM ingest_current cur
+        JOIN ingest_batches b ON b.id = cur.batch_id
+        JOIN ingest_batches k ON k.id = b.keyframe_batch_id
+        JOIN ingest_batches x ON x.seq BETWEEN k.seq AND b.seq
     """)
-    conn.commit()
-    conn.close()
+    row = c.fetchone()
+    return row[0] if row else None
+
+
+def drop_expired_snapshot_partitions(conn, retention_days: int = SNAPSHOT_RETENTION_DAYS) -> list:
+    """
+    Drop whole partitions older than `retention_days` (0 disables retention).
+    Partitions holding the current chain are kept whatever their age: the
+    latest report and the next change-only diff need its keyframe.
+    """
+    if retention_days <= 0:
+        return []
+    cutoff = datetime.now(timezone.utc).date() - timedelta(days=retention_days)
+    since = current_chain_since(conn)
+    if since is not None:
+        cutoff = min(cutoff, since.astimezone(timezone.utc).date())
+    dropped = []
+    c = conn.cursor()
+    for day, name in sorted(snapshot_partitions(conn).items()):
+        if day < cutoff:
+            c.execute(f"DROP TABLE {name}")
+            dropped.append(day)
+    return dropped
+
+
+def maintain_snapshot_partitions() -> dict:
+    """Pre-create upcoming partitions and apply the retention policy."""
+    with get_conn() as conn:
+        c = conn.cursor()
+        c.execute("SELECT pg_advisory_xact_lock(%s)", (PARTITION_LOCK_ID,))
+        created = ensure_snapshot_partitions(conn)
+        dropped = drop_expired_snapshot_partitions(conn)
+        conn.commit()
+    return {"created": created, "dropped": dropped}
@@ -1,24 +1,78 @@
 """
 FastAPI application initialization.
 """
-from fastapi import FastAPI
-from fastapi.middleware.cors import CORSMiddleware
+import asyncio
+import logging
 
-from app.config import ALLOWED_ORIGINS
-from app.database import init_db, init_db_users
-from app.routers import auth, data
+from fastapi import FastAPI, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
+from psycopg2.pool import PoolError
+
+from app.config import (
+    ALLOWED_ORIGINS,
+    COMPRESSION_ENABLED,
+    METRICS_ENABLED,
+    PARTITION_MAINTENANCE_INTERVAL,
+    RUN_MIGRATIONS_ON_STARTUP,
+)
+from app.database import open_pool, close_pool, maintain_snapshot_partitions
+from app.migrations import ensure_schema
+from app.routers import admin, analytics, auth, data, export, metrics
+from app.services.compression import CompressionMiddleware
+from app.services.http_client import open_client, close_client
+from app.services.hashing import hashing_executor
+from app.services.jobs import job_runner
+from app.services.jwks import jwks_cache
+from app.services.metrics import MetricsMiddleware
+from app.services.slow_queries import slow_query_log
 
 
 # =================== APP INITIALIZATION ===================
 from contextlib import asynccontextmanager
-from app.services.entra_auth import azure_scheme
+from app.services.entra_auth import load_openid_config
+
+logger = logging.getLogger(__name__)
+
+
+async def partition_maintenance():
+    """Pre-create snapshot partitions and apply retention on a fixed interval."""
+    while True:
+        try:
+            await run_in_threadpool(maintain_snapshot_partitions)
+        except Exception:
+            logger.exception("Snapshot partition maintenance failed")
+        await asyncio.sleep(PARTITION_MAINTENANCE_INTERVAL)
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Load OpenID Connect configuration on startup
-    await azure_scheme.openid_config.load_config()
+    await run_in_threadpool(open_pool)
+    await open_client()
+    # One cheap version check per worker; DDL only runs when the schema is behind
+    if RUN_MIGRATIONS_ON_STARTUP:
+        await run_in_threadpool(ensure_schema)
+    # Signing keys from the last run are usable immediately; network loads happen in the background
+    jwks_cache.load_cached()
+    background = [
+        asyncio.create_task(partition_maintenance()),
+        asyncio.create_task(load_openid_config()),
+    ]
+    # Entra ID keys only exist for a configured tenant
+    if jwks_cache.url:
+        background.append(asyncio.create_task(jwks_cache.refresh_forever()))
+    job_runner.start()
     yield
-    # Clean up if needed
+    for task in background:
+        task.cancel()
+    # Interrupted ingest jobs are requeued before the pool closes
+    await job_runner.stop()
+    # Drain pooled HTTP and database connections
+    await close_client()
+    close_pool()
+    hashing_executor.shutdown()
+    slow_query_log.shutdown()
 
 app = FastAPI(lifespan=lifespan, title="Data Drive API")
 
@@ -31,15 +85,29 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# =================== COMPRESSION MIDDLEWARE ===================
+if COMPRESSION_ENABLED:
+    app.add_middleware(CompressionMiddleware)
+
+# =================== METRICS MIDDLEWARE ===================
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
+# =================== ERROR HANDLERS ===================
+@app.exception_handler(PoolError)
+async def pool_error_handler(request: Request, exc: PoolError):
+    """Pool exhausted or closed: tell the client to retry rather than fail hard."""
+    return JSONResponse(status_code=503, content={"detail": str(exc)})
+
+
 # =================== INCLUDE ROUTERS ===================
 app.include_router(auth.router)
 app.include_router(data.router)
-
-# =================== DATABASE INITIALIZATION ===================
-# Initialize databases on module load
-init_db_users()
-init_db()
-
+app.include_router(export.router)
+app.include_router(analytics.router)
+app.include_router(admin.router)
+if METRICS_ENABLED:
+    app.include_router(metrics.router)
 
 # =================== ROOT ENDPOINT ===================
 @app.get("/")
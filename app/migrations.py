@@ -0,0 +1,393 @@
+"""
+Versioned schema migrations for PostgreSQL.
+
+Each migration runs once, in its own transaction, and is recorded in
+`schema_migrations`. Concurrent runners are serialised with an advisory lock.
+Run with: python -m app.migrations
+"""
+from datetime import datetime, timedelta, timezone
+
+from app.database import (
+    get_conn,
+    create_snapshot_partition,
+    SNAPSHOT_DEFAULT_PARTITION,
+)
+from app.config import SNAPSHOT_PARTITIONS_AHEAD_DAYS
+
+
+# Arbitrary key for pg_advisory_lock, shared by every process running migrations
+MIGRATION_LOCK_ID = 72170415
+
+
+# =================== MIGRATIONS ===================
+def partition_snapshots(c):
+    """Rebuild market_snapshots as a table range-partitioned by day."""
+    c.execute("""
+        ALTER TABLE market_snapshots RENAME TO market_snapshots_legacy;
+        ALTER TABLE market_snapshots_legacy
+            RENAME CONSTRAINT market_snapshots_pkey TO market_snapshots_legacy_pkey;
+        ALTER TABLE market_snapshots_legacy
+            RENAME CONSTRAINT market_snapshots_batch_id_fkey TO market_snapshots_legacy_batch_id_fkey;
+        ALTER SEQUENCE market_snapshots_id_seq OWNED BY NONE;
+        DROP INDEX IF EXISTS market_snapshots_coin_ts_idx;
+        DROP INDEX IF EXISTS market_snapshots_batch_mcap_idx;
+
+        CREATE TABLE market_snapshots (
+            id INTEGER NOT NULL DEFAULT nextval('market_snapshots_id_seq'),
+            coin_id VARCHAR(100),
+            symbol VARCHAR(20),
+            name VARCHAR(100),
+            current_price DOUBLE PRECISION,
+            market_cap DOUBLE PRECISION,
+            total_volume DOUBLE PRECISION,
+            price_change_24h DOUBLE PRECISION,
+            price_change_pct_24h DOUBLE PRECISION,
+            high_24h DOUBLE PRECISION,
+            low_24h DOUBLE PRECISION,
+            circulating_supply DOUBLE PRECISION,
+            max_supply DOUBLE PRECISION,
+            ath DOUBLE PRECISION,
+            ath_change_pct DOUBLE PRECISION,
+            timestamp TIMESTAMPTZ NOT NULL,
+            batch_id BIGINT REFERENCES ingest_batches (id),
+            PRIMARY KEY (id, timestamp)
+        ) PARTITION BY RANGE (timestamp);
+        ALTER SEQUENCE market_snapshots_id_seq OWNED BY market_snapshots.id;
+    """)
+    c.execute(f"CREATE TABLE {SNAPSHOT_DEFAULT_PARTITION} PARTITION OF market_snapshots DEFAULT")
+
+    # One partition per day from the oldest stored row through the look-ahead window
+    c.execute("SELECT min(timestamp) FROM market_snapshots_legacy")
+    oldest = c.fetchone()[0]
+    today = datetime.now(timezone.utc).date()
+    day = oldest.astimezone(timezone.utc).date() if oldest else today
+    while day <= today + timedelta(days=SNAPSHOT_PARTITIONS_AHEAD_DAYS):
+        create_snapshot_partition(c.connection, day)
+        day += timedelta(days=1)
+
+    # Rows without a timestamp were never reachable from any report
+    c.execute("""
+        INSERT INTO market_snapshots
+        SELECT * FROM market_snapshots_legacy WHERE timestamp IS NOT NULL;
+        DROP TABLE market_snapshots_legacy;
+
+        CREATE INDEX market_snapshots_coin_ts_idx
+            ON market_snapshots (coin_id, timestamp);
+        CREATE INDEX market_snapshots_batch_mcap_idx
+            ON market_snapshots (batch_id, market_cap DESC);
+    """)
+
+
+def rollup_table_sql(table: str) -> str:
+    """DDL for a per-coin rollup table; `rollup_backfill_sql` fills it."""
+    return f"""
+        CREATE TABLE {table} (
+            coin_key INTEGER NOT NULL REFERENCES coins (id),
+            bucket TIMESTAMPTZ NOT NULL,
+            open DOUBLE PRECISION,
+            high DOUBLE PRECISION,
+            low DOUBLE PRECISION,
+            close DOUBLE PRECISION,
+            open_at TIMESTAMPTZ NOT NULL,
+            close_at TIMESTAMPTZ NOT NULL,
+            market_cap DOUBLE PRECISION,
+            market_cap_min DOUBLE PRECISION,
+            market_cap_max DOUBLE PRECISION,
+            total_volume_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+            volume_samples INTEGER NOT NULL DEFAULT 0,
+            samples INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (coin_key, bucket)
+        );
+    """
+
+
+def rollup_backfill_sql(table: str, unit: str) -> str:
+    """
+    Rebuild a rollup table from the batch chains in one statement. Within a
+    keyframe's chain, a stored row holds for its coin until the coin's next
+    row, so it is observed, at each observing batch's time, by every batch
+    from its own up to that one: the same observations ingests fold in.
+    """
+    bucket = f"date_trunc('{unit}', observed_at AT TIME ZONE 'UTC') AT TIME ZONE 'UTC'"
+    return f"""
+        TRUNCATE {table};
+        INSERT INTO {table}
+            SELECT coin_key, {bucket},
+                   (array_agg(current_price ORDER BY observed_at))[1],
+                   max(current_price), min(current_price),
+                   (array_agg(current_price ORDER BY observed_at DESC))[1],
+                   min(observed_at), max(observed_at),
+                   (array_agg(market_cap ORDER BY observed_at DESC))[1],
+                   min(market_cap), max(market_cap),
+                   coalesce(sum(total_volume), 0), count(total_volume), count(*)
+            FROM (
+                SELECT r.coin_key, r.current_price, r.market_cap, r.total_volume,
+                       o.started_at AS observed_at
+                FROM (
+                    SELECT s.coin_key, s.current_price, s.market_cap, s.total_volume,
+                           b.keyframe_batch_id, b.seq,
+                           lead(b.seq) OVER (
+                               PARTITION BY b.keyframe_batch_id, s.coin_key ORDER BY b.seq
+                           ) AS next_seq
+                    FROM market_snapshots s
+                    JOIN ingest_batches b ON b.id = s.batch_id
+                    WHERE b.status = 'complete' AND b.seq IS NOT NULL AND s.coin_key IS NOT NULL
+                ) r
+                JOIN ingest_batches o
+                  ON o.keyframe_batch_id = r.keyframe_batch_id
+                 AND o.status = 'complete'
+                 AND o.seq >= r.seq
+                 AND (r.next_seq IS NULL OR o.seq < r.next_seq)
+            ) observations
+            GROUP BY 1, 2;
+    """
+
+
+# (version, description, SQL or callable taking a cursor)
+MIGRATIONS = [
+    (1, "create users and market_snapshots", """
+        CREATE TABLE IF NOT EXISTS users (
+            id SERIAL PRIMARY KEY,
+            email VARCHAR(255) UNIQUE,
+            hashed_password TEXT,
+            created_at VARCHAR(50)
+        );
+        CREATE TABLE IF NOT EXISTS market_snapshots (
+            id SERIAL PRIMARY KEY,
+            coin_id VARCHAR(100),
+            symbol VARCHAR(20),
+            name VARCHAR(100),
+            current_price DOUBLE PRECISION,
+            market_cap DOUBLE PRECISION,
+            total_volume DOUBLE PRECISION,
+            price_change_24h DOUBLE PRECISION,
+            price_change_pct_24h DOUBLE PRECISION,
+            high_24h DOUBLE PRECISION,
+            low_24h DOUBLE PRECISION,
+            circulating_supply DOUBLE PRECISION,
+            max_supply DOUBLE PRECISION,
+            ath DOUBLE PRECISION,
+            ath_change_pct DOUBLE PRECISION,
+            timestamp VARCHAR(50)
+        );
+    """),
+    (2, "typed snapshot timestamps and report indexes", """
+        ALTER TABLE market_snapshots
+            ALTER COLUMN timestamp TYPE TIMESTAMPTZ
+            USING (timestamp::timestamp AT TIME ZONE 'UTC');
+        CREATE INDEX IF NOT EXISTS market_snapshots_coin_ts_idx
+            ON market_snapshots (coin_id, timestamp);
+        CREATE INDEX IF NOT EXISTS market_snapshots_ts_mcap_idx
+            ON market_snapshots (timestamp, market_cap DESC);
+    """),
+    (3, "ingest batches and current batch pointer", """
+        CREATE TABLE ingest_batches (
+            id BIGSERIAL PRIMARY KEY,
+            source_url TEXT,
+            started_at TIMESTAMPTZ NOT NULL,
+            finished_at TIMESTAMPTZ,
+            row_count INTEGER NOT NULL DEFAULT 0,
+            status VARCHAR(20) NOT NULL DEFAULT 'running'
+        );
+        CREATE TABLE ingest_current (
+            id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+            batch_id BIGINT REFERENCES ingest_batches (id)
+        );
+        ALTER TABLE market_snapshots ADD COLUMN batch_id BIGINT REFERENCES ingest_batches (id);
+
+        -- Every past ingest shared one timestamp: turn each into a batch
+        INSERT INTO ingest_batches (started_at, finished_at, row_count, status)
+            SELECT timestamp, timestamp, count(*), 'complete'
+            FROM market_snapshots
+            WHERE timestamp IS NOT NULL
+            GROUP BY timestamp
+            ORDER BY timestamp;
+        UPDATE market_snapshots s SET batch_id = b.id
+            FROM ingest_batches b
+            WHERE s.timestamp = b.started_at;
+        INSERT INTO ingest_current (batch_id) SELECT max(id) FROM ingest_batches;
+
+        CREATE INDEX market_snapshots_batch_mcap_idx
+            ON market_snapshots (batch_id, market_cap DESC);
+        -- /report/latest now reads by batch id
+        DROP INDEX IF EXISTS market_snapshots_ts_mcap_idx;
+    """),
+    (4, "partition market_snapshots by day", partition_snapshots),
+    (5, "commit order and keyframes for change-only batches", """
+        CREATE SEQUENCE ingest_batch_seq;
+        ALTER TABLE ingest_batches
+            ADD COLUMN seq BIGINT UNIQUE,
+            ADD COLUMN keyframe_batch_id BIGINT REFERENCES ingest_batches (id),
+            ADD COLUMN rows_received INTEGER NOT NULL DEFAULT 0;
+
+        -- Every existing batch stored full rows: each is its own keyframe
+        UPDATE ingest_batches SET keyframe_batch_id = id, rows_received = row_count;
+        UPDATE ingest_batches b SET seq = o.n
+            FROM (
+                SELECT id, row_number() OVER (ORDER BY id) AS n
+                FROM ingest_batches
+                WHERE status = 'complete' AND row_count > 0
+            ) o
+            WHERE b.id = o.id;
+        SELECT setval('ingest_batch_seq', coalesce(max(seq), 0) + 1, false) FROM ingest_batches;
+    """),
+    (6, "coins dimension with integer keys in market_snapshots", """
+        CREATE TABLE coins (
+            id SERIAL PRIMARY KEY,
+            coin_id VARCHAR(100) NOT NULL UNIQUE,
+            symbol VARCHAR(20),
+            name VARCHAR(100)
+        );
+        INSERT INTO coins (coin_id, symbol, name)
+            SELECT DISTINCT ON (coin_id) coin_id, symbol, name
+            FROM market_snapshots
+            WHERE coin_id IS NOT NULL
+            ORDER BY coin_id, timestamp DESC;
+
+        ALTER TABLE market_snapshots ADD COLUMN coin_key BIGINT;
+        UPDATE market_snapshots s SET coin_key = c.id
+            FROM coins c
+            WHERE c.coin_id = s.coin_id;
+        DROP INDEX market_snapshots_coin_ts_idx;
+        ALTER TABLE market_snapshots
+            DROP COLUMN coin_id,
+            DROP COLUMN symbol,
+            DROP COLUMN name;
+        -- The type change rewrites every partition, reclaiming the dropped text
+        ALTER TABLE market_snapshots
+            ALTER COLUMN coin_key TYPE INTEGER,
+            ADD FOREIGN KEY (coin_key) REFERENCES coins (id);
+        CREATE INDEX market_snapshots_coin_ts_idx
+            ON market_snapshots (coin_key, timestamp);
+    """),
+    (7, "hourly and daily coin rollups",
+        rollup_table_sql("coin_rollups_hourly") + rollup_table_sql("coin_rollups_daily")),
+    (8, "ingest job queue", """
+        CREATE TABLE ingest_jobs (
+            id BIGSERIAL PRIMARY KEY,
+            source_url TEXT NOT NULL,
+            pages INTEGER NOT NULL DEFAULT 1,
+            page_param TEXT NOT NULL DEFAULT 'page',
+            stream BOOLEAN NOT NULL DEFAULT FALSE,
+            delta BOOLEAN NOT NULL DEFAULT FALSE,
+            status VARCHAR(20) NOT NULL DEFAULT 'queued',
+            trigger VARCHAR(20) NOT NULL DEFAULT 'api',
+            requested_by TEXT,
+            schedule_slot TIMESTAMPTZ,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            run_after TIMESTAMPTZ NOT NULL DEFAULT now(),
+            created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+            started_at TIMESTAMPTZ,
+            heartbeat_at TIMESTAMPTZ,
+            finished_at TIMESTAMPTZ,
+            batch_id BIGINT REFERENCES ingest_batches (id),
+            result JSONB,
+            error TEXT
+        );
+        -- At most one waiting and one running job per source: further
+        -- requests coalesce into the waiting one, and runs never overlap
+        CREATE UNIQUE INDEX ingest_jobs_queued_source_idx
+            ON ingest_jobs (source_url) WHERE status = 'queued';
+        CREATE UNIQUE INDEX ingest_jobs_running_source_idx
+            ON ingest_jobs (source_url) WHERE status = 'running';
+        -- Each schedule slot is enqueued once, however many processes run the scheduler
+        CREATE UNIQUE INDEX ingest_jobs_schedule_slot_idx
+            ON ingest_jobs (source_url, schedule_slot) WHERE schedule_slot IS NOT NULL;
+        CREATE INDEX ingest_jobs_claim_idx
+            ON ingest_jobs (run_after, id) WHERE status = 'queued';
+    """),
+    (9, "conditional fetch state per upstream page", """
+        CREATE TABLE ingest_sources (
+            url TEXT PRIMARY KEY,
+            etag TEXT,
+            last_modified TEXT,
+            content_hash TEXT,
+            checked_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+            changed_at TIMESTAMPTZ NOT NULL DEFAULT now()
+        );
+    """),
+    # Version 7 once backfilled from stored rows only, missing carried-forward coins
+    (10, "rebuild rollups from batch chains",
+        rollup_backfill_sql("coin_rollups_hourly", "hour") + rollup_backfill_sql("coin_rollups_daily", "day")),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+# =================== RUNNER ===================
+def applied_versions(conn) -> set:
+    """Versions already recorded in `schema_migrations`."""
+    c = conn.cursor()
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            description TEXT NOT NULL,
+            applied_at TIMESTAMPTZ NOT NULL DEFAULT now()
+        )
+    """)
+    c.execute("SELECT version FROM schema_migrations")
+    versions = {row[0] for row in c.fetchall()}
+    conn.commit()
+    return versions
+
+
+def schema_version(conn) -> int:
+    """Highest applied migration version, or 0 on an empty database."""
+    c = conn.cursor()
+    c.execute("SELECT to_regclass('schema_migrations') IS NOT NULL")
+    version = 0
+    if c.fetchone()[0]:
+        c.execute("SELECT coalesce(max(version), 0) FROM schema_migrations")
+        version = c.fetchone()[0]
+    conn.rollback()
+    return version
+
+
+def ensure_schema() -> list:
+    """
+    Startup check: one cheap query when the schema is current; otherwise run
+    `migrate()`, whose advisory lock lets only one worker apply migrations.
+    """
+    with get_conn() as conn:
+        if schema_version(conn) >= LATEST_VERSION:
+            return []
+    return migrate()
+
+
+def migrate() -> list:
+    """Apply pending migrations in order. Returns the versions applied."""
+    applied = []
+    with get_conn() as conn:
+        c = conn.cursor()
+        c.execute("SELECT pg_advisory_lock(%s)", (MIGRATION_LOCK_ID,))
+        conn.commit()
+        try:
+            done = applied_versions(conn)
+            for version, description, sql in MIGRATIONS:
+                if version in done:
+                    continue
+                if callable(sql):
+                    sql(c)
+                else:
+                    c.execute(sql)
+                c.execute(
+                    "INSERT INTO schema_migrations (version, description) VALUES (%s, %s)",
+                    (version, description)
+                )
+                conn.commit()
+                applied.append(version)
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            c.execute("SELECT pg_advisory_unlock(%s)", (MIGRATION_LOCK_ID,))
+            conn.commit()
+    return applied
+
+
+if __name__ == "__main__":
+    versions = migrate()
+    if versions:
+        print(f"Applied migrations: {', '.join(map(str, versions))}")
+    else:
+        print(f"Schema is up to date (version {LATEST_VERSION})")
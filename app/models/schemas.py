@@ -1,7 +1,12 @@
 """
 Pydantic models for request/response validation.
 """
-from pydantic import BaseModel
+from datetime import datetime
+from typing import Optional
+
+from pydantic import BaseModel, Field
+
+from app.config import INGEST_MAX_PAGES
 
 
 # =================== AUTH MODELS ===================
@@ -27,10 +32,54 @@ class TokenResponse(BaseModel):
 class IngestRequest(BaseModel):
     """Request model for data ingestion."""
     url: str
+    pages: int = Field(1, ge=1, le=INGEST_MAX_PAGES)
+    page_param: str = "page"
+    stream: bool = False
+    delta: Optional[bool] = None   # defaults to INGEST_DELTA_MODE
 
 
-class IngestResponse(BaseModel):
-    """Response model for successful ingestion."""
+class IngestResult(BaseModel):
+    """Outcome of one ingest run, kept as its job's `result`."""
     status: str
+    batch_id: int
     records_ingested: int
+    rows_written: int
+    keyframe: bool
+    write_reduction: float
     timestamp: str
+    rows_per_sec: Optional[float] = None
+    short_circuit: Optional[str] = None   # "fetch" (304) or "hash" when nothing was parsed
+    pages_not_modified: int = 0
+    pages_unchanged: int = 0
+
+
+class IngestAccepted(BaseModel):
+    """Response model for a queued ingest (202)."""
+    job_id: int
+    status: str
+    deduplicated: bool
+
+
+class IngestJob(BaseModel):
+    """Response model for an ingest job, with its result once complete."""
+    id: int
+    source_url: str
+    pages: int
+    page_param: str
+    stream: bool
+    delta: bool
+    status: str
+    trigger: str
+    requested_by: Optional[str] = None
+    schedule_slot: Optional[datetime] = None
+    attempts: int
+    run_after: datetime
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    heartbeat_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    batch_id: Optional[int] = None
+    result: Optional[IngestResult] = None
+    error: Optional[str] = None
+    queued_seconds: float
+    run_seconds: Optional[float] = None
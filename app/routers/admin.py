@@ -0,0 +1,35 @@
+"""
+Admin router: operational views restricted to ADMIN_EMAILS.
+"""
+from fastapi import APIRouter, Depends, HTTPException, Query
+
+from app.config import ADMIN_EMAILS
+from app.services.auth import get_current_user
+from app.services.slow_queries import slow_query_log
+
+
+def require_admin(user=Depends(get_current_user)) -> str:
+    """Dependency: the current user, who must be listed in ADMIN_EMAILS."""
+    if str(user).lower() not in ADMIN_EMAILS:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return user
+
+
+router = APIRouter(prefix="/admin", tags=["Admin"], dependencies=[Depends(require_admin)])
+
+
+@router.get("/slow-queries")
+def slow_queries(limit: int = Query(50, ge=1, le=1000)):
+    """
+    Statements slower than SLOW_QUERY_THRESHOLD_MS, newest first, with
+    redacted parameters and, for a sample of SELECTs, their
+    EXPLAIN (ANALYZE, BUFFERS) plan once it has been captured.
+    """
+    return {**slow_query_log.settings(), "queries": slow_query_log.entries(limit)}
+
+
+@router.delete("/slow-queries")
+def clear_slow_queries():
+    """Empty the slow-query log."""
+    slow_query_log.clear()
+    return {"status": "cleared"}
@@ -0,0 +1,137 @@
+"""
+Analytics router: market statistics computed once per ingest batch.
+"""
+from typing import Optional
+
+from fastapi import APIRouter, Query, Request
+
+from app.config import ANALYTICS_MAX_COINS, ANALYTICS_MAX_DAYS
+from app.services.analytics import (
+    close_matrix, concentration, correlation, current_frame, movers, overview,
+    resolve_coins, rolling_returns, volatility,
+)
+from app.services.cache import cached_report
+
+
+router = APIRouter(prefix="/analytics", tags=["Analytics"])
+
+
+def _summary(universe, n, by):
+    frame, chain = current_frame(universe)
+    return {
+        "overview": overview(frame, chain),
+        "concentration": concentration(frame),
+        "movers": movers(frame, n),
+        "volatility": volatility(frame, n, by),
+    }
+
+
+@router.get("/summary")
+def analytics_summary(
+    request: Request,
+    universe: Optional[int] = Query(None, ge=1),
+    n: int = Query(10, ge=1, le=100),
+    by: str = Query("range_pct", pattern="^(range|range_pct)$"),
+):
+    """
+    Overview, concentration, movers and volatility ranking in one response,
+    for dashboards that render them together. `universe` limits the
+    statistics to the top coins by market cap (all when omitted).
+    Served from the report cache until the next ingest commits, like every
+    analytics endpoint.
+    """
+    return cached_report(request, "analytics_summary", (universe, n, by), lambda: _summary(universe, n, by))
+
+
+@router.get("/overview")
+def analytics_overview(
+    request: Request,
+    universe: Optional[int] = Query(None, ge=1),
+):
+    """
+    Total market cap and volume, average and market-cap weighted 24h change,
+    advancers/decliners and the largest asset.
+    """
+    def build():
+        frame, chain = current_frame(universe)
+        return overview(frame, chain)
+
+    return cached_report(request, "analytics_overview", (universe,), build)
+
+
+@router.get("/movers")
+def analytics_movers(
+    request: Request,
+    universe: Optional[int] = Query(None, ge=1),
+    n: int = Query(10, ge=1, le=100),
+):
+    """The `n` biggest gainers and losers by 24h price change."""
+    return cached_report(
+        request, "analytics_movers", (universe, n), lambda: movers(current_frame(universe)[0], n)
+    )
+
+
+@router.get("/volatility")
+def analytics_volatility(
+    request: Request,
+    universe: Optional[int] = Query(None, ge=1),
+    n: int = Query(10, ge=1, le=100),
+    by: str = Query("range_pct", pattern="^(range|range_pct)$"),
+):
+    """
+    Coins ranked by 24h high-low range, absolute (`range`) or as a
+    percentage of the current price (`range_pct`).
+    """
+    return cached_report(
+        request, "analytics_volatility", (universe, n, by),
+        lambda: volatility(current_frame(universe)[0], n, by),
+    )
+
+
+@router.get("/concentration")
+def analytics_concentration(
+    request: Request,
+    universe: Optional[int] = Query(None, ge=1),
+):
+    """Market-cap concentration: HHI, its normalised form, effective number of coins, top shares."""
+    return cached_report(
+        request, "analytics_concentration", (universe,), lambda: concentration(current_frame(universe)[0])
+    )
+
+
+@router.get("/returns")
+def analytics_returns(
+    request: Request,
+    coins: Optional[str] = None,
+    top: int = Query(10, ge=2, le=ANALYTICS_MAX_COINS),
+    resolution: str = Query("1h", pattern="^(1h|1d)$"),
+    days: int = Query(30, ge=1, le=ANALYTICS_MAX_DAYS),
+    window: int = Query(24, ge=1, le=1000),
+):
+    """
+    Rolling `window`-bucket returns per coin from the hourly (`1h`) or daily
+    (`1d`) rollups over the last `days`. `coins` is a comma-separated list of
+    coin ids; without it, the `top` coins by market cap.
+    """
+    def build():
+        return rolling_returns(close_matrix(resolve_coins(coins, top), resolution, days), window)
+
+    return cached_report(request, "analytics_returns", (coins, top, resolution, days, window), build)
+
+
+@router.get("/correlation")
+def analytics_correlation(
+    request: Request,
+    coins: Optional[str] = None,
+    top: int = Query(10, ge=2, le=ANALYTICS_MAX_COINS),
+    resolution: str = Query("1h", pattern="^(1h|1d)$"),
+    days: int = Query(30, ge=1, le=ANALYTICS_MAX_DAYS),
+):
+    """
+    Correlation matrix of bucket-to-bucket returns across coins, from the
+    rollups over the last `days`. `coins`/`top` select coins as for returns.
+    """
+    def build():
+        return correlation(close_matrix(resolve_coins(coins, top), resolution, days))
+
+    return cached_report(request, "analytics_correlation", (coins, top, resolution, days), build)
@@ -3,60 +3,71 @@ Authentication router: login and signup endpoints.
 """
 from datetime import datetime
 from fastapi import APIRouter, HTTPException
+from fastapi.concurrency import run_in_threadpool
 
 from app.database import get_conn
 from app.models.schemas import LoginRequest, SignupRequest
 from app.services.auth import (
     hash_password,
-    verify_password,
+    verify_and_update_password,
     create_access_token,
-    get_user_from_db
+    get_user_from_db,
+    update_password_hash,
 )
+from app.services.hashing import hashing_executor
 
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
 
 
+def _insert_user(email: str, hashed: str, created_at: str):
+    with get_conn() as conn:
+        c = conn.cursor()
+        try:
+            c.execute(
+                "INSERT INTO users (email, hashed_password, created_at) VALUES (%s, %s, %s)",
+                (email, hashed, created_at)
+            )
+            conn.commit()
+        except Exception:
+            raise HTTPException(status_code=500, detail="Database error")
+
+
 @router.post("/signup")
-def signup(user_data: SignupRequest):
+async def signup(user_data: SignupRequest):
     """Register a new user."""
     # Check if user already exists
-    existing_user = get_user_from_db(user_data.email)
+    existing_user = await run_in_threadpool(get_user_from_db, user_data.email)
     if existing_user:
         raise HTTPException(status_code=400, detail="Email already registered")
     
-    # Hash password and store user
-    hashed = hash_password(user_data.password)
+    # Hash password (on the dedicated hashing pool) and store user
+    hashed = await hashing_executor.run(hash_password, user_data.password)
     created_at = datetime.utcnow().isoformat()
-    
-    conn = get_conn()
-    c = conn.cursor()
-    try:
-        c.execute(
-            "INSERT INTO users (email, hashed_password, created_at) VALUES (%s, %s, %s)",
-            (user_data.email, hashed, created_at)
-        )
-        conn.commit()
-    except Exception:
-        raise HTTPException(status_code=500, detail="Database error")
-    finally:
-        conn.close()
+    await run_in_threadpool(_insert_user, user_data.email, hashed, created_at)
     
     return {"status": "user created"}
 
 
 @router.post("/login")
-def login(user_data: LoginRequest):
+async def login(user_data: LoginRequest):
     """Authenticate user and return JWT token."""
     # Get user from database
-    user = get_user_from_db(user_data.email)
+    user = await run_in_threadpool(get_user_from_db, user_data.email)
     
     if not user:
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
-    # Verify password
-    if not verify_password(user_data.password, user["hashed_password"]):
+    # Verify password (on the dedicated hashing pool)
+    valid, new_hash = await hashing_executor.run(
+        verify_and_update_password, user_data.password, user["hashed_password"]
+    )
+    if not valid:
         raise HTTPException(status_code=401, detail="Invalid credentials")
+
+    # Bcrypt cost settings changed since this hash was made: store the upgraded hash
+    if new_hash:
+        await run_in_threadpool(update_password_hash, user["email"], new_hash)
     
     # Create and return token
     token = create_access_token({"sub": user["email"]})
@@ -2,101 +2,139 @@
 Data router: ingestion and reporting endpoints.
 """
 from datetime import datetime
-import requests
-from fastapi import APIRouter, HTTPException, Depends
-from psycopg2.extras import RealDictCursor
+from typing import Optional
 
-from app.database import get_conn
-from app.models.schemas import IngestRequest
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+
+from app.config import INGEST_DELTA_MODE, TIMESERIES_MAX_POINTS
+from app.models.schemas import IngestAccepted, IngestJob, IngestRequest
 from app.services.auth import get_current_user
+from app.services.cache import cached_report
+from app.services.columnar import FORMAT_PATTERN, negotiate_format
+from app.services.jobs import enqueue, get_job, job_runner, job_timing, list_jobs
+from app.services.rollups import query_rollup
+from app.services.snapshots import query_latest, query_coin_timeseries
+from app.services.timeseries import parse_interval
 
 
 router = APIRouter(tags=["Data"])
 
 
-@router.post("/ingest")
-def ingest_market_data(request: IngestRequest, user=Depends(get_current_user)):
+@router.post("/ingest", status_code=202, response_model=IngestAccepted)
+async def ingest_market_data(request: IngestRequest, response: Response, user=Depends(get_current_user)):
     """
-    Fetch market data from external API and store in database.
+    Queue a fetch of market data from an external API into the database and
+    return the job id at once; poll `GET /ingest/jobs/{id}` for the outcome.
+    Pages of a paged endpoint are fetched concurrently. With `delta`, only
+    coins whose values changed are stored (plus periodic full keyframes).
+    A request for a URL that already has a job waiting returns that job.
     Requires authentication.
     """
-    try:
-        headers = {"User-Agent": "DataDrive/1.0"}
-        response = requests.get(request.url, headers=headers, timeout=15)
-        response.raise_for_status()
-        data = response.json()
-
-        if not isinstance(data, list):
-            raise HTTPException(status_code=400, detail="Expected a list of market objects")
-
-        conn = get_conn()
-        c = conn.cursor()
-        ts = datetime.utcnow().isoformat()
-
-        for coin in data:
-            c.execute("""
-                INSERT INTO market_snapshots (
-                    coin_id, symbol, name,
-                    current_price, market_cap, total_volume,
-                    price_change_24h, price_change_pct_24h,
-                    high_24h, low_24h,
-                    circulating_supply, max_supply,
-                    ath, ath_change_pct,
-                    timestamp
-                )
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            """, (
-                coin.get("id"), coin.get("symbol"), coin.get("name"),
-                coin.get("current_price"), coin.get("market_cap"), coin.get("total_volume"),
-                coin.get("price_change_24h"), coin.get("price_change_percentage_24h"),
-                coin.get("high_24h"), coin.get("low_24h"),
-                coin.get("circulating_supply"), coin.get("max_supply"),
-                coin.get("ath"), coin.get("ath_change_percentage"),
-                ts
-            ))
-
-        conn.commit()
-        conn.close()
-
-        return {
-            "status": "success",
-            "records_ingested": len(data),
-            "timestamp": ts
-        }
-
-    except requests.RequestException as e:
-        raise HTTPException(status_code=400, detail=str(e))
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    job, created = await run_in_threadpool(
+        enqueue,
+        request.url,
+        pages=request.pages,
+        page_param=request.page_param,
+        stream=request.stream,
+        delta=INGEST_DELTA_MODE if request.delta is None else request.delta,
+        requested_by=user,
+    )
+    job_runner.notify()
+    response.headers["Location"] = f"/ingest/jobs/{job['id']}"
+    return {"job_id": job["id"], "status": job["status"], "deduplicated": not created}
+
+
+@router.get("/ingest/jobs", response_model=list[IngestJob])
+def ingest_jobs(
+    limit: int = Query(50, ge=1, le=500),
+    status: Optional[str] = Query(None, pattern="^(queued|running|complete|failed)$"),
+    user=Depends(get_current_user),
+):
+    """Recent ingest jobs, newest first. Requires authentication."""
+    return [dict(job, **job_timing(job)) for job in list_jobs(limit, status)]
+
+
+@router.get("/ingest/jobs/{job_id}", response_model=IngestJob)
+def ingest_job(job_id: int, user=Depends(get_current_user)):
+    """
+    Status, attempts, timing (seconds queued and running) and, once complete,
+    the ingest result of one job. Requires authentication.
+    """
+    job = get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return dict(job, **job_timing(job))
 
 
 @router.get("/report/latest")
-def latest_snapshot(limit: int = 50):
-    """Get the latest market snapshot, ordered by market cap."""
-    conn = get_conn()
-    cursor = conn.cursor(cursor_factory=RealDictCursor)
-    cursor.execute("""
-        SELECT * FROM market_snapshots
-        WHERE timestamp = (SELECT MAX(timestamp) FROM market_snapshots)
-        ORDER BY market_cap DESC
-        LIMIT %s
-    """, (limit,))
-    rows = cursor.fetchall()
-    conn.close()
-    return rows
+def latest_snapshot(
+    request: Request,
+    limit: int = 50,
+    format: Optional[str] = Query(None, pattern=FORMAT_PATTERN),
+):
+    """
+    Get the latest market snapshot, ordered by market cap.
+    `format` (or the Accept header) selects JSON, Arrow IPC or Parquet.
+    Served from the report cache until the next ingest commits.
+    """
+    fmt = negotiate_format(request.headers.get("accept"), format)
+    return cached_report(
+        request, "latest", (limit,), lambda: query_latest(limit, fmt != "json"), fmt
+    )
 
 
 @router.get("/report/coin/{coin_id}")
-def coin_timeseries(coin_id: str):
-    """Get time series data for a specific coin."""
-    conn = get_conn()
-    cursor = conn.cursor(cursor_factory=RealDictCursor)
-    cursor.execute("""
-        SELECT timestamp, current_price, market_cap, total_volume
-        FROM market_snapshots
-        WHERE coin_id = %s
-        ORDER BY timestamp
-    """, (coin_id,))
-    rows = cursor.fetchall()
-    conn.close()
-    return rows
+def coin_timeseries(
+    request: Request,
+    coin_id: str,
+    start: Optional[datetime] = Query(None, alias="from"),
+    end: Optional[datetime] = Query(None, alias="to"),
+    interval: Optional[str] = None,
+    max_points: Optional[int] = Query(None, ge=3, le=TIMESERIES_MAX_POINTS),
+    format: Optional[str] = Query(None, pattern=FORMAT_PATTERN),
+):
+    """
+    Get time series data for a specific coin.
+    - `from`/`to` bound the range, letting PostgreSQL skip partitions outside it.
+    - `interval` (e.g. 5m, 1h, 1d) returns OHLC buckets.
+    - `max_points` downsamples the result (raw rows or buckets) with LTTB.
+    - `format` (or the Accept header) selects JSON, Arrow IPC or Parquet.
+    Served from the report cache until the next ingest commits.
+    """
+    if interval is not None:
+        parse_interval(interval)  # reject bad intervals before caching
+    fmt = negotiate_format(request.headers.get("accept"), format)
+    return cached_report(
+        request,
+        "coin",
+        (coin_id, start, end, interval, max_points),
+        lambda: query_coin_timeseries(coin_id, start, end, interval, max_points, fmt != "json"),
+        fmt,
+    )
+
+
+@router.get("/report/coin/{coin_id}/rollup")
+def coin_rollup(
+    request: Request,
+    coin_id: str,
+    resolution: str = Query("1h", pattern="^(1h|1d)$"),
+    start: Optional[datetime] = Query(None, alias="from"),
+    end: Optional[datetime] = Query(None, alias="to"),
+    format: Optional[str] = Query(None, pattern=FORMAT_PATTERN),
+):
+    """
+    Get hourly (`1h`) or daily (`1d`) OHLC, market cap range and average volume
+    for a coin from the rollup tables, which every ingest keeps up to date.
+    Cost grows with the number of buckets, not raw rows, so long ranges are cheap.
+    `format` (or the Accept header) selects JSON, Arrow IPC or Parquet.
+    Served from the report cache until the next ingest commits.
+    """
+    fmt = negotiate_format(request.headers.get("accept"), format)
+    return cached_report(
+        request,
+        "rollup",
+        (coin_id, resolution, start, end),
+        lambda: query_rollup(coin_id, resolution, start, end, fmt != "json"),
+        fmt,
+    )
@@ -0,0 +1,178 @@
+"""
+Export router: streaming bulk exports of snapshot history as NDJSON, CSV,
+Arrow IPC or Parquet.
+"""
+import csv
+import io
+import uuid
+from datetime import datetime
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import StreamingResponse
+
+from app.config import EXPORT_CHUNK_ROWS
+from app.database import get_conn
+from app.services.auth import get_current_user
+from app.services.columnar import (
+    MEDIA_TYPES as COLUMNAR_MEDIA_TYPES,
+    cursor_schema,
+    negotiate_format,
+    record_batch,
+    stream_batches,
+)
+from app.services.serialization import dumps
+
+
+router = APIRouter(prefix="/export", tags=["Export"])
+
+SNAPSHOT_EXPORT_COLUMNS = (
+    "id", "batch_id", "coin_id", "symbol", "name",
+    "current_price", "market_cap", "total_volume",
+    "price_change_24h", "price_change_pct_24h",
+    "high_24h", "low_24h",
+    "circulating_supply", "max_supply",
+    "ath", "ath_change_pct",
+    "timestamp",
+)
+# Coin identity comes from the `coins` dimension, everything else from the snapshot
+_COIN_COLUMNS = ("coin_id", "symbol", "name")
+SNAPSHOT_EXPORT_SELECT = ", ".join(
+    ("c." if column in _COIN_COLUMNS else "s.") + column for column in SNAPSHOT_EXPORT_COLUMNS
+)
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+    "arrow": COLUMNAR_MEDIA_TYPES["arrow"],
+    "parquet": COLUMNAR_MEDIA_TYPES["parquet"],
+}
+FORMAT_PATTERN = "^(ndjson|csv|arrow|parquet)$"
+COLUMNAR_FORMATS = ("arrow", "parquet")
+
+
+# =================== ENCODING ===================
+def _encode_ndjson(columns, rows) -> bytes:
+    return b"".join(dumps(dict(zip(columns, row))) + b"\n" for row in rows)
+
+
+def _encode_csv(columns, rows) -> bytes:
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator="\n").writerows(
+        [value.isoformat() if isinstance(value, datetime) else value for value in row]
+        for row in rows
+    )
+    return buffer.getvalue().encode()
+
+
+def stream_query(query: str, params, columns, fmt: str, chunk_rows: int = EXPORT_CHUNK_ROWS):
+    """
+    Yield the encoded result of `query` in chunks of `chunk_rows` rows.
+    A named (server-side) cursor keeps only one chunk in memory at a time;
+    the pooled connection is held until the generator finishes or is closed.
+    Arrow and Parquet are written one record batch (row group) per chunk.
+    """
+    if fmt in COLUMNAR_FORMATS:
+        yield from _stream_columnar(query, params, fmt, chunk_rows)
+        return
+    encode = _encode_csv if fmt == "csv" else _encode_ndjson
+    if fmt == "csv":
+        yield _encode_csv(columns, [columns])
+    with get_conn() as conn:
+        cursor = conn.cursor(name=f"export_{uuid.uuid4().hex}")
+        cursor.itersize = chunk_rows
+        try:
+            cursor.execute(query, params)
+            while True:
+                rows = cursor.fetchmany(chunk_rows)
+                if not rows:
+                    break
+                yield encode(columns, rows)
+        finally:
+            cursor.close()
+            conn.rollback()
+
+
+def _stream_columnar(query: str, params, fmt: str, chunk_rows: int):
+    with get_conn() as conn:
+        cursor = conn.cursor(name=f"export_{uuid.uuid4().hex}")
+        cursor.itersize = chunk_rows
+        try:
+            cursor.execute(query, params)
+            # A named cursor only has a description after its first fetch
+            rows = cursor.fetchmany(chunk_rows)
+            schema = cursor_schema(cursor)
+
+            def batches(rows):
+                while rows:
+                    yield record_batch(schema, rows)
+                    rows = cursor.fetchmany(chunk_rows)
+
+            yield from stream_batches(schema, batches(rows), fmt)
+        finally:
+            cursor.close()
+            conn.rollback()
+
+
+def _range_conditions(start, end, conditions, params):
+    if start is not None:
+        conditions.append("s.timestamp >= %s")
+        params.append(start)
+    if end is not None:
+        conditions.append("s.timestamp < %s")
+        params.append(end)
+
+
+def _streaming_response(query, params, columns, fmt, filename):
+    if fmt in COLUMNAR_FORMATS:
+        negotiate_format(None, fmt)  # 406 without pyarrow
+    headers = {}
+    if fmt in ("csv", "parquet"):
+        headers["Content-Disposition"] = f'attachment; filename="{filename}.{fmt}"'
+    return StreamingResponse(
+        stream_query(query, params, columns, fmt),
+        media_type=MEDIA_TYPES[fmt],
+        headers=headers,
+    )
+
+
+# =================== ENDPOINTS ===================
+@router.get("/snapshots")
+def export_snapshots(
+    start: Optional[datetime] = Query(None, alias="from"),
+    end: Optional[datetime] = Query(None, alias="to"),
+    format: str = Query("ndjson", pattern=FORMAT_PATTERN),
+    user=Depends(get_current_user),
+):
+    """Stream every snapshot row in the range as NDJSON, CSV, Arrow or Parquet. Requires authentication."""
+    conditions, params = ["TRUE"], []
+    _range_conditions(start, end, conditions, params)
+    query = f"""
+        SELECT {SNAPSHOT_EXPORT_SELECT}
+        FROM market_snapshots s
+        LEFT JOIN coins c ON c.id = s.coin_key
+        WHERE {" AND ".join(conditions)}
+        ORDER BY s.timestamp, s.id
+    """
+    return _streaming_response(query, params, SNAPSHOT_EXPORT_COLUMNS, format, "snapshots")
+
+
+@router.get("/coin/{coin_id}")
+def export_coin(
+    coin_id: str,
+    start: Optional[datetime] = Query(None, alias="from"),
+    end: Optional[datetime] = Query(None, alias="to"),
+    format: str = Query("ndjson", pattern=FORMAT_PATTERN),
+    user=Depends(get_current_user),
+):
+    """Stream the full history of one coin as NDJSON, CSV, Arrow or Parquet. Requires authentication."""
+    conditions, params = ["c.coin_id = %s"], [coin_id]
+    _range_conditions(start, end, conditions, params)
+    query = f"""
+        SELECT {SNAPSHOT_EXPORT_SELECT}
+        FROM market_snapshots s
+        JOIN coins c ON c.id = s.coin_key
+        WHERE {" AND ".join(conditions)}
+        ORDER BY s.timestamp
+    """
+    return _streaming_response(query, params, SNAPSHOT_EXPORT_COLUMNS, format, coin_id)
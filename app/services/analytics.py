@@ -0,0 +1,207 @@
+"""
+Market analytics computed server-side with pandas/NumPy: cross-sectional
+statistics of the current batch (overview, movers, volatility, market-cap
+concentration) and rolling returns and correlations from the rollups.
+Routers serve them through the report cache, so each runs once per batch.
+"""
+from datetime import timedelta
+
+from fastapi import HTTPException
+
+from app.config import ANALYTICS_MAX_COINS
+from app.database import get_conn
+from app.services.rollups import ROLLUPS
+from app.services.snapshots import current_chain, execute_latest
+
+# Coin identity carried into ranked lists
+IDENTITY = ["coin_id", "symbol", "name"]
+
+NUMERIC_COLUMNS = (
+    "current_price", "market_cap", "total_volume", "price_change_24h",
+    "price_change_pct_24h", "high_24h", "low_24h", "circulating_supply",
+    "max_supply", "ath", "ath_change_pct",
+)
+
+# Rollup bucket unit -> pandas frequency
+_FREQUENCIES = {"hour": "h", "day": "D"}
+
+
+def _float(value):
+    """Plain float, or None for missing values and NaN."""
+    return None if value is None or value != value else float(value)
+
+
+def _records(frame, columns) -> list:
+    return frame[columns].to_dict("records")
+
+
+# =================== CURRENT BATCH ===================
+def current_frame(universe: int = None):
+    """
+    Rows of the current batch as a DataFrame ordered by market cap, limited
+    to the top `universe` coins (all when None), with the batch's chain.
+    Raises 404 before the first ingest.
+    """
+    import pandas as pd
+
+    with get_conn() as conn:
+        chain = current_chain(conn)
+        if chain is None:
+            raise HTTPException(status_code=404, detail="No market data ingested yet")
+        cursor = conn.cursor()
+        execute_latest(cursor, chain, universe)
+        names = [column.name for column in cursor.description]
+        rows = cursor.fetchall()
+    frame = pd.DataFrame.from_records(rows, columns=names)
+    for column in NUMERIC_COLUMNS:
+        frame[column] = frame[column].astype(float)
+    return frame, chain
+
+
+def overview(frame, chain) -> dict:
+    """Market totals and averages, breadth and the largest asset."""
+    import numpy as np
+
+    caps = frame["market_cap"]
+    change = frame["price_change_pct_24h"]
+    weighted = change.notna() & caps.notna()
+    total_cap = caps.sum()
+    top = frame.loc[caps.idxmax()] if caps.notna().any() else None
+    return {
+        "batch_id": chain.batch_id,
+        "timestamp": chain.started_at,
+        "coins": len(frame),
+        "total_market_cap": _float(total_cap),
+        "total_volume": _float(frame["total_volume"].sum()),
+        "average_price": _float(frame["current_price"].mean()),
+        "average_change_pct_24h": _float(change.mean()),
+        "median_change_pct_24h": _float(change.median()),
+        # Market-cap weighted: how the market as a whole moved
+        "weighted_change_pct_24h": _float(
+            np.average(change[weighted], weights=caps[weighted]) if weighted.any() else None
+        ),
+        "change_dispersion_pct_24h": _float(change.std()),
+        "advancers": int((change > 0).sum()),
+        "decliners": int((change < 0).sum()),
+        "top_asset": None if top is None else {
+            "coin_id": top["coin_id"],
+            "symbol": top["symbol"],
+            "name": top["name"],
+            "market_cap": _float(top["market_cap"]),
+            "share": _float(top["market_cap"] / total_cap) if total_cap else None,
+        },
+    }
+
+
+def movers(frame, n: int) -> dict:
+    """The `n` largest gainers and losers by 24h price change."""
+    ranked = frame.dropna(subset=["price_change_pct_24h"])
+    columns = IDENTITY + ["current_price", "price_change_pct_24h", "market_cap"]
+    return {
+        "gainers": _records(ranked.nlargest(n, "price_change_pct_24h"), columns),
+        "losers": _records(ranked.nsmallest(n, "price_change_pct_24h"), columns),
+    }
+
+
+def volatility(frame, n: int, by: str = "range_pct") -> list:
+    """
+    The `n` coins with the widest 24h high-low range, absolute (`range`)
+    or relative to the current price (`range_pct`).
+    """
+    ranges = frame.assign(range=frame["high_24h"] - frame["low_24h"])
+    ranges["range_pct"] = ranges["range"] / ranges["current_price"].where(ranges["current_price"] > 0) * 100
+    ranked = ranges.dropna(subset=[by]).nlargest(n, by)
+    return _records(ranked, IDENTITY + ["current_price", "high_24h", "low_24h", "range", "range_pct"])
+
+
+def concentration(frame) -> dict:
+    """
+    Market-cap concentration: the Herfindahl-Hirschman index of market-cap
+    shares (1/N when equal, 1 for a single coin), its normalised form, the
+    equivalent number of equal-sized coins and the top coins' shares.
+    """
+    caps = frame["market_cap"]
+    caps = caps[caps > 0].sort_values(ascending=False)
+    count = len(caps)
+    if not count:
+        return {"coins": 0, "hhi": None, "hhi_points": None, "normalized_hhi": None,
+                "effective_coins": None, "top_shares": {}}
+    shares = caps.to_numpy() / caps.sum()
+    hhi = float((shares ** 2).sum())
+    cumulative = shares.cumsum()
+    return {
+        "coins": count,
+        "hhi": hhi,
+        "hhi_points": round(hhi * 10_000, 1),
+        "normalized_hhi": (hhi - 1 / count) / (1 - 1 / count) if count > 1 else 1.0,
+        "effective_coins": 1 / hhi,
+        "top_shares": {str(k): float(cumulative[min(k, count) - 1]) for k in (1, 5, 10)},
+    }
+
+
+# =================== HISTORY ===================
+def resolve_coins(coins: str = None, top: int = 10) -> list:
+    """Coin ids from a comma-separated `coins`, else the `top` coins by current market cap."""
+    if coins:
+        ids = list(dict.fromkeys(part.strip() for part in coins.split(",") if part.strip()))
+    else:
+        frame, _ = current_frame(top)
+        ids = frame["coin_id"].dropna().tolist()
+    if len(ids) > ANALYTICS_MAX_COINS:
+        raise HTTPException(status_code=400, detail=f"At most {ANALYTICS_MAX_COINS} coins")
+    return ids
+
+
+def close_matrix(coin_ids: list, resolution: str, days: int):
+    """
+    Closing prices from the rollups as a DataFrame: one column per coin (in
+    `coin_ids` order, missing coins dropped) on a regular bucket grid ending
+    at the current batch, with gaps carried forward.
+    """
+    import pandas as pd
+
+    table, unit = ROLLUPS[resolution]
+    with get_conn() as conn:
+        chain = current_chain(conn)
+        if chain is None:
+            raise HTTPException(status_code=404, detail="No market data ingested yet")
+        cursor = conn.cursor()
+        cursor.execute(f"""
+            /* analytics_closes */
+            SELECT c.coin_id, r.bucket, r.close
+            FROM {table} r
+            JOIN coins c ON c.id = r.coin_key
+            WHERE c.coin_id = ANY(%s) AND r.bucket >= %s AND r.bucket <= %s
+            ORDER BY r.bucket
+        """, (coin_ids, chain.started_at - timedelta(days=days), chain.started_at))
+        rows = cursor.fetchall()
+    if not rows:
+        return pd.DataFrame(dtype=float)
+    closes = pd.DataFrame.from_records(rows, columns=["coin_id", "bucket", "close"]).pivot(
+        index="bucket", columns="coin_id", values="close"
+    ).astype(float)
+    grid = pd.date_range(closes.index.min(), closes.index.max(), freq=_FREQUENCIES[unit])
+    closes = closes.reindex(grid).ffill()
+    return closes[[coin for coin in coin_ids if coin in closes.columns]]
+
+
+def rolling_returns(closes, window: int) -> dict:
+    """Compounded return of each coin over the trailing `window` buckets, per bucket."""
+    returns = closes / closes.shift(window) - 1
+    return {
+        "coins": list(returns.columns),
+        "timestamps": [ts.isoformat() for ts in returns.index],
+        "returns": {coin: returns[coin].tolist() for coin in returns.columns},
+        "latest": {coin: _float(returns[coin].iloc[-1]) for coin in returns.columns},
+    }
+
+
+def correlation(closes, min_periods: int = 3) -> dict:
+    """Pearson correlation matrix of the coins' bucket-to-bucket returns."""
+    returns = (closes / closes.shift(1) - 1).iloc[1:]
+    matrix = returns.corr(min_periods=min_periods)
+    return {
+        "coins": list(matrix.columns),
+        "matrix": matrix.to_numpy().tolist(),
+        "observations": {coin: int(count) for coin, count in returns.count().items()},
+    }
@@ -6,14 +6,29 @@ from fastapi import Depends, HTTPException
 from fastapi.security import OAuth2PasswordBearer
 from passlib.context import CryptContext
 from jose import jwt, JWTError
-from psycopg2.extras import RealDictCursor
 
-from app.config import SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES
-from app.database import get_conn
+from app.config import (
+    SECRET_KEY,
+    ALGORITHM,
+    ACCESS_TOKEN_EXPIRE_MINUTES,
+    BCRYPT_ROUNDS,
+    AZURE_CLIENT_ID,
+    AZURE_TENANT_ID,
+)
+from app.database import get_conn, TimedRealDictCursor
+from app.services.jwks import jwks_cache
+from app.services.token_cache import token_cache
 
 
 # =================== SECURITY SETUP ===================
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Pinning min/max to the default makes verify_and_update rehash on any cost change
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS,
+)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
 
@@ -28,6 +43,11 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 
+def verify_and_update_password(plain_password: str, hashed_password: str):
+    """Verify a password; also return a fresh hash if the stored one uses outdated settings."""
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+
 # =================== JWT UTILS ===================
 def create_access_token(data: dict, expires_minutes: int = ACCESS_TOKEN_EXPIRE_MINUTES) -> str:
     """Create a JWT access token."""
@@ -39,64 +59,84 @@ def create_access_token(data: dict, expires_minutes: int = ACCESS_TOKEN_EXPIRE_M
 # =================== USER DATABASE ===================
 def get_user_from_db(email: str):
     """Lookup user by email from database."""
-    conn = get_conn()
-    cursor = conn.cursor(cursor_factory=RealDictCursor)
-    cursor.execute("SELECT * FROM users WHERE email = %s", (email,))
-    user = cursor.fetchone()
-    conn.close()
-    return user
+    with get_conn() as conn:
+        cursor = conn.cursor(cursor_factory=TimedRealDictCursor)
+        cursor.execute("SELECT * FROM users WHERE email = %s", (email,))
+        return cursor.fetchone()
 
 
-# =================== AUTH DEPENDENCY ===================
-def get_current_user(token: str = Depends(oauth2_scheme)) -> str:
-    """
-    FastAPI dependency to validate JWT and return current user email.
-    Supports BOTH:
-      1. Old JWT tokens (from email/password login)
-      2. Microsoft ID tokens (from Entra ID login)
-    """
-    # --- Attempt 1: Old JWT (email/password login) ---
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        return payload["sub"]
-    except JWTError:
-        pass
+def update_password_hash(email: str, hashed_password: str):
+    """Store a rehashed password for an existing user."""
+    with get_conn() as conn:
+        c = conn.cursor()
+        c.execute("UPDATE users SET hashed_password = %s WHERE email = %s", (hashed_password, email))
+        conn.commit()
 
-    # --- Attempt 2: Microsoft ID Token (Entra ID login) ---
-    try:
-        from app.config import AZURE_CLIENT_ID, AZURE_TENANT_ID
 
-        # Decode without signature verification for PoC
-        # (In production, verify against Microsoft's JWKS)
+# =================== AUTH DEPENDENCY ===================
+def _verify_entra_token(token: str, kid: str) -> dict:
+    """Verify a Microsoft ID token's signature against the cached JWKS."""
+    key = jwks_cache.get_key(kid)
+    if key is None:
+        raise HTTPException(status_code=401, detail="Unknown token signing key")
+    try:
         payload = jwt.decode(
             token,
-            options={"verify_signature": False, "verify_aud": False}
+            key,
+            algorithms=["RS256"],
+            audience=AZURE_CLIENT_ID,
+            options={"verify_aud": bool(AZURE_CLIENT_ID), "verify_at_hash": False},
         )
+    except JWTError:
+        raise HTTPException(status_code=401, detail="Invalid or expired token")
 
-        # Validate issuer matches our tenant
-        issuer = payload.get("iss", "")
-        if AZURE_TENANT_ID and AZURE_TENANT_ID not in issuer:
-            raise HTTPException(status_code=401, detail="Invalid token issuer")
+    # Validate issuer matches our tenant
+    issuer = payload.get("iss", "")
+    if AZURE_TENANT_ID and AZURE_TENANT_ID not in issuer:
+        raise HTTPException(status_code=401, detail="Invalid token issuer")
+    return payload
 
-        # Validate audience matches our client ID
-        aud = payload.get("aud", "")
-        if AZURE_CLIENT_ID and aud != AZURE_CLIENT_ID:
-            raise HTTPException(status_code=401, detail="Invalid token audience")
 
+def get_current_user(token: str = Depends(oauth2_scheme)) -> str:
+    """
+    FastAPI dependency to validate JWT and return current user email.
+    Supports BOTH:
+      1. Old JWT tokens (from email/password login), signed with SECRET_KEY
+      2. Microsoft ID tokens (from Entra ID login), verified against Entra's JWKS
+    The token type is picked from its header. Verified tokens are cached
+    until they expire, so repeat requests skip signature checks entirely.
+    """
+    user = token_cache.get(token)
+    if user is not None:
+        return user
+
+    try:
+        header = jwt.get_unverified_header(token)
+    except JWTError:
+        raise HTTPException(status_code=401, detail="Invalid or expired token")
+
+    alg, kid = header.get("alg"), header.get("kid")
+    if alg == ALGORITHM and not kid:
+        # --- Old JWT (email/password login) ---
+        try:
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        except JWTError:
+            raise HTTPException(status_code=401, detail="Invalid or expired token")
+        user = payload.get("sub")
+    elif alg == "RS256" and kid:
+        # --- Microsoft ID Token (Entra ID login) ---
+        payload = _verify_entra_token(token, kid)
         # Extract user email from Microsoft token claims
-        email = (
+        user = (
             payload.get("preferred_username")
             or payload.get("email")
             or payload.get("upn")
             or payload.get("sub")
         )
-        if email:
-            return email
-
-    except HTTPException:
-        raise
-    except Exception:
-        pass
-
-    raise HTTPException(status_code=401, detail="Invalid or expired token")
+    else:
+        raise HTTPException(status_code=401, detail="Invalid or expired token")
 
+    if not user:
+        raise HTTPException(status_code=401, detail="Invalid or expired token")
+    token_cache.put(token, user, payload.get("exp"))
+    return user
@@ -0,0 +1,164 @@
+"""
+In-process report cache keyed by endpoint, parameters and current ingest batch.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from fastapi import Request, Response
+
+from app.config import (
+    COMPRESSION_ENABLED,
+    COMPRESSION_MIN_SIZE,
+    REPORT_CACHE_SIZE,
+    REPORT_CACHE_TTL,
+    REPORT_CACHE_BATCH_TTL,
+)
+from app.database import get_conn
+from app.services.columnar import MEDIA_TYPES, encode_table
+from app.services.compression import compress, negotiate
+from app.services.serialization import dumps
+
+
+class ReportCache:
+    """
+    Bounded LRU of rendered report bodies with per-entry TTL. Each entry also
+    keeps the compressed variants of its body, built on first request.
+
+    Keys include the current batch id, so an ingest commit makes every older
+    entry unreachable; `invalidate` also drops them eagerly. The current batch
+    id itself is cached for `batch_ttl` seconds, which is how long another
+    worker process's ingest can go unnoticed here.
+    """
+
+    def __init__(self, max_entries: int = REPORT_CACHE_SIZE, ttl: float = REPORT_CACHE_TTL,
+                 batch_ttl: float = REPORT_CACHE_BATCH_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.batch_ttl = batch_ttl
+        self._entries = OrderedDict()   # key -> (etag, body, expires_at, {encoding: body})
+        self._lock = threading.Lock()
+        self._batch_id = None
+        self._batch_checked_at = 0.0
+        self.hits = 0
+        self.misses = 0
+
+    # ---- current batch ----
+    def current_batch_id(self):
+        """Current batch id, re-read from the database at most every `batch_ttl` seconds."""
+        now = time.monotonic()
+        if now - self._batch_checked_at < self.batch_ttl:
+            return self._batch_id
+        with get_conn() as conn:
+            c = conn.cursor()
+            c.execute("SELECT batch_id FROM ingest_current")
+            row = c.fetchone()
+        batch_id = row[0] if row else None
+        with self._lock:
+            if batch_id != self._batch_id:
+                self._entries.clear()
+            self._batch_id = batch_id
+            self._batch_checked_at = now
+        return batch_id
+
+    def invalidate(self, batch_id=None):
+        """Drop every entry; called when an ingest commits `batch_id`."""
+        with self._lock:
+            self._entries.clear()
+            self._batch_id = batch_id
+            self._batch_checked_at = time.monotonic() if batch_id is not None else 0.0
+
+    # ---- entries ----
+    @staticmethod
+    def etag(key) -> str:
+        return '"' + hashlib.sha1(repr(key).encode()).hexdigest()[:20] + '"'
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[2] < time.monotonic():
+                self.misses += 1
+                if entry is not None:
+                    del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def set(self, key, body: bytes):
+        entry = (self.etag(key), body, time.monotonic() + self.ttl, {})
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "batch_id": self._batch_id,
+            }
+
+
+report_cache = ReportCache()
+
+
+def _variant_etag(etag: str, encoding) -> str:
+    """ETag of one encoding of a report: each is a distinct representation, so gets its own strong tag."""
+    return etag if encoding is None else f'{etag[:-1]}-{encoding}"'
+
+
+def _matched_etag(if_none_match: str, etag: str):
+    """The tag in `If-None-Match` naming any encoding of the report tagged `etag`, or None."""
+    if not if_none_match:
+        return None
+    prefix = etag[:-1] + "-"
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*":
+            return etag
+        tag = tag.removeprefix("W/")
+        if tag == etag or (tag.startswith(prefix) and tag.endswith('"')):
+            return tag
+    return None
+
+
+def cached_report(request: Request, endpoint: str, params: tuple, build, fmt: str = "json") -> Response:
+    """
+    Serve a report through the cache. `build()` runs only on a miss and returns
+    the JSON-serialisable result, or an Arrow table for the `arrow` and
+    `parquet` formats. Clients revalidating with `If-None-Match` get a
+    bodiless 304 without touching the report query. Bodies are compressed
+    once per negotiated encoding and then served from the cache; each
+    encoding carries its own ETag (`"<tag>-gzip"`), any of which revalidates.
+    """
+    key = (endpoint, params, fmt, report_cache.current_batch_id())
+    etag = report_cache.etag(key)
+    headers = {"Cache-Control": "no-cache", "Vary": "Accept, Accept-Encoding"}
+    matched = _matched_etag(request.headers.get("if-none-match"), etag)
+    if matched is not None:
+        headers["ETag"] = matched
+        return Response(status_code=304, headers=headers)
+
+    entry = report_cache.get(key)
+    if entry is None:
+        result = build()
+        entry = report_cache.set(key, dumps(result) if fmt == "json" else encode_table(result, fmt))
+    body, variants = entry[1], entry[3]
+    encoding = None
+    # Parquet pages are compressed already
+    if COMPRESSION_ENABLED and fmt != "parquet" and len(body) >= COMPRESSION_MIN_SIZE:
+        encoding = negotiate(request.headers.get("accept-encoding"))
+    if encoding is not None:
+        compressed = variants.get(encoding)
+        if compressed is None:
+            compressed = variants[encoding] = compress(body, encoding)
+        body = compressed
+        headers["Content-Encoding"] = encoding
+    headers["ETag"] = _variant_etag(etag, encoding)
+    return Response(content=body, media_type=MEDIA_TYPES[fmt], headers=headers)
@@ -0,0 +1,98 @@
+"""
+Coin dimension: maps upstream coin ids to the integer keys stored in snapshots.
+"""
+import threading
+
+from psycopg2.extras import execute_values
+
+
+class CoinRegistry:
+    """
+    In-process copy of the `coins` table: coin_id -> (key, symbol, name).
+
+    Known coins with an unchanged symbol and name resolve without a query.
+    New or renamed coins are upserted in one statement in the ingest's own
+    transaction, and their entries are kept aside until it commits
+    (`publish`), so no other ingest uses a key that may still roll back.
+    Keys never change once assigned, so entries never go stale.
+    """
+
+    def __init__(self):
+        self._coins = {}
+        self._lock = threading.Lock()
+
+    def resolve(self, conn, records, pending: dict, lock=None) -> dict:
+        """
+        Key of every coin in `records` (upstream dicts). Unknown or renamed
+        coins are upserted in `conn`'s transaction and their entries added to
+        `pending`, which the caller publishes once that transaction commits.
+        `lock(conn)` runs first, so concurrent transactions upserting
+        overlapping coins queue instead of deadlocking.
+        """
+        coins = self._coins
+        changed = {}
+        for record in records:
+            coin_id = record.get("id")
+            if coin_id is None:
+                continue
+            meta = (record.get("symbol"), record.get("name"))
+            known = pending.get(coin_id) or coins.get(coin_id)
+            if known is None or known[1:] != meta:
+                changed[coin_id] = meta
+        if changed:
+            if lock is not None:
+                lock(conn)
+            pending.update(self._upsert(conn, changed))
+        keys = {}
+        for record in records:
+            known = pending.get(record.get("id")) or coins.get(record.get("id"))
+            if known is not None:
+                keys[record["id"]] = known[0]
+        return keys
+
+    def publish(self, entries: dict):
+        """Share entries resolved by an ingest whose transaction has committed."""
+        with self._lock:
+            self._coins.update(entries)
+
+    def cached_key(self, coin_id):
+        """Key of a coin already resolved in this process, else None."""
+        known = self._coins.get(coin_id)
+        return known[0] if known else None
+
+    def lookup(self, conn, coin_id: str):
+        """Key of `coin_id`, read through to the database on a miss; None if unknown."""
+        key = self.cached_key(coin_id)
+        if key is not None:
+            return key
+        c = conn.cursor()
+        c.execute("SELECT id, symbol, name FROM coins WHERE coin_id = %s", (coin_id,))
+        row = c.fetchone()
+        if row is None:
+            return None
+        with self._lock:
+            self._coins[coin_id] = tuple(row)
+        return row[0]
+
+    @staticmethod
+    def _upsert(conn, changed: dict) -> dict:
+        rows = execute_values(
+            conn.cursor(),
+            """
+            INSERT INTO coins (coin_id, symbol, name) VALUES %s
+            ON CONFLICT (coin_id) DO UPDATE
+                SET symbol = EXCLUDED.symbol, name = EXCLUDED.name
+            RETURNING coin_id, id, symbol, name
+            """,
+            [(coin_id, symbol, name) for coin_id, (symbol, name) in changed.items()],
+            page_size=1000,
+            fetch=True,
+        )
+        return {coin_id: (key, symbol, name) for coin_id, key, symbol, name in rows}
+
+    def clear(self):
+        with self._lock:
+            self._coins.clear()
+
+
+coin_registry = CoinRegistry()
@@ -0,0 +1,167 @@
+"""
+Columnar responses: Apache Arrow IPC streams and Parquet files built
+column-wise from DB cursors. Needs the optional `pyarrow` package.
+"""
+import io
+from typing import Optional
+
+from fastapi import HTTPException
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # optional dependency
+    pa = pq = None
+
+MEDIA_TYPES = {
+    "json": "application/json",
+    "arrow": "application/vnd.apache.arrow.stream",
+    "parquet": "application/vnd.apache.parquet",
+}
+FORMAT_PATTERN = "^(json|arrow|parquet)$"
+BATCH_ROWS = 10000
+
+# PostgreSQL type OIDs -> Arrow type factories
+_ARROW_TYPES = {
+    16: lambda: pa.bool_(),
+    20: lambda: pa.int64(), 21: lambda: pa.int64(), 23: lambda: pa.int64(),
+    700: lambda: pa.float64(), 701: lambda: pa.float64(), 1700: lambda: pa.float64(),
+    25: lambda: pa.string(), 1043: lambda: pa.string(), 19: lambda: pa.string(),
+    1114: lambda: pa.timestamp("us"),
+    1184: lambda: pa.timestamp("us", tz="UTC"),
+}
+
+
+def negotiate_format(accept: Optional[str], requested: Optional[str] = None) -> str:
+    """
+    Response format from an explicit `format=` parameter, else the Accept
+    header; JSON unless the client asks for Arrow or Parquet.
+    """
+    fmt = requested
+    if fmt is None:
+        accept = (accept or "").lower()
+        fmt = next(
+            (name for name, media in MEDIA_TYPES.items() if name != "json" and media in accept),
+            "json",
+        )
+    if fmt != "json" and pa is None:
+        raise HTTPException(status_code=406, detail=f"{fmt} responses need pyarrow on the server")
+    return fmt
+
+
+# =================== BUILDING ===================
+def cursor_schema(cursor):
+    """Arrow schema of a cursor's result, typed from the column type OIDs."""
+    return pa.schema([
+        (column.name, _ARROW_TYPES.get(column.type_code, pa.string)())
+        for column in cursor.description
+    ])
+
+
+def record_batch(schema, rows):
+    """One record batch from row tuples, transposed column by column."""
+    columns = list(zip(*rows)) if rows else [()] * len(schema)
+    return pa.record_batch(
+        [_array(values, field.type) for values, field in zip(columns, schema)],
+        schema=schema,
+    )
+
+
+def _array(values, type):
+    try:
+        return pa.array(values, type=type)
+    except pa.ArrowInvalid:
+        # NUMERIC arrives as Decimal, which Arrow will not convert to double directly
+        return pa.array(values).cast(type)
+
+
+def iter_batches(cursor, schema, batch_rows: int = BATCH_ROWS):
+    """Record batches of at most `batch_rows` rows, fetched chunk by chunk."""
+    while True:
+        rows = cursor.fetchmany(batch_rows)
+        if not rows:
+            return
+        yield record_batch(schema, rows)
+
+
+def table_from_cursor(cursor):
+    """The remaining rows of an executed tuple cursor as an Arrow table."""
+    schema = cursor_schema(cursor)
+    return pa.Table.from_batches(list(iter_batches(cursor, schema)), schema=schema)
+
+
+def table_from_rows(names, rows, types: dict = None):
+    """
+    Arrow table from row tuples assembled in Python. Column types are inferred
+    unless given in `types`; all-NULL columns become float64.
+    """
+    types = types or {}
+    columns = list(zip(*rows)) if rows else [()] * len(names)
+    arrays = []
+    for name, values in zip(names, columns):
+        array = pa.array(values, type=types.get(name))
+        if pa.types.is_null(array.type) or pa.types.is_decimal(array.type):
+            array = array.cast(pa.float64())
+        elif pa.types.is_timestamp(array.type) and array.type.tz is not None:
+            array = array.cast(pa.timestamp("us", tz="UTC"))
+        arrays.append(array)
+    return pa.Table.from_arrays(arrays, names=list(names))
+
+
+# =================== ENCODING ===================
+class _Sink(io.RawIOBase):
+    """Write-only file collecting bytes until drained."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data, self._chunks = b"".join(self._chunks), []
+        return data
+
+
+def _writer(sink, schema, fmt: str):
+    if fmt == "parquet":
+        return pq.ParquetWriter(pa.PythonFile(sink, mode="w"), schema, compression="zstd")
+    return pa.ipc.new_stream(pa.PythonFile(sink, mode="w"), schema)
+
+
+def encode_table(table, fmt: str) -> bytes:
+    """
+    Whole table as an Arrow IPC stream or a Parquet file. An empty list (the
+    reports' "no data" result) encodes as a table without columns.
+    """
+    if isinstance(table, list):
+        table = pa.table({})
+    sink = _Sink()
+    with _writer(sink, table.schema, fmt) as writer:
+        writer.write_table(table)
+    return sink.drain()
+
+
+def stream_batches(schema, batches, fmt: str):
+    """
+    Yield an Arrow IPC stream or Parquet file incrementally, one record batch
+    (Parquet row group) at a time, so memory stays bounded by a batch.
+    """
+    sink = _Sink()
+    writer = _writer(sink, schema, fmt)
+    try:
+        for batch in batches:
+            if fmt == "parquet":
+                writer.write_table(pa.Table.from_batches([batch], schema=schema))
+            else:
+                writer.write_batch(batch)
+            chunk = sink.drain()
+            if chunk:
+                yield chunk
+    finally:
+        writer.close()
+    yield sink.drain()
@@ -0,0 +1,146 @@
+"""
+Negotiated response compression: brotli when the optional `brotli` package is
+installed and the client accepts it, else gzip.
+"""
+import zlib
+
+from app.config import BROTLI_QUALITY, COMPRESSION_MIN_SIZE, GZIP_LEVEL
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+# In order of preference
+ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+
+COMPRESSIBLE_TYPES = (
+    "application/json",
+    "application/x-ndjson",
+    "application/vnd.apache.arrow.stream",
+    "text/",
+)
+
+
+def negotiate(accept_encoding: str):
+    """Best supported encoding allowed by an Accept-Encoding header, or None."""
+    if not accept_encoding:
+        return None
+    accepted = {}
+    for part in accept_encoding.split(","):
+        token, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[token.strip().lower()] = quality
+    for encoding in ENCODINGS:
+        quality = accepted.get(encoding, accepted.get("*", 0.0))
+        if quality > 0:
+            return encoding
+    return None
+
+
+def compressor(encoding: str):
+    """Streaming compressor for `encoding`: `flush(chunk)` per streamed chunk, `finish(chunk)` at the end."""
+    if encoding == "br":
+        return _Brotli()
+    return _Gzip()
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    """Whole-body compression, for bodies that are cached and served repeatedly."""
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return _Gzip().finish(body)
+
+
+class _Gzip:
+    def __init__(self):
+        self._z = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def flush(self, chunk: bytes) -> bytes:
+        return self._z.compress(chunk) + self._z.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, chunk: bytes = b"") -> bytes:
+        return self._z.compress(chunk) + self._z.flush()
+
+
+class _Brotli:
+    def __init__(self):
+        self._c = brotli.Compressor(quality=BROTLI_QUALITY)
+
+    def flush(self, chunk: bytes) -> bytes:
+        return self._c.process(chunk) + self._c.flush()
+
+    def finish(self, chunk: bytes = b"") -> bytes:
+        return self._c.process(chunk) + self._c.finish()
+
+
+def _is_compressible(headers) -> bool:
+    content_type = headers.get(b"content-type", b"").decode("latin-1").lower()
+    return (
+        b"content-encoding" not in headers
+        and content_type.startswith(COMPRESSIBLE_TYPES)
+    )
+
+
+class CompressionMiddleware:
+    """
+    ASGI middleware compressing JSON, NDJSON, Arrow and text responses of at least
+    `min_size` bytes. Streamed responses are compressed chunk by chunk, each
+    chunk flushed so clients can decode rows as they arrive. Responses that
+    already carry a Content-Encoding (pre-compressed cached reports) pass
+    through untouched.
+    """
+
+    def __init__(self, app, min_size: int = COMPRESSION_MIN_SIZE):
+        self.app = app
+        self.min_size = min_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope["headers"])
+        encoding = negotiate(headers.get(b"accept-encoding", b"").decode("latin-1"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start = None
+        stream = None   # compressor once compression has started, False for pass-through
+
+        async def send_compressed(message):
+            nonlocal start, stream
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            if message["type"] != "http.response.body" or stream is False:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more = message.get("more_body", False)
+            if stream is None:
+                response_headers = dict(start["headers"])
+                if not _is_compressible(response_headers) or (not more and len(body) < self.min_size):
+                    stream = False
+                    await send(start)
+                    await send(message)
+                    return
+                stream = compressor(encoding)
+                raw = [(k, v) for k, v in start["headers"] if k.lower() != b"content-length"]
+                raw.append((b"content-encoding", encoding.encode()))
+                raw.append((b"vary", b"Accept-Encoding"))
+                await send(dict(start, headers=raw))
+            chunk = stream.flush(body) if more else stream.finish(body)
+            await send({"type": "http.response.body", "body": chunk, "more_body": more})
+
+        await self.app(scope, receive, send_compressed)
+        if start is not None and stream is None:
+            # Headers only (e.g. 304): nothing to compress
+            await send(start)
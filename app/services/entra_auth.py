@@ -1,24 +1,44 @@
-from fastapi_azure_auth import SingleTenantAzureAuthorizationCodeBearer
+"""
+Entra ID authorization scheme, created on first use so the app imports without Azure settings.
+"""
+import logging
+from functools import lru_cache
+
 from app.config import AZURE_CLIENT_ID, AZURE_TENANT_ID
 
-if not AZURE_CLIENT_ID or not AZURE_TENANT_ID:
-    raise ValueError("AZURE_CLIENT_ID and AZURE_TENANT_ID must be set in .env")
-
-# The scope here depends on how you set it up in Azure.
-# If you didn't create a custom API scope yet, we can use the default or just OpenID scopes.
-# For this PoC, we will use the Client ID as the scope resource, which is common.
-# Format: api://{client_id}/access (if you created it) or {client_id}/.default
-# Let's assume you haven't created a custom scope yet, so we'll be lenient or use a default.
-# Actually, SingleTenantAzureAuthorizationCodeBearer validates the access token.
-
-azure_scheme = SingleTenantAzureAuthorizationCodeBearer(
-    app_client_id=AZURE_CLIENT_ID,
-    tenant_id=AZURE_TENANT_ID,
-    scopes={
-        # This is for Swagger UI to request scopes. 
-        # If we haven't defined a scope in Azure "Expose an API", this might fail if we ask for one.
-        # We'll leave it empty for now or use the default graph scope if needed, 
-        # but for your own API protection, you usually need a scope.
-        # Let's try to simple configuration first.
-    }
-)
+logger = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=None)
+def get_azure_scheme():
+    """Build the Entra ID scheme; raises if Azure settings are missing."""
+    if not AZURE_CLIENT_ID or not AZURE_TENANT_ID:
+        raise ValueError("AZURE_CLIENT_ID and AZURE_TENANT_ID must be set in .env")
+
+    from fastapi_azure_auth import SingleTenantAzureAuthorizationCodeBearer
+
+    # The scope here depends on how you set it up in Azure.
+    # If you didn't create a custom API scope yet, we can use the default or just OpenID scopes.
+    # For this PoC, we will use the Client ID as the scope resource, which is common.
+    # Format: api://{client_id}/access (if you created it) or {client_id}/.default
+    # Let's assume you haven't created a custom scope yet, so we'll be lenient or use a default.
+    # Actually, SingleTenantAzureAuthorizationCodeBearer validates the access token.
+    return SingleTenantAzureAuthorizationCodeBearer(
+        app_client_id=AZURE_CLIENT_ID,
+        tenant_id=AZURE_TENANT_ID,
+        scopes={
+            # This is for Swagger UI to request scopes. 
+            # If we haven't defined a scope in Azure "Expose an API", this might fail if we ask for one.
+            # We'll leave it empty for now or use the default graph scope if needed, 
+            # but for your own API protection, you usually need a scope.
+            # Let's try to simple configuration first.
+        }
+    )
+
+
+async def load_openid_config():
+    """Fetch the OpenID Connect configuration in the background; failures are logged, not fatal."""
+    try:
+        await get_azure_scheme().openid_config.load_config()
+    except Exception as e:
+        logger.warning("Entra ID OpenID configuration not loaded: %s", e)
@@ -0,0 +1,80 @@
+"""
+Dedicated executor for bcrypt work, so login bursts cannot starve report requests.
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi import HTTPException
+
+from app.config import HASH_WORKERS, HASH_MAX_QUEUE
+from app.services.metrics import HASH_SECONDS
+
+
+class HashingExecutor:
+    """
+    Runs password hashing on its own small thread pool (bcrypt releases the
+    GIL, so threads scale with cores). At most `workers + max_queue` jobs may
+    be pending; beyond that callers are rejected with 503 instead of queueing
+    without bound.
+    """
+
+    def __init__(self, workers: int = HASH_WORKERS, max_queue: int = HASH_MAX_QUEUE):
+        self.workers = workers
+        self.max_queue = max_queue
+        self._executor = None
+        self._pending = 0
+        self._lock = threading.Lock()
+        self.completed = 0
+        self.rejected = 0
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix="password-hash")
+        return self._executor
+
+    async def run(self, fn, *args):
+        """Run `fn(*args)` on the hashing pool, or raise 503 if the queue is full."""
+        with self._lock:
+            if self._pending >= self.workers + self.max_queue:
+                self.rejected += 1
+                raise HTTPException(
+                    status_code=503,
+                    detail="Authentication is busy, please retry",
+                    headers={"Retry-After": "1"},
+                )
+            self._pending += 1
+        started = time.perf_counter()
+        future = self._get_executor().submit(fn, *args)
+        # Released when the hash itself ends: a cancelled caller leaves it running
+        future.add_done_callback(lambda done: self._finished(done, started))
+        return await asyncio.wrap_future(future)
+
+    def _finished(self, future, started: float):
+        """Done callback on the pool's future (run on the worker thread): free its slot."""
+        with self._lock:
+            self._pending -= 1
+            if future.cancelled():
+                return
+            self.completed += 1
+        HASH_SECONDS.observe(time.perf_counter() - started)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> dict:
+        """Queue depth and counts; latency goes to the `password_hash_duration_seconds` histogram."""
+        return {
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "in_flight": min(self._pending, self.workers),
+            "queue_depth": max(0, self._pending - self.workers),
+            "completed": self.completed,
+            "rejected": self.rejected,
+        }
+
+
+hashing_executor = HashingExecutor()
@@ -0,0 +1,58 @@
+"""
+Shared outbound HTTP client, opened and closed by the app lifespan.
+"""
+import httpx
+
+from app.config import HTTP_TIMEOUT, HTTP_MAX_CONNECTIONS, HTTP_USER_AGENT
+from app.services.rate_limit import RateLimitedTransport
+
+try:
+    import h2  # noqa: F401  (enables HTTP/2 in httpx)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+_client = None
+
+
+def _build_client() -> httpx.AsyncClient:
+    # Pacing and retries live in the transport, so every request made with
+    # the shared client (streamed or not) goes through the upstream limiter
+    transport = httpx.AsyncHTTPTransport(
+        http2=HTTP2_AVAILABLE,
+        limits=httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_CONNECTIONS,
+        ),
+    )
+    return httpx.AsyncClient(
+        transport=RateLimitedTransport(transport),
+        timeout=HTTP_TIMEOUT,
+        headers={"User-Agent": HTTP_USER_AGENT},
+        follow_redirects=True,
+    )
+
+
+async def open_client() -> httpx.AsyncClient:
+    """Create the long-lived keep-alive client (called from the app lifespan)."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = _build_client()
+    return _client
+
+
+async def close_client():
+    """Close the shared client and its pooled connections."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def get_client() -> httpx.AsyncClient:
+    """Return the shared client, creating it lazily outside the lifespan."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = _build_client()
+    return _client
@@ -0,0 +1,690 @@
+"""
+Ingestion utilities: concurrent upstream fetching and bulk writing of market snapshots.
+"""
+import asyncio
+import codecs
+import csv
+import io
+import json
+import time
+from datetime import datetime, timedelta, timezone
+
+import httpx
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+
+from app.config import (
+    INGEST_BATCH_SIZE, INGEST_CONDITIONAL, INGEST_FETCH_CONCURRENCY, INGEST_KEYFRAME_INTERVAL,
+    SNAPSHOT_RETENTION_DAYS,
+)
+from app.database import get_conn, get_pool
+from app.services.cache import report_cache
+from app.services.coins import coin_registry
+from app.services.http_client import get_client
+from app.services.metrics import (
+    INGEST_BATCHES, INGEST_PAGES, INGEST_ROWS, INGEST_SHORT_CIRCUITS, INGEST_STAGE_SECONDS,
+)
+from app.services.rollups import update_rollups
+from app.services.snapshots import current_chain, chain_rows_sql
+from app.services.sources import fetch_conditional, load_sources, save_sources
+
+# Serialises ingest commits so commit order (`seq`) matches the order in
+# which change-only batches were diffed: change-only ingests hold it from
+# syncing their baseline until they commit, full ingests from their first
+# new coin (registrations are serialised) or else only to commit
+INGEST_LOCK_ID = 72170417
+
+
+# =================== SNAPSHOT COLUMNS ===================
+# (table column, upstream field) for the numeric facts, in COPY order; the
+# coin itself is stored as its `coins` key and symbol/name live in `coins`
+SNAPSHOT_FIELDS = (
+    ("current_price", "current_price"),
+    ("market_cap", "market_cap"),
+    ("total_volume", "total_volume"),
+    ("price_change_24h", "price_change_24h"),
+    ("price_change_pct_24h", "price_change_percentage_24h"),
+    ("high_24h", "high_24h"),
+    ("low_24h", "low_24h"),
+    ("circulating_supply", "circulating_supply"),
+    ("max_supply", "max_supply"),
+    ("ath", "ath"),
+    ("ath_change_pct", "ath_change_percentage"),
+)
+
+SNAPSHOT_COLUMNS = tuple(column for column, _ in SNAPSHOT_FIELDS)
+SNAPSHOT_RECORD_FIELDS = tuple(field for _, field in SNAPSHOT_FIELDS)
+# Positions of the facts that feed the rollups
+_ROLLUP_FACTS = tuple(SNAPSHOT_COLUMNS.index(column)
+                      for column in ("current_price", "market_cap", "total_volume"))
+
+COPY_SNAPSHOTS_SQL = "COPY market_snapshots ({}) FROM STDIN WITH (FORMAT csv)".format(
+    ", ".join(("coin_key",) + SNAPSHOT_COLUMNS + ("timestamp", "batch_id"))
+)
+
+
+# =================== BULK WRITER ===================
+class SnapshotWriter:
+    """
+    Streams market records into `market_snapshots` with `COPY FROM STDIN`.
+
+    Coins are resolved to their integer keys through `coin_registry`, on the
+    writer's connection; keys of coins new to this batch (`coins`) are
+    published once it commits. Records are encoded as CSV into an in-memory
+    buffer and flushed every `batch_size` rows, so memory stays bounded for
+    very large payloads. All flushes share the caller's transaction; the caller commits.
+    """
+
+    def __init__(self, conn, batch_id: int, timestamp: str, batch_size: int = INGEST_BATCH_SIZE):
+        self.conn = conn
+        self.batch_id = batch_id
+        self.timestamp = timestamp
+        self.batch_size = max(1, batch_size)
+        self.keyframe = True
+        self.rows_received = 0
+        self.rows_written = 0
+        self._buffer = io.StringIO()
+        self._csv = csv.writer(self._buffer, lineterminator="\n")
+        self._pending = 0
+        self._observed = {}   # coin_key -> rollup facts
+        self.coins = {}       # coin_id -> registry entry created in this transaction
+
+    def coin_key(self, coin_id):
+        known = self.coins.get(coin_id)
+        return known[0] if known else coin_registry.cached_key(coin_id)
+
+    def write(self, records) -> int:
+        """Buffer `records` (a list of dicts), flushing full batches. Returns rows accepted."""
+        keys = coin_registry.resolve(self.conn, records, self.coins, _lock_ingests)
+        for record in records:
+            key = keys.get(record.get("id"))
+            values = [record.get(field) for field in SNAPSHOT_RECORD_FIELDS]
+            self._append(key, values)
+            self._observed[key] = [values[i] for i in _ROLLUP_FACTS]
+        self.rows_received += len(records)
+        return len(records)
+
+    def observations(self) -> list:
+        """(coin_key, current_price, market_cap, total_volume) of every coin in the batch."""
+        return [(key, *facts) for key, facts in self._observed.items()]
+
+    def _append(self, coin_key, values):
+        self._csv.writerow([coin_key, *values, self.timestamp, self.batch_id])
+        self._pending += 1
+        if self._pending >= self.batch_size:
+            self.flush()
+
+    def finish(self):
+        """Flush remaining rows; called once every record has been written."""
+        self.flush()
+
+    def flush(self):
+        """Send buffered rows to PostgreSQL in a single COPY."""
+        if not self._pending:
+            return
+        self._buffer.seek(0)
+        self.conn.cursor().copy_expert(COPY_SNAPSHOTS_SQL, self._buffer)
+        self.rows_written += self._pending
+        self._pending = 0
+        self._buffer.seek(0)
+        self._buffer.truncate()
+
+
+class DeltaSnapshotWriter(SnapshotWriter):
+    """
+    Change-only variant of `SnapshotWriter`: a record is written only if it
+    differs from the coin's values in `state` (a `SnapshotState` in sync with
+    the current batch). Unless `keyframe` is set, unchanged coins are skipped
+    and readers carry their previous row forward.
+
+    If a coin of the previous state is missing from the payload, `finish`
+    turns the batch into a keyframe by writing the skipped coins as well, so
+    the vanished coin is not carried forward.
+    """
+
+    def __init__(self, conn, batch_id: int, timestamp: str, state, keyframe: bool = False,
+                 batch_size: int = INGEST_BATCH_SIZE):
+        super().__init__(conn, batch_id, timestamp, batch_size)
+        self.state = state
+        self.keyframe = keyframe
+        self.changed = {}       # coin_id -> values written in this batch
+        self.unchanged = set()  # coin_ids skipped because nothing changed
+
+    def write(self, records) -> int:
+        keys = coin_registry.resolve(self.conn, records, self.coins, _lock_ingests)
+        previous = self.state.values
+        for record in records:
+            coin_id = record.get("id")
+            values = tuple(record.get(field) for field in SNAPSHOT_RECORD_FIELDS)
+            if coin_id in self.changed or coin_id in self.unchanged:
+                continue  # repeated across pages
+            if not self.keyframe and previous.get(coin_id) == values:
+                self.unchanged.add(coin_id)
+                continue
+            self.changed[coin_id] = values
+            self._append(keys.get(coin_id), values)
+        self.rows_received += len(records)
+        return len(records)
+
+    def finish(self):
+        previous = self.state.values
+        if not self.keyframe and any(
+            coin_id not in self.changed and coin_id not in self.unchanged for coin_id in previous
+        ):
+            self.keyframe = True
+            for coin_id in self.unchanged:
+                self._append(self.coin_key(coin_id), previous[coin_id])
+        self.flush()
+
+    def observations(self) -> list:
+        return [
+            (self.coin_key(coin_id), *(values[i] for i in _ROLLUP_FACTS))
+            for coin_id, values in self.next_values().items()
+        ]
+
+    def next_values(self) -> dict:
+        """Per-coin values as of this batch, to install in the state once committed."""
+        if self.keyframe:
+            values = {coin_id: self.state.values[coin_id] for coin_id in self.unchanged}
+            values.update(self.changed)
+            return values
+        values = dict(self.state.values)
+        values.update(self.changed)
+        return values
+
+
+# =================== DELTA STATE ===================
+class SnapshotState:
+    """
+    Last stored facts of every coin (by coin_id) as of `batch_id`, the baseline that
+    change-only ingests diff against.
+
+    Warmed from the database by materialising the current batch, and kept
+    in step by `DeltaSnapshotWriter` commits. Change-only ingests hold
+    `INGEST_LOCK_ID` from syncing until they commit, and every other ingest
+    takes it to commit, so the baseline cannot move underneath them;
+    an ingest committed by another process is noticed through the current
+    batch pointer and triggers a reload.
+    """
+
+    def __init__(self):
+        self.batch_id = None
+        self.seq = None
+        self.keyframe_id = None
+        self.keyframe_seq = None
+        self.since = None   # earliest snapshot time in the chain
+        self.values = {}
+
+    def sync(self, conn):
+        """Reload from the database unless already at the current batch."""
+        if self.batch_id is not None and self.batch_id == current_batch_id(conn):
+            return
+        chain = current_chain(conn)
+        values = {}
+        if chain is not None:
+            c = conn.cursor()
+            c.execute(
+                chain_rows_sql(("c.coin_id",) + tuple("s." + column for column in SNAPSHOT_COLUMNS)),
+                chain._asdict(),
+            )
+            values = {row[0]: tuple(row[1:]) for row in c.fetchall()}
+        self.batch_id = chain.batch_id if chain else None
+        self.seq = chain.seq if chain else None
+        self.keyframe_id = chain.keyframe_id if chain else None
+        self.keyframe_seq = chain.keyframe_seq if chain else None
+        self.since = chain.since if chain else None
+        self.values = values
+
+    def needs_keyframe(self) -> bool:
+        """
+        True when the next batch must store every coin: every
+        INGEST_KEYFRAME_INTERVAL batches, and once the chain reaches back
+        past the retention window, whose partitions are kept only while the
+        chain still needs them.
+        """
+        if self.batch_id is None or self.keyframe_seq is None or self.since is None:
+            return True
+        if self.seq - self.keyframe_seq + 1 >= INGEST_KEYFRAME_INTERVAL:
+            return True
+        return (
+            SNAPSHOT_RETENTION_DAYS > 0
+            and datetime.now(timezone.utc) - self.since >= timedelta(days=SNAPSHOT_RETENTION_DAYS)
+        )
+
+    def advance(self, batch_id: int, seq: int, writer):
+        """Install `writer`'s committed batch as the new baseline."""
+        if writer.keyframe:
+            self.keyframe_id, self.keyframe_seq = batch_id, seq
+            self.since = datetime.fromisoformat(writer.timestamp)
+        self.batch_id, self.seq = batch_id, seq
+        self.values = writer.next_values()
+
+    def invalidate(self):
+        self.batch_id = None
+        self.values = {}
+
+
+snapshot_state = SnapshotState()
+
+
+# =================== INGEST BATCHES ===================
+def begin_batch(source_url: str, started_at: str) -> int:
+    """Record a new running batch and return its id (committed immediately)."""
+    with get_conn() as conn:
+        c = conn.cursor()
+        c.execute(
+            "INSERT INTO ingest_batches (source_url, started_at) VALUES (%s, %s) RETURNING id",
+            (source_url, started_at)
+        )
+        batch_id = c.fetchone()[0]
+        conn.commit()
+    return batch_id
+
+
+def complete_batch(conn, batch_id: int, writer=None):
+    """
+    Mark a batch complete and, if it received any records, make it the
+    current batch and give it the next commit `seq`. Runs in the caller's
+    transaction (which holds `INGEST_LOCK_ID`) so readers switch over only
+    once every row of the batch is committed. Returns the batch's seq.
+    """
+    received = writer.rows_received if writer is not None else 0
+    written = writer.rows_written if writer is not None else 0
+    keyframe_id = batch_id
+    if writer is not None and not writer.keyframe:
+        keyframe_id = writer.state.keyframe_id
+    c = conn.cursor()
+    c.execute("""
+        UPDATE ingest_batches
+        SET status = 'complete', finished_at = now(),
+            row_count = %s, rows_received = %s, keyframe_batch_id = %s,
+            seq = CASE WHEN %s > 0 THEN nextval('ingest_batch_seq') END
+        WHERE id = %s
+        RETURNING seq
+    """, (written, received, keyframe_id, received, batch_id))
+    seq = c.fetchone()[0]
+    if received:
+        c.execute("UPDATE ingest_current SET batch_id = %s", (batch_id,))
+    return seq
+
+
+def fail_batch(batch_id: int):
+    """Mark a batch failed; its rows were rolled back with the transaction."""
+    with get_conn() as conn:
+        c = conn.cursor()
+        c.execute(
+            "UPDATE ingest_batches SET status = 'failed', finished_at = now() WHERE id = %s",
+            (batch_id,)
+        )
+        conn.commit()
+
+
+def skip_batch(batch_id: int, pages):
+    """
+    Close a batch whose pages were all unchanged upstream: nothing was
+    parsed or written, so it never becomes current. Refreshes the pages'
+    validators in the same transaction.
+    """
+    with get_conn() as conn:
+        c = conn.cursor()
+        c.execute(
+            "UPDATE ingest_batches SET status = 'unchanged', finished_at = now() WHERE id = %s",
+            (batch_id,)
+        )
+        save_sources(conn, pages)
+        conn.commit()
+
+
+def current_batch_id(conn):
+    """Id of the newest fully committed batch, or None before the first ingest."""
+    c = conn.cursor()
+    c.execute("SELECT batch_id FROM ingest_current")
+    row = c.fetchone()
+    return row[0] if row else None
+
+
+# =================== STREAMING PARSER ===================
+class JSONArrayStream:
+    """
+    Incremental parser for a top-level JSON array.
+
+    Feed it raw byte chunks as they arrive; each call returns the elements
+    completed so far. Only the current, partially received element is kept
+    in memory, so peak usage does not grow with the size of the array.
+    """
+
+    _WHITESPACE = " \t\n\r"
+    _DELIMITERS = ",]" + _WHITESPACE
+
+    def __init__(self):
+        self._decoder = json.JSONDecoder()
+        self._text = codecs.getincrementaldecoder("utf-8")()
+        self._buffer = ""
+        self._state = "start"   # start -> first -> (sep <-> value) -> end
+
+    def feed(self, chunk: bytes) -> list:
+        """Consume a chunk of bytes and return any completed elements."""
+        self._buffer += self._text.decode(chunk)
+        return self._drain(final=False)
+
+    def close(self) -> list:
+        """Signal end of input; raises ValueError if the array is incomplete."""
+        self._buffer += self._text.decode(b"", final=True)
+        items = self._drain(final=True)
+        if self._state != "end":
+            raise ValueError("Truncated JSON array")
+        return items
+
+    def _drain(self, final: bool) -> list:
+        items = []
+        buf, pos, size = self._buffer, 0, len(self._buffer)
+        while True:
+            while pos < size and buf[pos] in self._WHITESPACE:
+                pos += 1
+            if pos >= size:
+                break
+            state = self._state
+            if state == "start":
+                if buf[pos] != "[":
+                    raise ValueError("Expected a list of market objects")
+                pos += 1
+                self._state = "first"
+            elif state == "sep":
+                if buf[pos] == ",":
+                    self._state = "value"
+                elif buf[pos] == "]":
+                    self._state = "end"
+                else:
+                    raise ValueError(f"Unexpected character {buf[pos]!r} in JSON array")
+                pos += 1
+            elif state in ("first", "value"):
+                if state == "first" and buf[pos] == "]":
+                    pos += 1
+                    self._state = "end"
+                    continue
+                try:
+                    item, end = self._decoder.raw_decode(buf, pos)
+                except json.JSONDecodeError:
+                    if final:
+                        raise ValueError("Invalid JSON array element")
+                    break  # element not complete yet
+                if not final and buf[pos] not in '{["' and (end == size or buf[end] not in self._DELIMITERS):
+                    break  # a bare number may continue in the next chunk
+                items.append(item)
+                pos = end
+                self._state = "sep"
+            else:
+                raise ValueError("Unexpected data after JSON array")
+        self._buffer = buf[pos:]
+        return items
+
+
+# =================== PIPELINE ===================
+def page_url(url: str, page: int, page_param: str = "page") -> str:
+    """Return `url` with its paging parameter set to `page`."""
+    return str(httpx.URL(url).copy_merge_params({page_param: page}))
+
+
+async def fetch_page(client: httpx.AsyncClient, url: str, sink):
+    """Fetch one page of market objects and hand it to `sink` in one piece."""
+    with INGEST_STAGE_SECONDS.time("fetch"):
+        response = await client.get(url)
+        response.raise_for_status()
+    with INGEST_STAGE_SECONDS.time("parse"):
+        data = response.json()
+    if not isinstance(data, list):
+        raise HTTPException(status_code=400, detail="Expected a list of market objects")
+    await sink(data)
+
+
+class PageStream:
+    """
+    Incremental parse of one streamed page: `feed` it body chunks, then
+    `close` it. Records reach `sink` in chunks of at most `chunk_size`, so
+    memory stays bounded whatever the page size.
+    """
+
+    def __init__(self, sink, chunk_size: int = INGEST_BATCH_SIZE):
+        self.sink = sink
+        self.chunk_size = chunk_size
+        self.parsing = self.writing = 0.0   # seconds spent parsing and in `sink`
+        self._parser = JSONArrayStream()
+        self._records = []
+
+    async def feed(self, chunk: bytes):
+        mark = time.perf_counter()
+        try:
+            self._records.extend(self._parser.feed(chunk))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        self.parsing += time.perf_counter() - mark
+        while len(self._records) >= self.chunk_size:
+            mark = time.perf_counter()
+            await self.sink(self._records[:self.chunk_size])
+            self.writing += time.perf_counter() - mark
+            del self._records[:self.chunk_size]
+
+    async def close(self):
+        try:
+            self._records.extend(self._parser.close())
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        INGEST_STAGE_SECONDS.observe(self.parsing, "parse")
+        if self._records:
+            await self.sink(self._records)
+            self._records = []
+
+
+async def stream_page(client: httpx.AsyncClient, url: str, sink, chunk_size: int = INGEST_BATCH_SIZE):
+    """
+    Fetch one page of market objects, parsing the response body as it streams
+    in and handing `sink` chunks of at most `chunk_size` records.
+    """
+    stream = PageStream(sink, chunk_size)
+    started = time.perf_counter()
+    async with client.stream("GET", url) as response:
+        response.raise_for_status()
+        async for chunk in response.aiter_bytes():
+            await stream.feed(chunk)
+    INGEST_STAGE_SECONDS.observe(time.perf_counter() - started - stream.parsing - stream.writing, "fetch")
+    await stream.close()
+
+
+async def stream_conditional(client: httpx.AsyncClient, url: str, known, sink,
+                             chunk_size: int = INGEST_BATCH_SIZE):
+    """
+    `fetch_conditional` for a streamed page: the body is hashed and parsed
+    as it arrives, so whether it changed is only known once its records
+    have reached `sink`.
+    """
+    stream = PageStream(sink, chunk_size)
+    page = await fetch_conditional(client, url, known, stream.feed)
+    if page.outcome != "not_modified":
+        await stream.close()
+    return page
+
+
+async def parse_page(page, sink):
+    """Parse a body kept by `fetch_conditional` and hand its records to `sink`."""
+    with INGEST_STAGE_SECONDS.time("parse"):
+        data = json.loads(page.body)
+    if not isinstance(data, list):
+        raise HTTPException(status_code=400, detail="Expected a list of market objects")
+    await sink(data)
+
+
+async def ingest(url: str, pages: int = 1, page_param: str = "page", stream: bool = False,
+                 delta: bool = False, conditional: bool = INGEST_CONDITIONAL) -> dict:
+    """
+    Fetch `pages` pages of `url` concurrently (at most INGEST_FETCH_CONCURRENCY
+    in flight) and write records as soon as they arrive, all in one transaction.
+    With `stream`, each response body is parsed incrementally so memory stays
+    bounded regardless of payload size. With `delta`, only coins that changed
+    since the current batch are written, plus a full keyframe every
+    INGEST_KEYFRAME_INTERVAL batches.
+
+    With `conditional`, each page is requested with its last ETag and
+    Last-Modified and its body hashed. A page answered 304 or hashing as
+    before is held back unparsed; if every page is, the ingest short-circuits
+    and the batch is recorded as "unchanged". Streamed pages are hashed as
+    they are parsed and written, so an unchanged one still costs its parse;
+    if every page turns out unchanged, its rows are rolled back unwritten.
+    """
+    client = get_client()
+    semaphore = asyncio.Semaphore(INGEST_FETCH_CONCURRENCY)
+    write_lock = asyncio.Lock()
+    urls = [url] if pages == 1 else [page_url(url, n, page_param) for n in range(1, pages + 1)]
+    fetch_one = stream_page if stream else fetch_page
+
+    ts = datetime.now(timezone.utc).isoformat()
+    started = time.perf_counter()
+    pool = get_pool()
+    batch_id = await run_in_threadpool(begin_batch, url, ts)
+    conn = writer = None
+    known = await run_in_threadpool(load_sources, urls) if conditional else {}
+    fetched = {}   # page url -> FetchedPage (body dropped once parsed), remembered once the batch commits
+    held = []      # unparsed unchanged pages, parsed only if some other page changed
+    outcomes = []
+
+    async def sink(records):
+        nonlocal conn, writer
+        async with write_lock:
+            if conn is None:
+                conn = await run_in_threadpool(pool.getconn)
+                writer = await run_in_threadpool(_open_writer, conn, batch_id, ts, delta)
+            with INGEST_STAGE_SECONDS.time("write"):
+                await run_in_threadpool(writer.write, records)
+
+    async def fetch(page_link):
+        async with semaphore:
+            if not conditional:
+                await fetch_one(client, page_link, sink)
+                return
+            if stream:
+                page = await stream_conditional(client, page_link, known.get(page_link), sink)
+            else:
+                page = await fetch_conditional(client, page_link, known.get(page_link))
+            outcomes.append(page.outcome)
+            INGEST_PAGES.inc(1, page.outcome)
+            if page.body is not None and page.outcome == "changed":
+                await parse_page(page, sink)
+                page = page._replace(body=None)
+            elif page.body is not None or page.outcome == "not_modified":
+                held.append(page)
+            fetched[page_link] = page
+
+    tasks = [asyncio.create_task(fetch(link)) for link in urls]
+    short_circuit = None
+    try:
+        await asyncio.gather(*tasks)
+        if conditional and "changed" not in outcomes:
+            short_circuit = "hash" if "unchanged" in outcomes else "fetch"
+            if conn is not None:
+                # Rows of streamed pages that all turned out unchanged
+                await run_in_threadpool(conn.rollback)
+            await run_in_threadpool(skip_batch, batch_id, list(fetched.values()))
+        else:
+            # Some page changed, so the batch needs every page's rows
+            while held:
+                page = held.pop()
+                if stream and page.outcome == "not_modified":
+                    page = await stream_conditional(client, page.url, None, sink)
+                else:
+                    if page.outcome == "not_modified":
+                        page = await fetch_conditional(client, page.url)
+                    await parse_page(page, sink)
+                fetched[page.url] = page._replace(body=None)
+            if writer is None:
+                conn = await run_in_threadpool(pool.getconn)
+            await run_in_threadpool(_commit, conn, batch_id, writer, list(fetched.values()))
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        # Wait out writes still running in the threadpool, so nothing uses
+        # the connection after it is rolled back and returned to the pool
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if conn is not None:
+            await run_in_threadpool(pool.putconn, conn)
+            conn = None
+        if delta:
+            snapshot_state.invalidate()
+        await run_in_threadpool(fail_batch, batch_id)
+        INGEST_BATCHES.inc(1, "failed")
+        raise
+    finally:
+        if conn is not None:
+            await run_in_threadpool(pool.putconn, conn)
+
+    elapsed = time.perf_counter() - started
+    if short_circuit:
+        writer = None
+    received = writer.rows_received if writer is not None else 0
+    written = writer.rows_written if writer is not None else 0
+    if short_circuit:
+        INGEST_BATCHES.inc(1, "unchanged")
+        INGEST_SHORT_CIRCUITS.inc(1, short_circuit)
+    else:
+        INGEST_BATCHES.inc(1, "complete")
+    INGEST_ROWS.inc(received, "received")
+    INGEST_ROWS.inc(written, "written")
+    return {
+        "status": "unchanged" if short_circuit else "success",
+        "batch_id": batch_id,
+        "records_ingested": received,
+        "rows_written": written,
+        "keyframe": writer.keyframe if writer is not None else not short_circuit,
+        "write_reduction": round(1 - written / received, 4) if received else 0.0,
+        "timestamp": ts,
+        "rows_per_sec": round(received / elapsed, 1) if elapsed > 0 else None,
+        "short_circuit": short_circuit,
+        "pages_not_modified": outcomes.count("not_modified"),
+        "pages_unchanged": outcomes.count("unchanged"),
+    }
+
+
+def _lock_ingests(conn):
+    """Take `INGEST_LOCK_ID` for the rest of `conn`'s transaction."""
+    with INGEST_STAGE_SECONDS.time("lock"):
+        conn.cursor().execute("SELECT pg_advisory_xact_lock(%s)", (INGEST_LOCK_ID,))
+
+
+def _open_writer(conn, batch_id: int, timestamp: str, delta: bool):
+    """
+    Create the batch's writer. A change-only ingest first takes the ingest
+    lock in `conn`'s transaction and syncs its baseline, holding both until
+    it commits; a full ingest writes without the lock.
+    """
+    if not delta:
+        return SnapshotWriter(conn, batch_id, timestamp)
+    _lock_ingests(conn)
+    with INGEST_STAGE_SECONDS.time("lock"):
+        snapshot_state.sync(conn)
+    return DeltaSnapshotWriter(
+        conn, batch_id, timestamp, snapshot_state, keyframe=snapshot_state.needs_keyframe()
+    )
+
+
+def _commit(conn, batch_id: int, writer, pages=()):
+    """
+    Write remaining rows, fold the batch into the rollups, complete it,
+    remember the fetched `pages`' validators and commit.
+    """
+    if writer is not None:
+        with INGEST_STAGE_SECONDS.time("write"):
+            writer.finish()
+        if not isinstance(writer, DeltaSnapshotWriter):
+            # Before the rollups, whose upserts would otherwise interleave
+            _lock_ingests(conn)
+        if writer.rows_received:
+            with INGEST_STAGE_SECONDS.time("rollups"):
+                update_rollups(conn, writer.timestamp, writer.observations())
+    with INGEST_STAGE_SECONDS.time("commit"):
+        seq = complete_batch(conn, batch_id, writer)
+        save_sources(conn, pages)
+        conn.commit()
+    if writer is not None:
+        coin_registry.publish(writer.coins)
+    if isinstance(writer, DeltaSnapshotWriter) and writer.rows_received:
+        writer.state.advance(batch_id, seq, writer)
+    if writer is not None and writer.rows_received:
+        report_cache.invalidate(batch_id)
@@ -0,0 +1,413 @@
+"""
+Background ingest jobs: a PostgreSQL-backed queue, an in-process worker pool
+and an interval scheduler.
+
+Jobs live in `ingest_jobs`, so queued work survives restarts and any number
+of processes can share the queue. Partial unique indexes keep at most one
+queued and one running job per source URL: repeated requests coalesce into
+the waiting job and two runs of the same source never overlap. Workers claim
+jobs with `FOR UPDATE SKIP LOCKED` and heartbeat while running; a running job
+whose heartbeat stops (its process died) is requeued.
+"""
+import asyncio
+import json
+import logging
+import time
+from datetime import datetime, timezone
+
+import psycopg2
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+from psycopg2.extras import Json
+
+from app.config import (
+    INGEST_JOB_HEARTBEAT,
+    INGEST_JOB_MAX_ATTEMPTS,
+    INGEST_JOB_POLL_INTERVAL,
+    INGEST_JOB_RETRY_DELAY,
+    INGEST_JOB_STALE_AFTER,
+    INGEST_SCHEDULE,
+    INGEST_SCHEDULER_ENABLED,
+    INGEST_WORKERS,
+)
+from app.database import get_conn, TimedRealDictCursor
+from app.services.ingest import ingest
+from app.services.timeseries import parse_interval
+
+logger = logging.getLogger(__name__)
+
+JOB_COLUMNS = """
+    id, source_url, pages, page_param, stream, delta, status, trigger,
+    requested_by, schedule_slot, attempts, run_after, created_at, started_at,
+    heartbeat_at, finished_at, batch_id, result, error
+"""
+
+
+# =================== QUEUE ===================
+def enqueue(url: str, pages: int = 1, page_param: str = "page", stream: bool = False,
+            delta: bool = False, trigger: str = "api", requested_by: str = None,
+            schedule_slot: datetime = None):
+    """
+    Queue an ingest of `url`. If a job for `url` is already waiting, that job
+    is returned instead. Returns (job, created); job is None when
+    `schedule_slot` was already enqueued (by this or another process).
+    """
+    for _ in range(5):
+        with get_conn() as conn:
+            c = conn.cursor(cursor_factory=TimedRealDictCursor)
+            c.execute(f"""
+                INSERT INTO ingest_jobs
+                    (source_url, pages, page_param, stream, delta, trigger, requested_by, schedule_slot)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+                ON CONFLICT DO NOTHING
+                RETURNING {JOB_COLUMNS}
+            """, (url, pages, page_param, stream, delta, trigger, requested_by, schedule_slot))
+            job = c.fetchone()
+            if job is None and schedule_slot is not None:
+                c.execute(
+                    "SELECT 1 FROM ingest_jobs WHERE source_url = %s AND schedule_slot = %s",
+                    (url, schedule_slot)
+                )
+                if c.fetchone():
+                    conn.rollback()
+                    return None, False
+            if job is None:
+                c.execute(
+                    f"SELECT {JOB_COLUMNS} FROM ingest_jobs WHERE source_url = %s AND status = 'queued'",
+                    (url,)
+                )
+                existing = c.fetchone()
+                conn.rollback()
+                if existing is not None:
+                    return existing, False
+                continue  # the waiting job was claimed in between: try again
+            conn.commit()
+            return job, True
+    raise HTTPException(status_code=503, detail="Could not enqueue the ingest job, try again")
+
+
+def get_job(job_id: int):
+    """The job with `job_id`, or None."""
+    with get_conn() as conn:
+        c = conn.cursor(cursor_factory=TimedRealDictCursor)
+        c.execute(f"SELECT {JOB_COLUMNS} FROM ingest_jobs WHERE id = %s", (job_id,))
+        return c.fetchone()
+
+
+def list_jobs(limit: int = 50, status: str = None) -> list:
+    """Most recently created jobs first, optionally only those in `status`."""
+    with get_conn() as conn:
+        c = conn.cursor(cursor_factory=TimedRealDictCursor)
+        c.execute(f"""
+            SELECT {JOB_COLUMNS} FROM ingest_jobs
+            WHERE %(status)s::text IS NULL OR status = %(status)s
+            ORDER BY id DESC
+            LIMIT %(limit)s
+        """, {"status": status, "limit": limit})
+        return c.fetchall()
+
+
+def job_timing(job: dict) -> dict:
+    """Seconds spent waiting in the queue and running (so far, if still running)."""
+    now = datetime.now(timezone.utc)
+    started, finished = job["started_at"], job["finished_at"]
+    queued_until = started or (finished if job["status"] == "failed" else None) or now
+    return {
+        "queued_seconds": round((queued_until - job["created_at"]).total_seconds(), 3),
+        "run_seconds": round(((finished or now) - started).total_seconds(), 3) if started else None,
+    }
+
+
+def claim_job():
+    """
+    Mark the oldest due job whose source is not already running as running
+    and return it, or None. Locked rows are skipped, so concurrent workers
+    never claim the same job.
+    """
+    with get_conn() as conn:
+        c = conn.cursor(cursor_factory=TimedRealDictCursor)
+        try:
+            c.execute(f"""
+                UPDATE ingest_jobs
+                SET status = 'running', attempts = attempts + 1,
+                    started_at = now(), heartbeat_at = now(), finished_at = NULL
+                WHERE id = (
+                    SELECT q.id FROM ingest_jobs q
+                    WHERE q.status = 'queued' AND q.run_after <= now()
+                      AND NOT EXISTS (
+                          SELECT 1 FROM ingest_jobs r
+                          WHERE r.source_url = q.source_url AND r.status = 'running'
+                      )
+                    ORDER BY q.run_after, q.id
+                    FOR UPDATE SKIP LOCKED
+                    LIMIT 1
+                )
+                RETURNING {JOB_COLUMNS}
+            """)
+            job = c.fetchone()
+            conn.commit()
+        except psycopg2.errors.UniqueViolation:
+            # Another process started the same source a moment ago
+            conn.rollback()
+            return None
+    return job
+
+
+def heartbeat(job_id: int):
+    with get_conn() as conn:
+        conn.cursor().execute(
+            "UPDATE ingest_jobs SET heartbeat_at = now() WHERE id = %s AND status = 'running'",
+            (job_id,)
+        )
+        conn.commit()
+
+
+def finish_job(job_id: int, result: dict):
+    with get_conn() as conn:
+        conn.cursor().execute("""
+            UPDATE ingest_jobs
+            SET status = 'complete', finished_at = now(), batch_id = %s, result = %s, error = NULL
+            WHERE id = %s
+        """, (result.get("batch_id"), Json(result), job_id))
+        conn.commit()
+
+
+def fail_job(job: dict, error: str, retry: bool = True, max_attempts: int = INGEST_JOB_MAX_ATTEMPTS,
+             retry_delay: float = INGEST_JOB_RETRY_DELAY):
+    """
+    Requeue a failed job after an exponential backoff, or mark it failed if
+    it should not be retried, has used `max_attempts` or a newer job for its
+    source is already waiting.
+    """
+    with get_conn() as conn:
+        c = conn.cursor()
+        if retry and job["attempts"] < max_attempts:
+            try:
+                c.execute("""
+                    UPDATE ingest_jobs
+                    SET status = 'queued', error = %s, heartbeat_at = NULL,
+                        run_after = now() + make_interval(secs => %s)
+                    WHERE id = %s
+                """, (error, retry_delay * 2 ** (job["attempts"] - 1), job["id"]))
+                conn.commit()
+                return
+            except psycopg2.errors.UniqueViolation:
+                conn.rollback()
+        c.execute(
+            "UPDATE ingest_jobs SET status = 'failed', finished_at = now(), error = %s WHERE id = %s",
+            (error, job["id"])
+        )
+        conn.commit()
+
+
+def release_job(job_id: int):
+    """Put a job interrupted by shutdown back in the queue without using up an attempt."""
+    with get_conn() as conn:
+        c = conn.cursor()
+        try:
+            c.execute("""
+                UPDATE ingest_jobs
+                SET status = 'queued', attempts = attempts - 1, heartbeat_at = NULL, run_after = now()
+                WHERE id = %s AND status = 'running'
+            """, (job_id,))
+            conn.commit()
+        except psycopg2.errors.UniqueViolation:
+            conn.rollback()
+            c.execute(
+                "UPDATE ingest_jobs SET status = 'failed', finished_at = now(), "
+                "error = 'interrupted by shutdown' WHERE id = %s",
+                (job_id,)
+            )
+            conn.commit()
+
+
+def recover_stale_jobs(stale_after: float = INGEST_JOB_STALE_AFTER,
+                       max_attempts: int = INGEST_JOB_MAX_ATTEMPTS) -> int:
+    """
+    Requeue running jobs whose heartbeat is older than `stale_after` seconds;
+    the process running them is gone. Jobs out of attempts, or whose source
+    already has a waiting job, are marked failed. Returns the number requeued.
+    """
+    with get_conn() as conn:
+        c = conn.cursor()
+        c.execute("""
+            UPDATE ingest_jobs j
+            SET status = 'failed', finished_at = now(), error = 'worker lost'
+            WHERE j.status = 'running'
+              AND j.heartbeat_at < now() - make_interval(secs => %s)
+              AND (j.attempts >= %s OR EXISTS (
+                  SELECT 1 FROM ingest_jobs q
+                  WHERE q.source_url = j.source_url AND q.status = 'queued'
+              ))
+        """, (stale_after, max_attempts))
+        try:
+            c.execute("""
+                UPDATE ingest_jobs
+                SET status = 'queued', run_after = now(), heartbeat_at = NULL, error = 'worker lost'
+                WHERE status = 'running' AND heartbeat_at < now() - make_interval(secs => %s)
+            """, (stale_after,))
+            requeued = c.rowcount
+            conn.commit()
+        except psycopg2.errors.UniqueViolation:
+            conn.rollback()
+            requeued = 0
+    if requeued:
+        logger.warning("Requeued %d ingest job(s) abandoned by a stopped worker", requeued)
+    return requeued
+
+
+# =================== SCHEDULE ===================
+def load_schedule(raw: str = INGEST_SCHEDULE) -> list:
+    """Parse INGEST_SCHEDULE into entries with `every` in seconds."""
+    entries = []
+    for entry in json.loads(raw or "[]"):
+        if "url" not in entry or "every" not in entry:
+            raise ValueError("INGEST_SCHEDULE entries need `url` and `every`")
+        try:
+            every = parse_interval(str(entry["every"]))
+        except HTTPException as e:
+            raise ValueError(f"INGEST_SCHEDULE: {e.detail}")
+        entries.append({
+            "url": entry["url"],
+            "every": every,
+            "pages": int(entry.get("pages", 1)),
+            "page_param": entry.get("page_param", "page"),
+            "stream": bool(entry.get("stream", False)),
+            "delta": bool(entry.get("delta", False)),
+        })
+    return entries
+
+
+def enqueue_due(schedule: list, now: float) -> float:
+    """
+    Enqueue the current slot of every schedule entry (a no-op for slots
+    already enqueued) and return the epoch time of the next slot boundary.
+    """
+    next_run = float("inf")
+    for entry in schedule:
+        every = entry["every"]
+        slot = now // every * every
+        enqueue(
+            entry["url"], entry["pages"], entry["page_param"], entry["stream"], entry["delta"],
+            trigger="schedule", schedule_slot=datetime.fromtimestamp(slot, timezone.utc),
+        )
+        next_run = min(next_run, slot + every)
+    return next_run
+
+
+# =================== WORKERS ===================
+class JobRunner:
+    """
+    Runs queued ingest jobs on `workers` asyncio tasks, plus the scheduler and
+    stale-job recovery. Idle workers poll the queue every `poll_interval`
+    seconds, or sooner when this process enqueues a job (`notify`).
+    """
+
+    def __init__(self, workers: int = INGEST_WORKERS, poll_interval: float = INGEST_JOB_POLL_INTERVAL,
+                 schedule: list = None):
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.schedule = schedule or []
+        self.running = {}   # worker number -> job id
+        self._wake = None
+        self._tasks = []
+
+    def start(self):
+        self._wake = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._work(n)) for n in range(self.workers)]
+        if self.workers:
+            self._tasks.append(asyncio.create_task(self._recover()))
+        if self.schedule:
+            self._tasks.append(asyncio.create_task(self._schedule()))
+
+    def notify(self):
+        """Wake idle workers; call from the event loop after enqueuing."""
+        if self._wake is not None:
+            self._wake.set()
+
+    async def stop(self):
+        """Cancel workers; interrupted jobs go back to the queue."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _work(self, number: int):
+        while True:
+            self._wake.clear()
+            try:
+                job = await run_in_threadpool(claim_job)
+            except Exception:
+                logger.exception("Claiming an ingest job failed")
+                job = None
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            self.running[number] = job["id"]
+            try:
+                await self._run(job)
+            except Exception:
+                # E.g. the database failed while recording the outcome: the
+                # job's heartbeat stops, so stale-job recovery requeues it
+                logger.exception("Ingest job %s could not be completed", job["id"])
+            finally:
+                self.running.pop(number, None)
+
+    async def _run(self, job: dict):
+        beating = asyncio.create_task(self._heartbeat(job["id"]))
+        started = time.perf_counter()
+        try:
+            result = await ingest(
+                job["source_url"],
+                pages=job["pages"],
+                page_param=job["page_param"],
+                stream=job["stream"],
+                delta=job["delta"],
+            )
+        except asyncio.CancelledError:
+            await run_in_threadpool(release_job, job["id"])
+            raise
+        except Exception as e:
+            # 4xx: the upstream payload or URL is unusable, retrying will not help
+            client_error = isinstance(e, HTTPException) and e.status_code < 500
+            error = e.detail if isinstance(e, HTTPException) else f"{type(e).__name__}: {e}"
+            logger.warning("Ingest job %s (%s) failed: %s", job["id"], job["source_url"], error)
+            await run_in_threadpool(fail_job, job, str(error), not client_error)
+        else:
+            await run_in_threadpool(finish_job, job["id"], result)
+            logger.info("Ingest job %s finished in %.1fs", job["id"], time.perf_counter() - started)
+        finally:
+            beating.cancel()
+
+    async def _heartbeat(self, job_id: int):
+        while True:
+            await asyncio.sleep(INGEST_JOB_HEARTBEAT)
+            try:
+                await run_in_threadpool(heartbeat, job_id)
+            except Exception:
+                logger.exception("Ingest job heartbeat failed")
+
+    async def _recover(self):
+        while True:
+            try:
+                if await run_in_threadpool(recover_stale_jobs):
+                    self.notify()
+            except Exception:
+                logger.exception("Recovering stale ingest jobs failed")
+            await asyncio.sleep(INGEST_JOB_HEARTBEAT)
+
+    async def _schedule(self):
+        while True:
+            try:
+                next_run = await run_in_threadpool(enqueue_due, self.schedule, time.time())
+                self.notify()
+            except Exception:
+                logger.exception("Scheduling ingest jobs failed")
+                next_run = time.time() + self.poll_interval
+            await asyncio.sleep(max(0.0, next_run - time.time()))
+
+
+job_runner = JobRunner(schedule=load_schedule() if INGEST_SCHEDULER_ENABLED else [])
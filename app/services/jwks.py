@@ -0,0 +1,130 @@
+"""
+In-memory cache of Microsoft Entra ID signing keys (JWKS).
+"""
+import asyncio
+import json
+import logging
+import os
+import stat
+import threading
+import time
+
+import httpx
+
+from app.config import (
+    AZURE_JWKS_URL,
+    JWKS_CACHE_PATH,
+    HTTP_TIMEOUT,
+    JWKS_REFRESH_INTERVAL,
+    JWKS_MIN_REFRESH_INTERVAL,
+)
+from app.services.http_client import get_client
+
+logger = logging.getLogger(__name__)
+
+
+class JWKSCache:
+    """
+    Signing keys by `kid`, refreshed periodically in the background and on
+    demand when a token names a key we have not seen (key rotation). On-demand
+    refreshes are rate-limited so bogus `kid`s cannot hammer the endpoint.
+    With a `cache_path`, the last fetched key set is written there and loaded
+    on startup, so verification works immediately and survives Entra being
+    unreachable. Without a `url` (no tenant configured) nothing is fetched.
+    """
+
+    def __init__(self, url: str = AZURE_JWKS_URL,
+                 min_refresh_interval: float = JWKS_MIN_REFRESH_INTERVAL,
+                 cache_path: str = JWKS_CACHE_PATH):
+        self.url = url
+        self.min_refresh_interval = min_refresh_interval
+        self.cache_path = cache_path
+        self._keys = {}
+        self._fetched_at = 0.0
+        self._lock = threading.Lock()
+
+    def get_key(self, kid: str):
+        """Return the JWK for `kid`, refreshing once if it is unknown."""
+        key = self._keys.get(kid)
+        if key is not None:
+            return key
+        with self._lock:
+            if (self.url and kid not in self._keys
+                    and time.monotonic() - self._fetched_at >= self.min_refresh_interval):
+                try:
+                    response = httpx.get(self.url, timeout=HTTP_TIMEOUT)
+                    response.raise_for_status()
+                    self._store(response.json())
+                    self._persist(response.json())
+                except (httpx.HTTPError, ValueError) as e:
+                    logger.warning("Unable to refresh JWKS from %s: %s", self.url, e)
+                    self._fetched_at = time.monotonic()
+        return self._keys.get(kid)
+
+    async def refresh(self):
+        """Fetch the key set with the shared async client."""
+        response = await get_client().get(self.url)
+        response.raise_for_status()
+        with self._lock:
+            self._store(response.json())
+        self._persist(response.json())
+
+    def load_cached(self) -> bool:
+        """
+        Load the key set saved by a previous process, if any. A file another
+        user owns or could have written is refused: its keys would be trusted
+        to sign tokens.
+        """
+        if not self.cache_path:
+            return False
+        try:
+            fd = os.open(self.cache_path, os.O_RDONLY | getattr(os, "O_NOFOLLOW", 0))
+            with open(fd) as f:
+                info = os.fstat(f.fileno())
+                if not _private(info):
+                    logger.warning("Ignoring JWKS cache %s: not owned by this user or writable by others",
+                                   self.cache_path)
+                    return False
+                jwks = json.load(f)
+        except (OSError, ValueError):
+            return False
+        with self._lock:
+            if not self._keys:
+                self._store(jwks)
+                self._fetched_at = 0.0   # still allow an immediate refresh
+        return True
+
+    async def refresh_forever(self, interval: float = JWKS_REFRESH_INTERVAL):
+        """Background task: keep the key set fresh."""
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.warning("Background JWKS refresh from %s failed: %s", self.url, e)
+            await asyncio.sleep(interval)
+
+    def _store(self, jwks: dict):
+        keys = {key["kid"]: key for key in jwks.get("keys", []) if "kid" in key}
+        if keys:
+            self._keys = keys
+        self._fetched_at = time.monotonic()
+
+    def _persist(self, jwks: dict):
+        if not self.cache_path:
+            return
+        try:
+            tmp_path = f"{self.cache_path}.{os.getpid()}.tmp"
+            with open(os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "w") as f:
+                json.dump(jwks, f)
+            os.replace(tmp_path, self.cache_path)
+        except OSError as e:
+            logger.warning("Unable to write JWKS cache %s: %s", self.cache_path, e)
+
+
+def _private(info: os.stat_result) -> bool:
+    """Whether a file is owned by this process's user and writable by no one else."""
+    owned = not hasattr(os, "geteuid") or info.st_uid == os.geteuid()
+    return owned and stat.S_ISREG(info.st_mode) and not info.st_mode & (stat.S_IWGRP | stat.S_IWOTH)
+
+
+jwks_cache = JWKSCache()
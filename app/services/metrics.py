@@ -0,0 +1,303 @@
+"""
+In-process metrics exposed in the Prometheus text format.
+
+Counters and histograms are updated on the hot path (a lock, a dict lookup
+and a bisect per observation). Gauges are read from the pool, executor and
+caches only when `/metrics` is scraped.
+"""
+import re
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names, values, extra=()) -> str:
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+# =================== METRIC TYPES ===================
+class Counter:
+    """Monotonic counter per label set."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, *labels):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = list(self._values.items())
+        for labels, value in values:
+            yield self.name, _format_labels(self.labels, labels), value
+
+
+class Histogram:
+    """Cumulative-bucket histogram per label set, with sum and count."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}   # labels -> [per-bucket counts (+Inf last), sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    @contextmanager
+    def time(self, *labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *labels)
+
+    def samples(self):
+        with self._lock:
+            series = [(labels, list(counts), total) for labels, (counts, total) in self._series.items()]
+        for labels, counts, total in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                yield self.name + "_bucket", _format_labels(self.labels, labels, [("le", le)]), cumulative
+            yield self.name + "_sum", _format_labels(self.labels, labels), total
+            yield self.name + "_count", _format_labels(self.labels, labels), cumulative
+
+
+class Registry:
+    """Metrics plus gauge collectors, rendered together on scrape."""
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def collector(self, fn):
+        """Register `fn() -> [(name, kind, help, value)]`, called on every scrape."""
+        self._collectors.append(fn)
+        return fn
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(f"{name}{labels} {_format_value(value)}" for name, labels, value in metric.samples())
+        for collect in self._collectors:
+            try:
+                gauges = collect()
+            except Exception:
+                continue  # e.g. pool not open yet
+            for name, kind, help, value in gauges:
+                lines.append(f"# HELP {name} {help}")
+                lines.append(f"# TYPE {name} {kind}")
+                lines.append(f"{name} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+
+# =================== METRICS ===================
+HTTP_REQUEST_SECONDS = registry.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template and status.",
+    ("method", "route", "status"),
+))
+DB_QUERY_SECONDS = registry.register(Histogram(
+    "db_query_duration_seconds", "Time in cursor execute/COPY by statement name.", ("statement",),
+))
+DB_CHECKOUT_SECONDS = registry.register(Histogram(
+    "db_pool_checkout_seconds", "Time to borrow a pooled connection, including connecting.",
+))
+DB_CONNECT_SECONDS = registry.register(Histogram(
+    "db_connect_duration_seconds", "Time to open a new PostgreSQL connection.",
+))
+INGEST_STAGE_SECONDS = registry.register(Histogram(
+    "ingest_stage_duration_seconds",
+    "Ingest time by stage: fetch, parse, lock, write, rollups, commit.", ("stage",),
+))
+INGEST_ROWS = registry.register(Counter(
+    "ingest_rows_total", "Records received from upstream and rows written.", ("kind",),
+))
+INGEST_BATCHES = registry.register(Counter(
+    "ingest_batches_total", "Finished ingest batches by outcome.", ("status",),
+))
+INGEST_PAGES = registry.register(Counter(
+    "ingest_pages_total", "Fetched upstream pages: changed, not_modified (304) or unchanged (same hash).",
+    ("outcome",),
+))
+INGEST_SHORT_CIRCUITS = registry.register(Counter(
+    "ingest_short_circuits_total",
+    "Ingests that wrote nothing because every page was unchanged, by the stage that found it: fetch (304) or hash.", ("stage",),
+))
+
+HASH_SECONDS = registry.register(Histogram(
+    "password_hash_duration_seconds", "Password hash latency, including time queued for the hashing pool.",
+))
+
+UPSTREAM_REQUESTS = registry.register(Counter(
+    "upstream_requests_total", "Outbound request attempts by host and status (or error).", ("host", "status"),
+))
+UPSTREAM_RETRIES = registry.register(Counter(
+    "upstream_retries_total", "Outbound retries by host and reason: throttled, server_error, transport.",
+    ("host", "reason"),
+))
+UPSTREAM_RETRIES_DENIED = registry.register(Counter(
+    "upstream_retries_denied_total",
+    "Retryable failures returned to the caller, by cause: attempts, budget, retry_after.", ("host", "cause"),
+))
+UPSTREAM_WAIT_SECONDS = registry.register(Histogram(
+    "upstream_pacing_wait_seconds", "Time outbound requests waited for their host's rate limiter.", ("host",),
+))
+
+
+# =================== STATEMENT NAMES ===================
+_NAMED = re.compile(r"^\s*/\*\s*([\w.:-]+)\s*\*/")
+_VERB = re.compile(r"^\s*(\w+)")
+_TABLE = re.compile(r"\b(?:FROM|INTO|UPDATE|TABLE|JOIN|COPY)\s+([A-Za-z_][\w.]*)", re.IGNORECASE)
+_FUNCTION = re.compile(r"^\s*\w+\s+([A-Za-z_]\w*)")
+_statement_names = {}
+
+
+def statement_name(query) -> str:
+    """
+    Low-cardinality label for a SQL statement: the name in a leading
+    `/* name */` comment, else "<verb> <first table>" (e.g. "select coins").
+    """
+    name = _statement_names.get(query)
+    if name is not None:
+        return name
+    text = query.decode(errors="replace") if isinstance(query, bytes) else str(query)
+    named = _NAMED.match(text)
+    if named:
+        name = named.group(1)
+    else:
+        verb = _VERB.match(text)
+        target = _TABLE.search(text) or _FUNCTION.match(text)
+        name = " ".join(
+            part for part in (verb and verb.group(1).lower(), target and target.group(1)) if part
+        ) or "unknown"
+    if len(_statement_names) < 1024:
+        _statement_names[query] = name
+    return name
+
+
+# =================== HTTP ===================
+class MetricsMiddleware:
+    """ASGI middleware timing every HTTP request by route template and status."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = getattr(scope.get("route"), "path", "unmatched")
+            HTTP_REQUEST_SECONDS.observe(
+                time.perf_counter() - started, scope["method"], route, str(status)
+            )
+
+
+# =================== GAUGES ===================
+@registry.collector
+def _pool_gauges():
+    from app.database import get_pool
+
+    stats = get_pool().stats()
+    return [
+        ("db_pool_size", "gauge", "Open pooled connections.", stats["size"]),
+        ("db_pool_max_size", "gauge", "Configured pool maximum.", stats["max_size"]),
+        ("db_pool_in_use", "gauge", "Connections currently borrowed.", stats["in_use"]),
+        ("db_pool_idle", "gauge", "Idle pooled connections.", stats["idle"]),
+        ("db_pool_waiting", "gauge", "Callers waiting for a connection.", stats["waiting"]),
+        ("db_pool_timeouts_total", "counter", "Checkouts that timed out.", stats["timeouts"]),
+        ("db_pool_checkouts_total", "counter", "Connections borrowed.", stats["checkouts"]),
+    ]
+
+
+@registry.collector
+def _hashing_gauges():
+    from app.services.hashing import hashing_executor
+
+    stats = hashing_executor.stats()
+    return [
+        ("hashing_in_flight", "gauge", "Password hashes running.", stats["in_flight"]),
+        ("hashing_queue_depth", "gauge", "Password hashes queued.", stats["queue_depth"]),
+        ("hashing_max_queue", "gauge", "Configured hashing queue bound.", stats["max_queue"]),
+        ("hashing_completed_total", "counter", "Password hashes completed.", stats["completed"]),
+        ("hashing_rejected_total", "counter", "Hashes rejected with 503.", stats["rejected"]),
+    ]
+
+
+@registry.collector
+def _cache_gauges():
+    from app.services.cache import report_cache
+    from app.services.token_cache import token_cache
+
+    stats = report_cache.stats()
+    return [
+        ("report_cache_entries", "gauge", "Rendered reports cached.", stats["entries"]),
+        ("report_cache_hits_total", "counter", "Report cache hits.", stats["hits"]),
+        ("report_cache_misses_total", "counter", "Report cache misses.", stats["misses"]),
+        ("token_cache_entries", "gauge", "Verified tokens cached.", len(token_cache)),
+    ]
+
+
+@registry.collector
+def _upstream_gauges():
+    from app.services.rate_limit import upstream_limiter
+
+    stats = upstream_limiter.stats()
+    return [
+        ("upstream_retry_budget", "gauge", "Retries currently affordable under the retry budget.", stats["budget"]),
+        ("upstream_hosts", "gauge", "Upstream hosts with a rate limiter.", stats["hosts"]),
+        ("upstream_rate_min", "gauge", "Lowest current per-host request rate (req/s).", stats["min_rate"]),
+    ]
@@ -0,0 +1,262 @@
+"""
+Outbound rate limiting: a token bucket per upstream host whose rate adapts to
+throttling, Retry-After and jittered exponential backoff for retries, and one
+retry budget shared by every request. Installed as the shared client's
+transport, so all concurrent ingests in a process pace each host together.
+"""
+import asyncio
+import json
+import random
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+import httpx
+
+from app.config import (
+    HTTP_HOST_RATE_LIMITS, HTTP_MAX_RETRIES, HTTP_RATE_BURST, HTTP_RATE_FLOOR, HTTP_RATE_INCREASE,
+    HTTP_RATE_LIMIT, HTTP_RETRY_BASE_DELAY, HTTP_RETRY_BUDGET_MIN_PER_SEC, HTTP_RETRY_BUDGET_RATIO,
+    HTTP_RETRY_MAX_DELAY,
+)
+from app.services.metrics import (
+    UPSTREAM_REQUESTS, UPSTREAM_RETRIES, UPSTREAM_RETRIES_DENIED, UPSTREAM_WAIT_SECONDS,
+)
+
+RETRY_STATUSES = frozenset((429, 502, 503, 504))
+# Responses meaning "too fast": they lower the host's rate
+THROTTLE_STATUSES = frozenset((429, 503))
+IDEMPOTENT_METHODS = frozenset(("GET", "HEAD", "OPTIONS"))
+
+
+def retry_after(response: httpx.Response, now: datetime = None):
+    """Seconds asked for by a Retry-After header (delay or HTTP date), or None."""
+    value = response.headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - (now or datetime.now(timezone.utc))).total_seconds())
+
+
+# =================== TOKEN BUCKET ===================
+class HostLimiter:
+    """
+    Token bucket for one host. The rate starts at `ceiling`, halves on a
+    throttled response and climbs back by `increase` per success (AIMD), so
+    it settles just under what the upstream tolerates. A Retry-After pauses
+    the whole host, not only the request that received it. A `ceiling` of 0
+    disables pacing.
+    """
+
+    def __init__(self, ceiling: float, burst: int = HTTP_RATE_BURST, floor: float = HTTP_RATE_FLOOR,
+                 increase: float = HTTP_RATE_INCREASE):
+        self.ceiling = ceiling
+        self.rate = ceiling
+        self.burst = max(1, burst)
+        self.floor = min(floor, ceiling)
+        self.increase = increase
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._decreased_at = 0.0
+
+    def _refill(self, now: float):
+        elapsed = now - self._updated
+        if elapsed > 0:
+            self._tokens = min(self.burst, self._tokens + elapsed * self.rate)
+            self._updated = now
+
+    async def acquire(self) -> float:
+        """Wait for a token; returns the seconds waited."""
+        started = time.monotonic()
+        while True:
+            now = time.monotonic()
+            if self.ceiling <= 0:
+                if now >= self._paused_until:
+                    return now - started
+                await asyncio.sleep(self._paused_until - now)
+                continue
+            self._refill(now)
+            if now >= self._paused_until and self._tokens >= 1:
+                self._tokens -= 1
+                return now - started
+            # Re-checked after sleeping: the rate or a pause may have changed meanwhile
+            await asyncio.sleep(max(self._paused_until - now, (1 - self._tokens) / self.rate))
+
+    def succeeded(self):
+        if self.ceiling > 0:
+            self.rate = min(self.ceiling, self.rate + self.increase)
+
+    def throttled(self, sent_at: float):
+        """Halve the rate, once per round: responses to requests sent before the last decrease are ignored."""
+        if self.ceiling <= 0 or sent_at < self._decreased_at:
+            return
+        now = time.monotonic()
+        self._refill(now)
+        self.rate = max(self.floor, self.rate / 2)
+        self._decreased_at = now
+
+    def pause(self, seconds: float):
+        """Send nothing to this host for `seconds`, then restart from an empty bucket."""
+        until = time.monotonic() + seconds
+        if until > self._paused_until:
+            self._paused_until = until
+            self._tokens = min(self._tokens, 0.0)
+            self._updated = max(self._updated, until)
+
+
+# =================== RETRY BUDGET ===================
+class RetryBudget:
+    """
+    Retries allowed across all hosts: each request deposits `ratio` of a
+    retry, each retry withdraws one, and `min_per_sec` accrue regardless of
+    traffic. When an upstream is down, retries stay a bounded fraction of
+    requests instead of multiplying them.
+    """
+
+    def __init__(self, ratio: float = HTTP_RETRY_BUDGET_RATIO,
+                 min_per_sec: float = HTTP_RETRY_BUDGET_MIN_PER_SEC):
+        self.ratio = ratio
+        self.min_per_sec = min_per_sec
+        self.capacity = max(1.0, min_per_sec * 10)
+        self._balance = self.capacity
+        self._updated = time.monotonic()
+
+    def _accrue(self):
+        now = time.monotonic()
+        self._balance = min(self.capacity, self._balance + (now - self._updated) * self.min_per_sec)
+        self._updated = now
+
+    def deposit(self):
+        self._accrue()
+        self._balance = min(self.capacity, self._balance + self.ratio)
+
+    def withdraw(self) -> bool:
+        self._accrue()
+        if self._balance < 1:
+            return False
+        self._balance -= 1
+        return True
+
+    @property
+    def balance(self) -> float:
+        self._accrue()
+        return self._balance
+
+
+# =================== LIMITER ===================
+class UpstreamLimiter:
+    """Per-host token buckets plus retry policy, shared by every outbound request."""
+
+    def __init__(self, ceiling: float = HTTP_RATE_LIMIT, host_ceilings: dict = None,
+                 max_retries: int = HTTP_MAX_RETRIES, base_delay: float = HTTP_RETRY_BASE_DELAY,
+                 max_delay: float = HTTP_RETRY_MAX_DELAY, budget: RetryBudget = None, **bucket):
+        self.ceiling = ceiling
+        self.host_ceilings = host_ceilings or {}
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.budget = budget if budget is not None else RetryBudget()
+        self._bucket = bucket
+        self._hosts = {}
+
+    def host(self, name: str) -> HostLimiter:
+        limiter = self._hosts.get(name)
+        if limiter is None:
+            ceiling = self.host_ceilings.get(name, self.ceiling)
+            limiter = self._hosts[name] = HostLimiter(ceiling, **self._bucket)
+        return limiter
+
+    def backoff(self, attempt: int) -> float:
+        """Full-jitter exponential backoff before retry number `attempt` (from 0)."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def stats(self) -> dict:
+        paced = [limiter.rate for limiter in self._hosts.values() if limiter.ceiling > 0]
+        return {
+            "budget": round(self.budget.balance, 2),
+            "hosts": len(self._hosts),
+            "min_rate": min(paced) if paced else 0,
+        }
+
+    async def send(self, transport: httpx.AsyncBaseTransport, request: httpx.Request) -> httpx.Response:
+        """
+        Send `request` through `transport` when its host's bucket allows,
+        retrying idempotent requests on throttling, gateway errors and
+        connection failures. A retryable response is returned as-is once
+        retries run out, so callers see the upstream's own status.
+        """
+        name = request.url.host
+        limiter = self.host(name)
+        retryable = request.method in IDEMPOTENT_METHODS
+        self.budget.deposit()
+        attempt = 0
+        while True:
+            UPSTREAM_WAIT_SECONDS.observe(await limiter.acquire(), name)
+            sent_at = time.monotonic()
+            try:
+                response = await transport.handle_async_request(request)
+            except httpx.TransportError:
+                UPSTREAM_REQUESTS.inc(1, name, "error")
+                if not retryable or not self._may_retry(name, attempt):
+                    raise
+                reason, delay = "transport", self.backoff(attempt)
+            else:
+                UPSTREAM_REQUESTS.inc(1, name, str(response.status_code))
+                if response.status_code not in RETRY_STATUSES:
+                    limiter.succeeded()
+                    return response
+                if response.status_code in THROTTLE_STATUSES:
+                    limiter.throttled(sent_at)
+                asked = retry_after(response)
+                if asked is not None and asked > self.max_delay:
+                    UPSTREAM_RETRIES_DENIED.inc(1, name, "retry_after")
+                    return response
+                if not retryable or not self._may_retry(name, attempt):
+                    return response
+                await response.aclose()
+                reason = "throttled" if response.status_code in THROTTLE_STATUSES else "server_error"
+                if asked is not None:
+                    # The pause holds back every request to the host; no extra sleep
+                    limiter.pause(asked)
+                    delay = 0.0
+                else:
+                    delay = self.backoff(attempt)
+            UPSTREAM_RETRIES.inc(1, name, reason)
+            attempt += 1
+            if delay:
+                await asyncio.sleep(delay)
+
+    def _may_retry(self, name: str, attempt: int) -> bool:
+        if attempt >= self.max_retries:
+            UPSTREAM_RETRIES_DENIED.inc(1, name, "attempts")
+            return False
+        if not self.budget.withdraw():
+            UPSTREAM_RETRIES_DENIED.inc(1, name, "budget")
+            return False
+        return True
+
+
+class RateLimitedTransport(httpx.AsyncBaseTransport):
+    """httpx transport sending every request through an `UpstreamLimiter`."""
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, limiter: UpstreamLimiter = None):
+        self._transport = transport
+        self._limiter = limiter if limiter is not None else upstream_limiter
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        return await self._limiter.send(self._transport, request)
+
+    async def aclose(self):
+        await self._transport.aclose()
+
+
+upstream_limiter = UpstreamLimiter(host_ceilings=json.loads(HTTP_HOST_RATE_LIMITS))
@@ -0,0 +1,109 @@
+"""
+Hourly and daily per-coin rollups, folded in incrementally by every ingest.
+"""
+from datetime import datetime
+
+from fastapi import HTTPException
+from psycopg2.extras import execute_values
+
+from app.database import get_conn
+from app.services.coins import coin_registry
+from app.services.columnar import table_from_cursor
+from app.services.serialization import fetch_dicts
+
+
+# resolution -> (table, date_trunc unit)
+ROLLUPS = {
+    "1h": ("coin_rollups_hourly", "hour"),
+    "1d": ("coin_rollups_daily", "day"),
+}
+
+# Each batch contributes one observation per coin; open/close follow the
+# observation times so batches committing out of order still fold correctly
+_UPSERT_SQL = """
+    INSERT INTO {table} AS r (
+        coin_key, bucket, open, high, low, close, open_at, close_at,
+        market_cap, market_cap_min, market_cap_max,
+        total_volume_sum, volume_samples, samples
+    ) VALUES %s
+    ON CONFLICT (coin_key, bucket) DO UPDATE SET
+        open = CASE WHEN EXCLUDED.open_at < r.open_at THEN EXCLUDED.open ELSE r.open END,
+        open_at = LEAST(r.open_at, EXCLUDED.open_at),
+        close = CASE WHEN EXCLUDED.close_at >= r.close_at THEN EXCLUDED.close ELSE r.close END,
+        market_cap = CASE WHEN EXCLUDED.close_at >= r.close_at
+                          THEN EXCLUDED.market_cap ELSE r.market_cap END,
+        close_at = GREATEST(r.close_at, EXCLUDED.close_at),
+        high = GREATEST(r.high, EXCLUDED.high),
+        low = LEAST(r.low, EXCLUDED.low),
+        market_cap_min = LEAST(r.market_cap_min, EXCLUDED.market_cap_min),
+        market_cap_max = GREATEST(r.market_cap_max, EXCLUDED.market_cap_max),
+        total_volume_sum = r.total_volume_sum + EXCLUDED.total_volume_sum,
+        volume_samples = r.volume_samples + EXCLUDED.volume_samples,
+        samples = r.samples + EXCLUDED.samples
+"""
+
+
+def _bucket(ts: datetime, unit: str) -> datetime:
+    if unit == "day":
+        return ts.replace(hour=0, minute=0, second=0, microsecond=0)
+    return ts.replace(minute=0, second=0, microsecond=0)
+
+
+# =================== MAINTENANCE ===================
+def update_rollups(conn, timestamp: str, observations):
+    """
+    Fold one batch's observations, (coin_key, price, market_cap, volume)
+    tuples taken at `timestamp` (UTC), into the hour and day buckets that
+    contain it. Only those buckets are touched. Runs in the caller's
+    transaction, so rollups commit together with the batch.
+    """
+    ts = datetime.fromisoformat(timestamp)
+    c = conn.cursor()
+    for table, unit in ROLLUPS.values():
+        bucket = _bucket(ts, unit)
+        rows = [
+            (key, bucket, price, price, price, price, ts, ts,
+             market_cap, market_cap, market_cap,
+             volume or 0, 0 if volume is None else 1, 1)
+            for key, price, market_cap, volume in observations
+            if key is not None
+        ]
+        execute_values(c, _UPSERT_SQL.format(table=table), rows, page_size=1000)
+
+
+# =================== QUERIES ===================
+def query_rollup(coin_id: str, resolution: str, start=None, end=None, columnar: bool = False):
+    """
+    Rollup buckets of one coin, oldest first, as dicts or an Arrow table if
+    `columnar`; cost scales with the number of buckets.
+    """
+    if resolution not in ROLLUPS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid resolution: use one of {', '.join(ROLLUPS)}"
+        )
+    table, _ = ROLLUPS[resolution]
+    conditions, params = ["coin_key = %s"], []
+    if start is not None:
+        conditions.append("bucket >= %s")
+        params.append(start)
+    if end is not None:
+        conditions.append("bucket < %s")
+        params.append(end)
+
+    with get_conn() as conn:
+        coin_key = coin_registry.lookup(conn, coin_id)
+        if coin_key is None:
+            return []
+        cursor = conn.cursor()
+        cursor.execute(f"""
+            /* coin_rollup */
+            SELECT bucket AS timestamp, open, high, low, close,
+                   market_cap, market_cap_min, market_cap_max,
+                   total_volume_sum / NULLIF(volume_samples, 0) AS total_volume,
+                   samples
+            FROM {table}
+            WHERE {" AND ".join(conditions)}
+            ORDER BY bucket
+        """, [coin_key] + params)
+        return table_from_cursor(cursor) if columnar else fetch_dicts(cursor)
@@ -0,0 +1,29 @@
+"""
+Fast JSON rendering for report and export rows.
+
+Rows are fetched as tuples and zipped with the cursor's column names into
+plain dicts, which orjson encodes natively (datetimes as ISO 8601), instead
+of going through `jsonable_encoder` and the stdlib encoder value by value.
+"""
+from decimal import Decimal
+
+import orjson
+
+_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+def _default(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"Cannot serialise {type(value).__name__}")
+
+
+def dumps(value) -> bytes:
+    """JSON bytes of `value`; NaN and infinities become null."""
+    return orjson.dumps(value, default=_default, option=_OPTIONS)
+
+
+def fetch_dicts(cursor) -> list:
+    """Remaining rows of a tuple cursor as dicts keyed by column name."""
+    names = [column.name for column in cursor.description]
+    return [dict(zip(names, row)) for row in cursor.fetchall()]
@@ -0,0 +1,183 @@
+"""
+Slow-query log: statements over a latency threshold, with sampled EXPLAIN plans.
+"""
+import itertools
+import logging
+import random
+import re
+import textwrap
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timezone
+from decimal import Decimal
+
+from app.config import (
+    SLOW_QUERY_EXPLAIN_SAMPLE,
+    SLOW_QUERY_EXPLAIN_TIMEOUT_MS,
+    SLOW_QUERY_LOG_SIZE,
+    SLOW_QUERY_THRESHOLD_MS,
+)
+from app.services.metrics import statement_name
+
+logger = logging.getLogger(__name__)
+
+MAX_SQL_CHARS = 4000
+
+# Statements EXPLAIN ANALYZE must not re-run even read-only: row locks, and
+# functions with effects outside the transaction's data (advisory locks,
+# sequences, settings, notifications, sleeps)
+_SIDE_EFFECTS = re.compile(
+    r"\bfor\s+(?:no\s+key\s+)?(?:key\s+)?(?:update|share)\b"
+    r"|\b(?:pg_(?:try_)?advisory\w*|nextval|setval|set_config|pg_notify|pg_sleep\w*"
+    r"|pg_cancel_backend|pg_terminate_backend|dblink\w*|lo_\w+)\s*\(",
+    re.IGNORECASE,
+)
+
+
+def redact(params):
+    """
+    Parameters safe to keep: numbers, dates and NULLs as-is; text and bytes
+    only as their type and length (they may hold emails or password hashes).
+    """
+    if params is None:
+        return None
+    if isinstance(params, dict):
+        return {key: redact(value) for key, value in params.items()}
+    if isinstance(params, (list, tuple)):
+        return [redact(value) for value in params]
+    if isinstance(params, (date, datetime)):
+        return params.isoformat()
+    if isinstance(params, (bool, int, float, Decimal)):
+        return params
+    if isinstance(params, (str, bytes, bytearray, memoryview)):
+        return f"<{type(params).__name__} len={len(params)}>"
+    return f"<{type(params).__name__}>"
+
+
+def _is_explainable(sql: str) -> bool:
+    """
+    Only report queries are re-run under EXPLAIN ANALYZE: SELECTs named by a
+    leading `/* name */` comment that lock nothing and call no function with
+    side effects.
+    """
+    head = sql.lstrip()
+    if not head.startswith("/*"):
+        return False
+    while head.startswith("/*"):
+        head = head[head.find("*/") + 2:].lstrip()
+    return head[:6].lower() == "select" and not _SIDE_EFFECTS.search(head)
+
+
+class SlowQueryLog:
+    """
+    Bounded ring buffer of statements slower than `threshold_ms`.
+
+    `record` is called from the DB cursor after every statement, so the fast
+    path is a single comparison. For a `sample` fraction of slow report
+    queries (see `_is_explainable`) the plan is captured by re-running the statement under
+    EXPLAIN (ANALYZE, BUFFERS) on a single background thread, in a read-only
+    transaction with a statement timeout; at most one EXPLAIN is queued at a
+    time, so a burst of slow queries cannot pile up extra load.
+    """
+
+    def __init__(self, threshold_ms: float = SLOW_QUERY_THRESHOLD_MS, size: int = SLOW_QUERY_LOG_SIZE,
+                 sample: float = SLOW_QUERY_EXPLAIN_SAMPLE,
+                 explain_timeout_ms: int = SLOW_QUERY_EXPLAIN_TIMEOUT_MS):
+        self.threshold = threshold_ms / 1000 if threshold_ms > 0 else None
+        self.sample = sample
+        self.explain_timeout_ms = explain_timeout_ms
+        self._entries = deque(maxlen=max(1, size))
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._explainer = None
+        self._explain_pending = False
+
+    @property
+    def enabled(self) -> bool:
+        return self.threshold is not None
+
+    def settings(self) -> dict:
+        return {
+            "threshold_ms": self.threshold * 1000 if self.enabled else 0,
+            "explain_sample": self.sample,
+            "capacity": self._entries.maxlen,
+            "entries": len(self._entries),
+        }
+
+    def record(self, sql, params, seconds: float, rows: int):
+        """Keep the statement if it was slow, and maybe schedule its EXPLAIN."""
+        if self.threshold is None or seconds < self.threshold:
+            return
+        text = sql.decode(errors="replace") if isinstance(sql, bytes) else str(sql)
+        entry = {
+            "id": next(self._ids),
+            "at": datetime.now(timezone.utc).isoformat(),
+            "statement": statement_name(sql),
+            "duration_ms": round(seconds * 1000, 3),
+            "rows": rows,
+            "sql": textwrap.dedent(text).strip()[:MAX_SQL_CHARS],
+            "params": redact(params),
+            "plan": None,
+        }
+        with self._lock:
+            self._entries.append(entry)
+            explain = (
+                not self._explain_pending
+                and _is_explainable(text)
+                and random.random() < self.sample
+            )
+            if explain:
+                self._explain_pending = True
+        if explain:
+            self._executor().submit(self._explain, entry, sql, params)
+
+    def entries(self, limit: int = None) -> list:
+        """Newest first."""
+        with self._lock:
+            entries = list(reversed(self._entries))
+        return entries[:limit] if limit else entries
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def shutdown(self):
+        if self._explainer is not None:
+            self._explainer.shutdown(wait=False, cancel_futures=True)
+            self._explainer = None
+
+    def _executor(self):
+        if self._explainer is None:
+            self._explainer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="explain")
+        return self._explainer
+
+    def _explain(self, entry: dict, sql, params):
+        from psycopg2 import extensions
+
+        from app.database import get_conn
+
+        try:
+            with get_conn() as conn:
+                # A plain cursor: the EXPLAIN itself must not be timed or logged
+                c = conn.cursor(cursor_factory=extensions.cursor)
+                try:
+                    c.execute("SET TRANSACTION READ ONLY")
+                    c.execute("SET LOCAL statement_timeout = %s", (self.explain_timeout_ms,))
+                    started = time.perf_counter()
+                    c.execute(b"EXPLAIN (ANALYZE, BUFFERS) " + c.mogrify(sql, params))
+                    plan = "\n".join(row[0] for row in c.fetchall())
+                    entry["explain_ms"] = round((time.perf_counter() - started) * 1000, 3)
+                finally:
+                    conn.rollback()
+            entry["plan"] = plan
+        except Exception as e:
+            entry["plan_error"] = str(e)
+            logger.warning("EXPLAIN of slow query %s failed: %s", entry["statement"], e)
+        finally:
+            with self._lock:
+                self._explain_pending = False
+
+
+slow_query_log = SlowQueryLog()
@@ -0,0 +1,254 @@
+"""
+Snapshot reads: full rows materialised from keyframe and change-only batches.
+
+A keyframe batch stores a row for every coin; a delta batch stores rows only
+for coins whose values changed. The full state as of a batch is the newest
+row per coin committed between its keyframe and itself (`seq` order).
+"""
+import math
+from collections import namedtuple
+from datetime import datetime, timezone
+
+from app.database import get_conn
+from app.services.coins import coin_registry
+from app.services.columnar import table_from_cursor, table_from_rows
+from app.services.serialization import fetch_dicts
+from app.services.timeseries import parse_interval, lttb_indices, forward_fill, bucket_ohlc
+
+
+# (batch id, commit seq, snapshot time, keyframe batch id, keyframe seq,
+#  earliest snapshot time in the chain)
+Chain = namedtuple("Chain", "batch_id seq started_at keyframe_id keyframe_seq since")
+
+# Report row: snapshot facts (s) with the coin's identity from `coins` (c)
+LATEST_COLUMNS = (
+    "s.id", "c.coin_id", "c.symbol", "c.name",
+    "s.current_price", "s.market_cap", "s.total_volume",
+    "s.price_change_24h", "s.price_change_pct_24h",
+    "s.high_24h", "s.low_24h",
+    "s.circulating_supply", "s.max_supply",
+    "s.ath", "s.ath_change_pct",
+)
+
+
+# =================== BATCH CHAINS ===================
+def current_chain(conn):
+    """Chain of the current batch, or None before the first ingest."""
+    c = conn.cursor()
+    c.execute("""
+        SELECT b.id, b.seq, b.started_at, k.id, k.seq,
+               (SELECT min(x.started_at) FROM ingest_batches x
+                WHERE x.seq BETWEEN k.seq AND b.seq)
+        FROM ingest_current cur
+        JOIN ingest_batches b ON b.id = cur.batch_id
+        JOIN ingest_batches k ON k.id = b.keyframe_batch_id
+    """)
+    row = c.fetchone()
+    return Chain(*row) if row else None
+
+
+def chain_rows_sql(columns) -> str:
+    """
+    SQL selecting `columns` (of snapshots `s` and coins `c`) from the newest
+    row per coin in a chain; takes the named parameters `keyframe_seq`, `seq`
+    and `since` (from a `Chain`).
+    """
+    return """
+        SELECT DISTINCT ON (s.coin_key) {}
+        FROM market_snapshots s
+        JOIN ingest_batches b ON b.id = s.batch_id
+        LEFT JOIN coins c ON c.id = s.coin_key
+        WHERE b.seq BETWEEN %(keyframe_seq)s AND %(seq)s
+          AND s.timestamp >= %(since)s
+        ORDER BY s.coin_key, b.seq DESC
+    """.format(", ".join(columns))
+
+
+# =================== LATEST ===================
+def execute_latest(cursor, chain, limit=None):
+    """
+    Select the full rows of `chain`'s batch on `cursor`, ordered by market
+    cap: `LATEST_COLUMNS` plus the timestamp, at most `limit` (None for all).
+    """
+    if chain.keyframe_id == chain.batch_id:
+        cursor.execute("""
+            /* report_latest */
+            SELECT {}, s.timestamp
+            FROM market_snapshots s
+            LEFT JOIN coins c ON c.id = s.coin_key
+            WHERE s.batch_id = %s
+            ORDER BY s.market_cap DESC
+            LIMIT %s
+        """.format(", ".join(LATEST_COLUMNS)), (chain.batch_id, limit))
+    else:
+        # Unchanged coins carry an older row; report them as observed now
+        cursor.execute("""
+            /* report_latest_chain */
+            SELECT latest.*, %(started_at)s::timestamptz AS timestamp
+            FROM ({}) latest
+            ORDER BY market_cap DESC
+            LIMIT %(limit)s
+        """.format(chain_rows_sql(LATEST_COLUMNS)), dict(chain._asdict(), limit=limit))
+
+
+def query_latest(limit: int, columnar: bool = False):
+    """Full rows of the current batch, ordered by market cap; an Arrow table if `columnar`."""
+    with get_conn() as conn:
+        chain = current_chain(conn)
+        if chain is None:
+            return []
+        cursor = conn.cursor()
+        execute_latest(cursor, chain, limit)
+        return table_from_cursor(cursor) if columnar else fetch_dicts(cursor)
+
+
+# =================== TIME SERIES ===================
+def query_coin_timeseries(coin_id, start, end, interval, max_points, columnar: bool = False):
+    """
+    Raw points or OHLC buckets for one coin, optionally LTTB-downsampled.
+    Aggregated in SQL when every batch in range is a keyframe, otherwise
+    forward-filled and bucketed in NumPy. An Arrow table if `columnar`.
+    """
+    seconds = parse_interval(interval) if interval is not None else None
+    with get_conn() as conn:
+        coin_key = coin_registry.lookup(conn, coin_id)
+        if coin_key is None:
+            return []
+        if _has_delta_batches(conn, start, end):
+            names, rows = _materialised_series(conn, coin_key, start, end, seconds)
+        else:
+            names, rows = _stored_series(conn, coin_key, start, end, seconds)
+
+    # Column 0 is the epoch, used only for downsampling
+    price_column = "close" if seconds is not None else "current_price"
+    if max_points is not None and len(rows) > max_points:
+        columns = list(zip(*rows))
+        keep = lttb_indices(columns[0], columns[names.index(price_column)], max_points)
+        rows = [rows[i] for i in keep]
+    names = names[1:]
+    if columnar:
+        return table_from_rows(names, [row[1:] for row in rows])
+    return [dict(zip(names, row[1:])) for row in rows]
+
+
+def _range_conditions(column, start, end):
+    conditions, params = [], []
+    if start is not None:
+        conditions.append(f"{column} >= %s")
+        params.append(start)
+    if end is not None:
+        conditions.append(f"{column} < %s")
+        params.append(end)
+    return conditions, params
+
+
+def _has_delta_batches(conn, start, end) -> bool:
+    conditions, params = _range_conditions("started_at", start, end)
+    where = "".join(" AND " + condition for condition in conditions)
+    c = conn.cursor()
+    c.execute(f"""
+        SELECT EXISTS (
+            SELECT 1 FROM ingest_batches
+            WHERE status = 'complete' AND keyframe_batch_id <> id{where}
+        )
+    """, params)
+    return c.fetchone()[0]
+
+
+def _stored_series(conn, coin_key, start, end, seconds):
+    conditions, params = _range_conditions("timestamp", start, end)
+    where = " AND ".join(["coin_key = %s"] + conditions)
+    params = [coin_key] + params
+
+    if seconds is not None:
+        bucket = f"floor(extract(epoch FROM timestamp) / {seconds}) * {seconds}"
+        query = f"""
+            /* coin_buckets */
+            SELECT {bucket} AS epoch,
+                   to_timestamp({bucket}) AS timestamp,
+                   (array_agg(current_price ORDER BY timestamp))[1] AS open,
+                   max(current_price) AS high,
+                   min(current_price) AS low,
+                   (array_agg(current_price ORDER BY timestamp DESC))[1] AS close,
+                   (array_agg(market_cap ORDER BY timestamp DESC))[1] AS market_cap,
+                   avg(total_volume) AS total_volume,
+                   count(*) AS samples
+            FROM market_snapshots
+            WHERE {where}
+            GROUP BY 1
+            ORDER BY 1
+        """
+    else:
+        query = f"""
+            /* coin_series */
+            SELECT extract(epoch FROM timestamp) AS epoch,
+                   timestamp, current_price, market_cap, total_volume
+            FROM market_snapshots
+            WHERE {where}
+            ORDER BY timestamp
+        """
+
+    cursor = conn.cursor()
+    cursor.execute(query, params)
+    return [column.name for column in cursor.description], cursor.fetchall()
+
+
+def _materialised_series(conn, coin_key, start, end, seconds):
+    import numpy as np
+
+    conditions, params = _range_conditions("b.started_at", start, end)
+    where = "".join(" AND " + condition for condition in conditions)
+    c = conn.cursor()
+    c.execute(f"""
+        /* coin_chain_batches */
+        SELECT b.seq, k.seq, extract(epoch FROM b.started_at)
+        FROM ingest_batches b
+        JOIN ingest_batches k ON k.id = b.keyframe_batch_id
+        WHERE b.status = 'complete' AND b.rows_received > 0{where}
+        ORDER BY b.started_at, b.seq
+    """, params)
+    batches = np.array(c.fetchall(), dtype=float).reshape(-1, 3)
+
+    rows = np.empty((0, 4))
+    if len(batches):
+        first, last = int(batches[:, 1].min()), int(batches[:, 0].max())
+        c.execute("""
+            /* coin_chain_rows */
+            SELECT b.seq, s.current_price, s.market_cap, s.total_volume
+            FROM market_snapshots s
+            JOIN ingest_batches b ON b.id = s.batch_id
+            WHERE s.coin_key = %s
+              AND s.timestamp >= (SELECT min(started_at) FROM ingest_batches
+                                  WHERE seq BETWEEN %s AND %s)
+              AND b.seq BETWEEN %s AND %s
+            ORDER BY b.seq
+        """, (coin_key, first, last, first, last))
+        rows = np.array(c.fetchall(), dtype=float).reshape(-1, 4)
+
+    found, values = forward_fill(rows[:, 0], rows[:, 1:], batches[:, 0], batches[:, 1])
+    epoch = batches[found, 2]
+    price, market_cap, volume = values.T if len(values) else (np.empty(0),) * 3
+
+    if seconds is not None:
+        names = ["epoch", "timestamp", "open", "high", "low", "close",
+                 "market_cap", "total_volume", "samples"]
+        columns = bucket_ohlc(epoch, price, market_cap, volume, seconds)
+        series = zip(*columns[:-1], columns[-1].astype(int).tolist())
+    else:
+        names = ["epoch", "timestamp", "current_price", "market_cap", "total_volume"]
+        series = zip(epoch, price, market_cap, volume)
+
+    result = []
+    for point in series:
+        values = [_to_json_number(value) for value in point[1:]]
+        timestamp = datetime.fromtimestamp(point[0], timezone.utc)
+        result.append((float(point[0]), timestamp, *values))
+    return names, result
+
+
+def _to_json_number(value):
+    """Plain Python number with NaN (NULL in SQL) mapped back to None."""
+    if isinstance(value, int):
+        return value
+    value = float(value)
+    return None if math.isnan(value) else value
@@ -0,0 +1,114 @@
+"""
+Conditional upstream fetching: per-URL validators (ETag, Last-Modified) and a
+content hash of the last body, so unchanged pages are not re-downloaded and,
+unless streamed, not re-parsed.
+"""
+import hashlib
+import time
+from collections import namedtuple
+
+import httpx
+from fastapi import HTTPException
+from psycopg2.extras import execute_values
+
+from app.database import get_conn
+from app.services.metrics import INGEST_STAGE_SECONDS
+
+# What is remembered about a page URL
+Source = namedtuple("Source", "etag last_modified content_hash")
+
+# One fetched page. `outcome` is "not_modified" (304, no body), "unchanged"
+# (body hashes as before) or "changed". `body` is bytes, or None when the
+# page had none or it was handed to a consumer as it streamed in.
+FetchedPage = namedtuple("FetchedPage", "url outcome body etag last_modified content_hash")
+
+
+# =================== STATE ===================
+def load_sources(urls) -> dict:
+    """Remembered validators and hash of each of `urls` fetched before."""
+    with get_conn() as conn:
+        c = conn.cursor()
+        c.execute(
+            "SELECT url, etag, last_modified, content_hash FROM ingest_sources WHERE url = ANY(%s)",
+            (list(urls),)
+        )
+        rows = c.fetchall()
+        conn.rollback()
+    return {url: Source(*state) for url, *state in rows}
+
+
+def save_sources(conn, pages):
+    """
+    Remember the validators and hash of `pages`, in the caller's transaction:
+    callers save only once the pages' rows are committed (or skipped), so a
+    failed ingest never leaves a hash that would skip the retry.
+    """
+    if not pages:
+        return
+    execute_values(conn.cursor(), """
+        INSERT INTO ingest_sources AS s (url, etag, last_modified, content_hash, checked_at, changed_at)
+        VALUES %s
+        ON CONFLICT (url) DO UPDATE SET
+            etag = EXCLUDED.etag,
+            last_modified = EXCLUDED.last_modified,
+            content_hash = EXCLUDED.content_hash,
+            checked_at = EXCLUDED.checked_at,
+            changed_at = CASE WHEN EXCLUDED.content_hash IS DISTINCT FROM s.content_hash
+                              THEN EXCLUDED.checked_at ELSE s.changed_at END
+    """, [
+        (page.url, page.etag, page.last_modified, page.content_hash)
+        for page in pages
+    ], template="(%s, %s, %s, %s, now(), now())")
+
+
+# =================== FETCHING ===================
+async def fetch_conditional(client: httpx.AsyncClient, url: str, known: Source = None,
+                            consume=None) -> FetchedPage:
+    """
+    GET `url`, conditional on what is `known` about it, hashing the body as
+    it arrives. The body is kept unparsed, so an unchanged page costs no
+    parsing; with `consume`, each chunk is instead awaited through
+    `consume(chunk)` as it streams in and nothing is kept, so memory stays
+    bounded and the caller learns whether the page changed once it is read.
+    """
+    headers = {}
+    if known is not None:
+        if known.etag:
+            headers["If-None-Match"] = known.etag
+        if known.last_modified:
+            headers["If-Modified-Since"] = known.last_modified
+
+    started = time.perf_counter()
+    consuming = 0.0   # time spent in `consume`, not on the network
+    async with client.stream("GET", url, headers=headers) as response:
+        if response.status_code == 304:
+            INGEST_STAGE_SECONDS.observe(time.perf_counter() - started, "fetch")
+            if known is None:
+                raise HTTPException(status_code=502, detail="Upstream answered 304 to an unconditional request")
+            return FetchedPage(
+                url, "not_modified", None,
+                response.headers.get("etag", known.etag),
+                response.headers.get("last-modified", known.last_modified),
+                known.content_hash,
+            )
+        response.raise_for_status()
+        digest = hashlib.sha256()
+        body = bytearray() if consume is None else None
+        async for chunk in response.aiter_bytes():
+            digest.update(chunk)
+            if consume is None:
+                body.extend(chunk)
+            else:
+                mark = time.perf_counter()
+                await consume(chunk)
+                consuming += time.perf_counter() - mark
+        etag = response.headers.get("etag")
+        last_modified = response.headers.get("last-modified")
+    INGEST_STAGE_SECONDS.observe(time.perf_counter() - started - consuming, "fetch")
+
+    content_hash = digest.hexdigest()
+    unchanged = known is not None and known.content_hash == content_hash
+    return FetchedPage(
+        url, "unchanged" if unchanged else "changed", None if body is None else bytes(body),
+        etag, last_modified, content_hash,
+    )
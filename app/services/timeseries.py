@@ -0,0 +1,115 @@
+"""
+Time series helpers: bucket interval parsing, forward filling of change-only
+rows, OHLC bucketing and LTTB downsampling.
+"""
+import re
+
+from fastapi import HTTPException
+
+
+# =================== INTERVALS ===================
+_INTERVAL = re.compile(r"^(\d+)\s*([smhdw])$")
+_UNIT_SECONDS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+
+
+def parse_interval(interval: str) -> int:
+    """Parse an interval such as '30s', '5m', '1h', '1d' or '1w' into seconds."""
+    match = _INTERVAL.match(interval.strip().lower())
+    if not match or int(match.group(1)) == 0:
+        raise HTTPException(
+            status_code=400,
+            detail="Invalid interval: use a positive number followed by s, m, h, d or w (e.g. 5m, 1h)"
+        )
+    return int(match.group(1)) * _UNIT_SECONDS[match.group(2)]
+
+
+# =================== MATERIALISATION ===================
+def forward_fill(row_seq, values, seq, keyframe_seq):
+    """
+    Carry change-only rows forward to the batches that observed them.
+
+    `row_seq` (ascending) is the commit sequence of each stored row and
+    `values` its columns. For each observing batch (`seq`, `keyframe_seq`)
+    picks the newest row committed at or before it and not before its
+    keyframe. Returns (found mask, values of the found observations).
+    """
+    import numpy as np
+
+    row_seq = np.asarray(row_seq, dtype=float)
+    values = np.asarray(values, dtype=float).reshape(len(row_seq), -1)
+    seq = np.asarray(seq, dtype=float)
+    keyframe_seq = np.asarray(keyframe_seq, dtype=float)
+    if not len(row_seq):
+        return np.zeros(len(seq), dtype=bool), values
+    idx = np.searchsorted(row_seq, seq, side="right") - 1
+    found = (idx >= 0) & (row_seq[np.maximum(idx, 0)] >= keyframe_seq)
+    return found, values[idx[found]]
+
+
+def bucket_ohlc(epoch, price, market_cap, volume, seconds: int):
+    """
+    Aggregate an ascending series into `seconds`-wide buckets, matching the SQL
+    aggregation: (bucket epoch, open, high, low, close, market_cap, avg volume, samples).
+    """
+    import numpy as np
+
+    epoch = np.asarray(epoch, dtype=float)
+    if not len(epoch):
+        return tuple(np.empty(0) for _ in range(8))
+    price = np.asarray(price, dtype=float)
+    volume = np.asarray(volume, dtype=float)
+    bucket = np.floor(epoch / seconds) * seconds
+    starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+    ends = np.r_[starts[1:], len(bucket)] - 1
+    with np.errstate(invalid="ignore", divide="ignore"):
+        volume_avg = (np.add.reduceat(np.nan_to_num(volume), starts)
+                      / np.add.reduceat(~np.isnan(volume), starts))
+    return (
+        bucket[starts],
+        price[starts],
+        np.fmax.reduceat(price, starts),
+        np.fmin.reduceat(price, starts),
+        price[ends],
+        np.asarray(market_cap, dtype=float)[ends],
+        volume_avg,
+        ends - starts + 1,
+    )
+
+
+# =================== DOWNSAMPLING ===================
+def lttb_indices(x, y, threshold: int):
+    """
+    Largest-Triangle-Three-Buckets downsampling.
+
+    Returns the indices of at most `threshold` points of the series (x, y)
+    that best preserve its visual shape. The first and last points are always
+    kept. Work per output point is vectorised over its bucket.
+    """
+    import numpy as np
+
+    x = np.asarray(x, dtype=float)
+    y = np.nan_to_num(np.asarray(y, dtype=float))
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    # threshold - 2 buckets spanning the points between the first and last
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    selected = np.empty(threshold, dtype=int)
+    selected[0] = 0
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        next_start = edges[i + 1]
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+
+        areas = np.abs(
+            (x[a] - avg_x) * (y[start:end] - y[a])
+            - (x[a] - x[start:end]) * (avg_y - y[a])
+        )
+        a = start + int(np.argmax(areas))
+        selected[i + 1] = a
+    selected[-1] = n - 1
+    return selected
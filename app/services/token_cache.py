@@ -0,0 +1,57 @@
+"""
+Bounded cache of already-verified bearer tokens.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from app.config import TOKEN_CACHE_SIZE
+
+
+class TokenCache:
+    """
+    LRU map of sha256(token) -> user, with each entry expiring at the token's
+    own `exp` claim. Tokens without `exp` are never cached.
+    """
+
+    def __init__(self, max_entries: int = TOKEN_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()   # digest -> (user, exp)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _digest(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token: str):
+        digest = self._digest(token)
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is None:
+                return None
+            if entry[1] <= time.time():
+                del self._entries[digest]
+                return None
+            self._entries.move_to_end(digest)
+            return entry[0]
+
+    def put(self, token: str, user: str, exp):
+        if not isinstance(exp, (int, float)) or exp <= time.time():
+            return
+        digest = self._digest(token)
+        with self._lock:
+            self._entries[digest] = (user, exp)
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+token_cache = TokenCache()
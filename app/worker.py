@@ -0,0 +1,43 @@
+"""
+Standalone ingest worker: runs queued ingest jobs and the ingest schedule
+without serving HTTP, so ingest capacity scales apart from the web workers
+(which can then run with INGEST_WORKERS=0).
+
+Run with: python -m app.worker
+"""
+import asyncio
+import logging
+import signal
+
+from fastapi.concurrency import run_in_threadpool
+
+from app.config import INGEST_WORKERS, RUN_MIGRATIONS_ON_STARTUP
+from app.database import open_pool, close_pool
+from app.migrations import ensure_schema
+from app.services.http_client import open_client, close_client
+from app.services.jobs import JobRunner, job_runner
+
+
+async def main():
+    await run_in_threadpool(open_pool)
+    await open_client()
+    if RUN_MIGRATIONS_ON_STARTUP:
+        await run_in_threadpool(ensure_schema)
+    runner = JobRunner(workers=max(1, INGEST_WORKERS), schedule=job_runner.schedule)
+    runner.start()
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    logging.getLogger(__name__).info("Ingest worker running %d job(s) at a time", runner.workers)
+    await stop.wait()
+
+    await runner.stop()
+    await close_client()
+    close_pool()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
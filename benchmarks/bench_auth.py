@@ -0,0 +1,71 @@
+"""
+Microbenchmark for get_current_user: full verification vs the verified-token cache.
+
+Run with: python -m benchmarks.bench_auth [iterations]
+Entra tokens are signed with a throwaway RSA key injected into the JWKS cache,
+so no network access is needed.
+"""
+import sys
+import time
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from jose import jwk, jwt
+
+from app.config import AZURE_CLIENT_ID, AZURE_TENANT_ID
+from app.services.auth import create_access_token, get_current_user
+from app.services.jwks import jwks_cache
+from app.services.token_cache import token_cache
+
+
+def _entra_token() -> str:
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    pem = private_key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    )
+    public = jwk.construct(
+        private_key.public_key().public_bytes(
+            serialization.Encoding.PEM,
+            serialization.PublicFormat.SubjectPublicKeyInfo,
+        ),
+        "RS256",
+    ).to_dict()
+    public["kid"] = "bench"
+    jwks_cache._store({"keys": [public]})
+    claims = {
+        "aud": AZURE_CLIENT_ID,
+        "iss": f"https://login.microsoftonline.com/{AZURE_TENANT_ID}/v2.0",
+        "preferred_username": "bench@example.com",
+        "exp": int(time.time()) + 3600,
+    }
+    return jwt.encode(claims, pem.decode(), algorithm="RS256", headers={"kid": "bench"})
+
+
+def _per_call_us(fn, iterations: int) -> float:
+    started = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - started) / iterations * 1e6
+
+
+def main(iterations: int = 2000):
+    tokens = {
+        "hs256": create_access_token({"sub": "bench@example.com"}),
+        "entra": _entra_token(),
+    }
+    for name, token in tokens.items():
+        def uncached():
+            token_cache.clear()
+            get_current_user(token)
+
+        get_current_user(token)
+        cold = _per_call_us(uncached, iterations)
+        get_current_user(token)
+        warm = _per_call_us(lambda: get_current_user(token), iterations)
+        print(f"{name:6s} verify: {cold:9.1f} us/call   cached: {warm:6.2f} us/call")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
@@ -0,0 +1,123 @@
+"""
+Coin dimension benchmark: snapshot table size and coin_timeseries latency with
+text coin columns on every row (before) vs an integer `coins` key (after).
+
+Run with: python -m benchmarks.bench_coin_dimension [coins] [snapshots_per_coin]
+Both layouts are generated side by side in a scratch `bench_coin_dimension`
+schema of DATABASE_URL, which is dropped afterwards; app tables are untouched.
+"""
+import random
+import statistics
+import sys
+import time
+
+import psycopg2
+
+from app.config import DATABASE_URL
+
+SCHEMA = "bench_coin_dimension"
+
+_FACTS = """
+    random() * 1000, random() * 1e10, random() * 1e9,
+    random(), random(), random() * 1000, random() * 1000,
+    1e7, 2.1e7, 70000.0, -5.0,
+    now() - make_interval(mins => t)
+"""
+_FACT_COLUMNS = """
+    current_price DOUBLE PRECISION, market_cap DOUBLE PRECISION, total_volume DOUBLE PRECISION,
+    price_change_24h DOUBLE PRECISION, price_change_pct_24h DOUBLE PRECISION,
+    high_24h DOUBLE PRECISION, low_24h DOUBLE PRECISION,
+    circulating_supply DOUBLE PRECISION, max_supply DOUBLE PRECISION,
+    ath DOUBLE PRECISION, ath_change_pct DOUBLE PRECISION,
+    timestamp TIMESTAMPTZ NOT NULL
+"""
+
+LAYOUTS = {
+    "text columns": (f"""
+        CREATE TABLE {SCHEMA}.snapshots (
+            id SERIAL PRIMARY KEY,
+            coin_id VARCHAR(100), symbol VARCHAR(20), name VARCHAR(100),
+            {_FACT_COLUMNS}
+        );
+        INSERT INTO {SCHEMA}.snapshots
+            (coin_id, symbol, name, current_price, market_cap, total_volume,
+             price_change_24h, price_change_pct_24h, high_24h, low_24h,
+             circulating_supply, max_supply, ath, ath_change_pct, timestamp)
+            SELECT 'coin-number-' || k, 'sym' || k, 'Coin Number ' || k, {_FACTS}
+            FROM generate_series(1, %(coins)s) k, generate_series(1, %(snapshots)s) t;
+        CREATE INDEX ON {SCHEMA}.snapshots (coin_id, timestamp);
+    """, f"""
+        SELECT timestamp, current_price, market_cap, total_volume
+        FROM {SCHEMA}.snapshots WHERE coin_id = %s ORDER BY timestamp
+    """),
+    "coins key": (f"""
+        CREATE TABLE {SCHEMA}.coins (
+            id SERIAL PRIMARY KEY,
+            coin_id VARCHAR(100) NOT NULL UNIQUE, symbol VARCHAR(20), name VARCHAR(100)
+        );
+        INSERT INTO {SCHEMA}.coins (coin_id, symbol, name)
+            SELECT 'coin-number-' || k, 'sym' || k, 'Coin Number ' || k
+            FROM generate_series(1, %(coins)s) k;
+        CREATE TABLE {SCHEMA}.snapshots (
+            id SERIAL PRIMARY KEY,
+            coin_key INTEGER REFERENCES {SCHEMA}.coins (id),
+            {_FACT_COLUMNS}
+        );
+        INSERT INTO {SCHEMA}.snapshots
+            (coin_key, current_price, market_cap, total_volume,
+             price_change_24h, price_change_pct_24h, high_24h, low_24h,
+             circulating_supply, max_supply, ath, ath_change_pct, timestamp)
+            SELECT k, {_FACTS}
+            FROM generate_series(1, %(coins)s) k, generate_series(1, %(snapshots)s) t;
+        CREATE INDEX ON {SCHEMA}.snapshots (coin_key, timestamp);
+    """, f"""
+        SELECT timestamp, current_price, market_cap, total_volume
+        FROM {SCHEMA}.snapshots WHERE coin_key = %s ORDER BY timestamp
+    """),
+}
+
+
+def _sizes(c):
+    c.execute(f"""
+        SELECT pg_table_size('{SCHEMA}.snapshots'), pg_indexes_size('{SCHEMA}.snapshots')
+    """)
+    return c.fetchone()
+
+
+def _latency_ms(c, query, params, runs: int):
+    timings = []
+    for param in params * runs:
+        started = time.perf_counter()
+        c.execute(query, (param,))
+        c.fetchall()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def main(coins: int = 2000, snapshots: int = 200, runs: int = 5):
+    if not DATABASE_URL:
+        sys.exit("DATABASE_URL is not set")
+    conn = psycopg2.connect(DATABASE_URL)
+    conn.autocommit = True
+    c = conn.cursor()
+    picks = random.Random(0).sample(range(1, coins + 1), min(coins, 20))
+    print(f"{coins} coins x {snapshots} snapshots = {coins * snapshots} rows")
+    try:
+        for layout, (setup, query) in LAYOUTS.items():
+            c.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+            c.execute(f"CREATE SCHEMA {SCHEMA}")
+            c.execute(setup, {"coins": coins, "snapshots": snapshots})
+            c.execute(f"VACUUM ANALYZE {SCHEMA}.snapshots")
+            heap, indexes = _sizes(c)
+            params = picks if layout == "coins key" else [f"coin-number-{k}" for k in picks]
+            latency = _latency_ms(c, query, params, runs)
+            print(f"{layout:13s} heap {heap / 2**20:8.1f} MiB   indexes {indexes / 2**20:7.1f} MiB"
+                  f"   coin_timeseries p50 {latency:6.2f} ms")
+    finally:
+        c.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        conn.close()
+
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:3]]
+    main(*args)
@@ -0,0 +1,86 @@
+"""
+Columnar response benchmark: payload size, server encode time and client
+decode time (to a typed DataFrame) for JSON vs Arrow IPC vs Parquet.
+
+Run with: python -m benchmarks.bench_columnar [rows,rows,...]
+Defaults to 10k, 100k and 1M rows shaped like /report/latest, generated by
+DATABASE_URL with generate_series, so no app tables are read or written.
+The JSON decode includes the per-column coercion the dashboard used to do.
+"""
+import io
+import sys
+import time
+
+import orjson
+import pandas as pd
+import psycopg2
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from app.config import DATABASE_URL
+from app.services.columnar import encode_table, table_from_cursor
+from app.services.compression import compress
+from app.services.serialization import dumps, fetch_dicts
+from benchmarks.bench_serialization import QUERY
+
+NUMERIC = (
+    "current_price", "market_cap", "total_volume", "price_change_24h",
+    "price_change_pct_24h", "high_24h", "low_24h", "circulating_supply",
+    "max_supply", "ath", "ath_change_pct",
+)
+
+
+def _encode(conn, rows: int, fmt: str) -> bytes:
+    cursor = conn.cursor()
+    cursor.execute(QUERY, (rows,))
+    if fmt == "json":
+        return dumps(fetch_dicts(cursor))
+    return encode_table(table_from_cursor(cursor), fmt)
+
+
+def _decode_json(body: bytes) -> pd.DataFrame:
+    df = pd.DataFrame(orjson.loads(body))
+    for column in NUMERIC:
+        df[column] = pd.to_numeric(df[column], errors="coerce")
+    df["timestamp"] = pd.to_datetime(df["timestamp"])
+    return df
+
+
+DECODERS = {
+    "json": _decode_json,
+    "arrow": lambda body: pa.ipc.open_stream(body).read_pandas(),
+    "parquet": lambda body: pq.read_table(io.BytesIO(body)).to_pandas(),
+}
+
+
+def _timed(fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    return result, (time.perf_counter() - started) * 1000
+
+
+def main(sizes=(10_000, 100_000, 1_000_000)):
+    if not DATABASE_URL:
+        sys.exit("DATABASE_URL is not set")
+    conn = psycopg2.connect(DATABASE_URL)
+    try:
+        print(f"{'rows':>9s} {'format':8s} {'bytes':>12s} {'gzip bytes':>12s}"
+              f" {'encode ms':>10s} {'decode ms':>10s}")
+        for rows in sizes:
+            for fmt, decode in DECODERS.items():
+                body, encode_ms = _timed(_encode, conn, rows, fmt)
+                # Parquet pages are already compressed, so it is sent as-is
+                wire = len(body) if fmt == "parquet" else len(compress(body, "gzip"))
+                _, decode_ms = _timed(decode, body)
+                print(f"{rows:9d} {fmt:8s} {len(body):12d} {wire:12d}"
+                      f" {encode_ms:10.1f} {decode_ms:10.1f}")
+                del body
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        main([int(size) for size in sys.argv[1].split(",")])
+    else:
+        main()
@@ -0,0 +1,71 @@
+"""
+Upstream rate limiter benchmark against the stub upstream enforcing a quota.
+
+Run with: python -m benchmarks.bench_rate_limit [requests] [quota]
+Sends `requests` (default 300) page fetches from 8 concurrent fetchers (two
+ingests' worth at INGEST_FETCH_CONCURRENCY=4) through the shared-client
+transport, under a quota of `quota` requests/s (default 20), and compares:
+no pacing or retries (the old behaviour), retries only, and the token bucket
+starting above and at the quota. Reports successes, requests the stub
+refused with 429, and goodput.
+"""
+import asyncio
+import sys
+import time
+
+import httpx
+
+from app.services.rate_limit import RateLimitedTransport, RetryBudget, UpstreamLimiter
+from benchmarks import stub_upstream
+
+FETCHERS = 8
+
+
+def scenarios(quota: float) -> dict:
+    return {
+        "no pacing, no retries": UpstreamLimiter(ceiling=0, max_retries=0, budget=RetryBudget()),
+        "retries only": UpstreamLimiter(ceiling=0, budget=RetryBudget()),
+        "bucket at 2.5x quota": UpstreamLimiter(ceiling=quota * 2.5, budget=RetryBudget()),
+        "bucket at quota": UpstreamLimiter(ceiling=quota, budget=RetryBudget()),
+    }
+
+
+async def _run(url: str, limiter: UpstreamLimiter, requests: int) -> dict:
+    transport = RateLimitedTransport(httpx.AsyncHTTPTransport(), limiter)
+    pending = list(range(requests))
+    ok = failed = 0
+
+    async def fetcher(client):
+        nonlocal ok, failed
+        while pending:
+            page = pending.pop() % 20 + 1
+            response = await client.get(url, params={"page": page})
+            if response.status_code == 200:
+                ok += 1
+            else:
+                failed += 1
+
+    async with httpx.AsyncClient(transport=transport, timeout=30) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(fetcher(client) for _ in range(FETCHERS)))
+        elapsed = time.perf_counter() - started
+    return {"ok": ok, "failed": failed, "elapsed": elapsed}
+
+
+def main(requests: int = 300, quota: float = 20.0):
+    server = stub_upstream.start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/coins?per_page=50&etag=0"
+    try:
+        print(f"{requests} requests, {FETCHERS} fetchers, quota {quota:g} req/s")
+        print(f"{'scenario':24s} {'ok':>5s} {'failed':>6s} {'429s':>6s} {'seconds':>8s} {'ok/s':>7s}")
+        for name, limiter in scenarios(quota).items():
+            server.quota = stub_upstream.Quota(quota)
+            result = asyncio.run(_run(url, limiter, requests))
+            print(f"{name:24s} {result['ok']:5d} {result['failed']:6d} {server.quota.rejected:6d}"
+                  f" {result['elapsed']:8.2f} {result['ok'] / result['elapsed']:7.1f}")
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main(*(cast(arg) for cast, arg in zip((int, float), sys.argv[1:])))
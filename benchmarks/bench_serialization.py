@@ -0,0 +1,84 @@
+"""
+Report serialisation benchmark: CPU per 1k rows and bytes on the wire for the
+old path (RealDictCursor rows through jsonable_encoder and the stdlib
+encoder, sent uncompressed) vs the new one (tuple rows zipped into dicts,
+orjson, gzip/brotli).
+
+Run with: python -m benchmarks.bench_serialization [rows] [runs]
+Rows shaped like /report/latest are generated by DATABASE_URL with
+generate_series, so no app tables are read or written.
+"""
+import statistics
+import sys
+import time
+
+import psycopg2
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from psycopg2.extras import RealDictCursor
+
+from app.config import DATABASE_URL
+from app.services.compression import ENCODINGS, compress
+from app.services.serialization import dumps, fetch_dicts
+
+QUERY = """
+    SELECT k AS id, 'coin-number-' || k AS coin_id, 'sym' || k AS symbol,
+           'Coin Number ' || k AS name,
+           random() * 1000 AS current_price, random() * 1e10 AS market_cap,
+           random() * 1e9 AS total_volume, random() AS price_change_24h,
+           random() AS price_change_pct_24h, random() * 1000 AS high_24h,
+           random() * 1000 AS low_24h, 1e7::float8 AS circulating_supply,
+           CASE WHEN k %% 3 = 0 THEN NULL ELSE 2.1e7::float8 END AS max_supply,
+           70000.0::float8 AS ath, -5.0::float8 AS ath_change_pct,
+           now() - make_interval(secs => k) AS timestamp
+    FROM generate_series(1, %s) k
+"""
+
+
+def _old(conn, rows: int) -> bytes:
+    cursor = conn.cursor(cursor_factory=RealDictCursor)
+    cursor.execute(QUERY, (rows,))
+    return JSONResponse(content=jsonable_encoder(cursor.fetchall())).body
+
+
+def _new(conn, rows: int) -> bytes:
+    cursor = conn.cursor()
+    cursor.execute(QUERY, (rows,))
+    return dumps(fetch_dicts(cursor))
+
+
+def _cpu_ms_per_1k(fn, conn, rows: int, runs: int) -> float:
+    """Client-side CPU (fetch + encode), excluding time waiting on PostgreSQL."""
+    timings = []
+    for _ in range(runs):
+        started = time.process_time()
+        fn(conn, rows)
+        timings.append((time.process_time() - started) * 1000 * 1000 / rows)
+    return statistics.median(timings)
+
+
+def main(rows: int = 5000, runs: int = 7):
+    if not DATABASE_URL:
+        sys.exit("DATABASE_URL is not set")
+    conn = psycopg2.connect(DATABASE_URL)
+    try:
+        print(f"{rows} report rows, median of {runs} runs")
+        for label, fn in (("jsonable_encoder + json", _old), ("tuples + orjson", _new)):
+            cpu = _cpu_ms_per_1k(fn, conn, rows, runs)
+            print(f"{label:24s} {cpu:7.2f} ms CPU per 1k rows")
+
+        body = _new(conn, rows)
+        print(f"\n{'identity':9s} {len(body):10d} bytes")
+        for encoding in ENCODINGS:
+            started = time.process_time()
+            compressed = compress(body, encoding)
+            cpu = (time.process_time() - started) * 1000 * 1000 / rows
+            print(f"{encoding:9s} {len(compressed):10d} bytes  ({len(compressed) / len(body):5.1%})"
+                  f"  {cpu:6.2f} ms CPU per 1k rows, once per cached report")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:3]]
+    main(*args)
@@ -0,0 +1,82 @@
+"""
+Startup benchmark: time to import app.main and time until a uvicorn worker serves requests.
+
+Run with: python -m benchmarks.bench_startup [runs]
+Exits non-zero when the median exceeds STARTUP_IMPORT_BUDGET_MS or
+STARTUP_READY_BUDGET_MS, so it can gate CI. The ready time includes opening
+the connection pool and the startup schema check against DATABASE_URL.
+"""
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+IMPORT_BUDGET_MS = float(os.getenv("STARTUP_IMPORT_BUDGET_MS", "1500"))
+READY_BUDGET_MS = float(os.getenv("STARTUP_READY_BUDGET_MS", "4000"))
+
+_IMPORT_SNIPPET = (
+    "import time; started = time.perf_counter(); import app.main; "
+    "print((time.perf_counter() - started) * 1000)"
+)
+
+
+def measure_import_ms() -> float:
+    """Import app.main in a fresh interpreter and return the import time."""
+    output = subprocess.run(
+        [sys.executable, "-c", _IMPORT_SNIPPET],
+        check=True, capture_output=True, text=True,
+    ).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def measure_ready_ms(timeout: float = 30.0) -> float:
+    """Start uvicorn and return the time until GET / answers 200."""
+    port = _free_port()
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+    )
+    try:
+        with httpx.Client(timeout=1) as client:
+            while time.perf_counter() - started < timeout:
+                if server.poll() is not None:
+                    raise RuntimeError(f"uvicorn exited with code {server.returncode}")
+                try:
+                    if client.get(f"http://127.0.0.1:{port}/").status_code == 200:
+                        return (time.perf_counter() - started) * 1000
+                except httpx.HTTPError:
+                    pass
+                time.sleep(0.01)
+        raise RuntimeError(f"uvicorn not ready after {timeout:.0f}s")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main(runs: int = 3) -> int:
+    import_ms = statistics.median(measure_import_ms() for _ in range(runs))
+    ready_ms = statistics.median(measure_ready_ms() for _ in range(runs))
+    result = {
+        "import_ms": round(import_ms, 1),
+        "import_budget_ms": IMPORT_BUDGET_MS,
+        "ready_ms": round(ready_ms, 1),
+        "ready_budget_ms": READY_BUDGET_MS,
+    }
+    result["ok"] = import_ms <= IMPORT_BUDGET_MS and ready_ms <= READY_BUDGET_MS
+    print(json.dumps(result))
+    return 0 if result["ok"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(int(sys.argv[1]) if len(sys.argv) > 1 else 3))
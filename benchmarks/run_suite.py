@@ -0,0 +1,319 @@
+"""
+End-to-end performance suite: a stub upstream, a throwaway PostgreSQL and the
+app under uvicorn, driven by a concurrent load generator.
+
+Run with: python -m benchmarks.run_suite [--out results.json] [--baseline baseline.json]
+
+Records ingest rows/sec, p50/p95/p99 latency and RPS of the report
+endpoints, auth-path overhead and the server's peak RSS, and writes them as
+JSON. With --baseline, every metric is compared to the stored run and the
+exit status is 1 if any regressed by more than --threshold (a fraction).
+
+The database is a fresh `bench_*` database created on BENCH_ADMIN_DATABASE_URL
+(any database on a server where the user may CREATE DATABASE), dropped
+afterwards. Without it, a temporary cluster is started with initdb/pg_ctl
+from PATH or $PGBIN.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from urllib.parse import urlsplit, urlunsplit
+
+import httpx
+import psycopg2
+
+from benchmarks import stub_upstream
+from benchmarks.bench_startup import _free_port
+
+# metric name suffix -> True if higher is better
+_HIGHER_IS_BETTER = {"rows_per_sec": True, "rps": True}
+
+
+# =================== THROWAWAY POSTGRES ===================
+class ThrowawayPostgres:
+    """Context manager yielding the URL of an empty database that is removed on exit."""
+
+    def __init__(self, admin_url: str = None):
+        self.admin_url = admin_url
+        self._dbname = None
+        self._datadir = None
+        self._pg_ctl = None
+
+    def __enter__(self) -> str:
+        if self.admin_url:
+            self._dbname = f"bench_{uuid.uuid4().hex[:12]}"
+            self._admin("CREATE DATABASE {}")
+            parts = urlsplit(self.admin_url)
+            return urlunsplit(parts._replace(path="/" + self._dbname))
+        return self._start_cluster()
+
+    def __exit__(self, *exc):
+        if self._dbname:
+            self._admin("DROP DATABASE IF EXISTS {}")
+        if self._datadir:
+            subprocess.run([self._pg_ctl, "stop", "-D", self._datadir, "-m", "fast"],
+                           capture_output=True)
+            shutil.rmtree(self._datadir, ignore_errors=True)
+
+    def _admin(self, statement: str):
+        conn = psycopg2.connect(self.admin_url)
+        conn.autocommit = True
+        try:
+            conn.cursor().execute(statement.format(self._dbname))
+        finally:
+            conn.close()
+
+    def _start_cluster(self) -> str:
+        bindir = os.getenv("PGBIN")
+        initdb = os.path.join(bindir, "initdb") if bindir else shutil.which("initdb")
+        self._pg_ctl = os.path.join(bindir, "pg_ctl") if bindir else shutil.which("pg_ctl")
+        if not initdb or not self._pg_ctl:
+            sys.exit("Set BENCH_ADMIN_DATABASE_URL or put initdb/pg_ctl on PATH (or in $PGBIN)")
+        self._datadir = tempfile.mkdtemp(prefix="bench_pg_")
+        subprocess.run([initdb, "-D", self._datadir, "-U", "postgres", "-A", "trust"],
+                       check=True, capture_output=True)
+        options = f"-k {self._datadir} -c listen_addresses='' -F"
+        subprocess.run([self._pg_ctl, "start", "-w", "-D", self._datadir, "-o", options,
+                        "-l", os.path.join(self._datadir, "log")], check=True, capture_output=True)
+        return f"postgresql://postgres@/postgres?host={self._datadir}"
+
+
+# =================== APP SERVER ===================
+class AppServer:
+    """The app under uvicorn in a subprocess, pointed at `database_url`."""
+
+    def __init__(self, database_url: str, workers: int = 1):
+        self.port = _free_port()
+        self.base_url = f"http://127.0.0.1:{self.port}"
+        env = dict(os.environ, DATABASE_URL=database_url, RUN_MIGRATIONS_ON_STARTUP="true")
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--port", str(self.port),
+             "--workers", str(workers), "--log-level", "warning"],
+            env=env,
+        )
+
+    def wait_ready(self, timeout: float = 60.0):
+        started = time.perf_counter()
+        with httpx.Client(timeout=1) as client:
+            while time.perf_counter() - started < timeout:
+                if self.process.poll() is not None:
+                    raise RuntimeError(f"uvicorn exited with code {self.process.returncode}")
+                try:
+                    if client.get(self.base_url + "/").status_code == 200:
+                        return
+                except httpx.HTTPError:
+                    pass
+                time.sleep(0.05)
+        raise RuntimeError(f"uvicorn not ready after {timeout:.0f}s")
+
+    def peak_rss_mb(self):
+        """Peak resident set size (VmHWM) of the server process; None off Linux."""
+        try:
+            with open(f"/proc/{self.process.pid}/status") as status:
+                for line in status:
+                    if line.startswith("VmHWM:"):
+                        return round(int(line.split()[1]) / 1024, 1)
+        except OSError:
+            return None
+
+    def stop(self):
+        self.process.terminate()
+        self.process.wait()
+
+
+# =================== LOAD GENERATOR ===================
+async def load(base_url: str, path: str, concurrency: int, duration: float, headers=None) -> dict:
+    """Hit `path` from `concurrency` workers for `duration` seconds; latency percentiles and RPS."""
+    latencies = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, headers=headers, limits=limits, timeout=30) as client:
+        async def worker():
+            nonlocal errors
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                response = await client.get(path)
+                latencies.append((time.perf_counter() - started) * 1000)
+                if response.status_code >= 400:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    return {"requests": len(latencies), "errors": errors, **_summary(latencies, elapsed)}
+
+
+def _summary(latencies, elapsed: float) -> dict:
+    if not latencies:
+        return {"p50_ms": None, "p95_ms": None, "p99_ms": None, "rps": 0.0}
+    cuts = statistics.quantiles(latencies, n=100, method="inclusive")
+    return {
+        "p50_ms": round(statistics.median(latencies), 3),
+        "p95_ms": round(cuts[94], 3),
+        "p99_ms": round(cuts[98], 3),
+        "rps": round(len(latencies) / elapsed, 1),
+    }
+
+
+# =================== SUITE ===================
+def wait_for_job(client: httpx.Client, job_id: int, headers, timeout: float = 300.0) -> dict:
+    """Poll an ingest job until it completes; raises if it fails or times out."""
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        job = client.get(f"/ingest/jobs/{job_id}", headers=headers).json()
+        if job["status"] == "complete":
+            return job
+        if job["status"] == "failed":
+            raise RuntimeError(f"Ingest job {job_id} failed: {job['error']}")
+        time.sleep(0.02)
+    raise RuntimeError(f"Ingest job {job_id} not finished after {timeout:.0f}s")
+
+
+def run(args) -> dict:
+    upstream = stub_upstream.start()
+    upstream_url = f"http://127.0.0.1:{upstream.server_address[1]}/coins?per_page={args.per_page}"
+    results = {"ingest": {}, "reports": {}, "auth": {}}
+
+    with ThrowawayPostgres(os.getenv("BENCH_ADMIN_DATABASE_URL")) as database_url:
+        server = AppServer(database_url, workers=args.workers)
+        try:
+            server.wait_ready()
+            with httpx.Client(base_url=server.base_url, timeout=120) as client:
+                credentials = {"email": "bench@example.com", "password": "bench-password"}
+                client.post("/auth/signup", json=credentials).raise_for_status()
+                login_ms = []
+                for _ in range(5):
+                    started = time.perf_counter()
+                    response = client.post("/auth/login", json=credentials)
+                    login_ms.append((time.perf_counter() - started) * 1000)
+                    response.raise_for_status()
+                headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+                # Ingest: each run moves prices so every batch is a realistic write;
+                # timed from enqueue until the job completes
+                rows_per_sec = []
+                for seed in range(args.ingest_runs):
+                    started = time.perf_counter()
+                    response = client.post("/ingest", headers=headers, json={
+                        "url": f"{upstream_url}&seed={seed}",
+                        "pages": args.pages,
+                    })
+                    response.raise_for_status()
+                    job = wait_for_job(client, response.json()["job_id"], headers)
+                    rows = job["result"]["records_ingested"]
+                    rows_per_sec.append(rows / (time.perf_counter() - started))
+                results["ingest"] = {
+                    "rows": args.pages * args.per_page,
+                    "rows_per_sec": round(statistics.median(rows_per_sec), 1),
+                }
+
+            endpoints = {
+                "latest": "/report/latest?limit=50",
+                "coin": "/report/coin/coin-1",
+                "coin_interval": "/report/coin/coin-1?interval=1h",
+                "rollup": "/report/coin/coin-1/rollup?resolution=1h",
+            }
+            for name, path in endpoints.items():
+                results["reports"][name] = asyncio.run(
+                    load(server.base_url, path, args.concurrency, args.duration)
+                )
+
+            # Auth path: the same cheap authenticated request with and without a token
+            probe = "/export/coin/no-such-coin"
+            authed = asyncio.run(load(server.base_url, probe, args.concurrency, args.duration, headers))
+            anonymous = asyncio.run(load(server.base_url, probe, args.concurrency, args.duration))
+            results["auth"] = {
+                "login_p50_ms": round(statistics.median(login_ms), 3),
+                "authed_p50_ms": authed["p50_ms"],
+                "rejected_p50_ms": anonymous["p50_ms"],
+                "overhead_p50_ms": round(authed["p50_ms"] - anonymous["p50_ms"], 3),
+            }
+            results["server"] = {"peak_rss_mb": server.peak_rss_mb()}
+        finally:
+            server.stop()
+            upstream.shutdown()
+
+    return {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "config": vars(args),
+        },
+        "metrics": _flatten(results),
+    }
+
+
+def _flatten(results: dict) -> dict:
+    flat = {}
+    for group, metrics in results.items():
+        for name, value in metrics.items():
+            if isinstance(value, dict):
+                for key, inner in value.items():
+                    flat[f"{group}.{name}.{key}"] = inner
+            else:
+                flat[f"{group}.{name}"] = value
+    return flat
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> list:
+    """Metrics that got worse than `baseline` by more than `threshold` (a fraction)."""
+    regressions = []
+    for name, old in baseline.get("metrics", {}).items():
+        new = current["metrics"].get(name)
+        if not isinstance(old, (int, float)) or not isinstance(new, (int, float)) or old <= 0:
+            continue
+        if name.endswith((".requests", ".errors", ".rows")) or name == "auth.overhead_p50_ms":
+            continue  # counts and a difference of two measured metrics
+        higher_is_better = _HIGHER_IS_BETTER.get(name.rsplit(".", 1)[-1], False)
+        change = (new - old) / old
+        if (-change if higher_is_better else change) > threshold:
+            regressions.append({"metric": name, "baseline": old, "current": new,
+                                "change_pct": round(change * 100, 1)})
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--out", default="benchmark-results.json")
+    parser.add_argument("--baseline", help="stored results to compare against")
+    parser.add_argument("--threshold", type=float, default=0.15,
+                        help="allowed regression per metric, as a fraction (default 0.15)")
+    parser.add_argument("--per-page", type=int, default=1000)
+    parser.add_argument("--pages", type=int, default=5)
+    parser.add_argument("--ingest-runs", type=int, default=3)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds per endpoint")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    args = parser.parse_args(argv)
+
+    result = run(args)
+    with open(args.out, "w") as out:
+        json.dump(result, out, indent=2)
+    print(json.dumps(result["metrics"], indent=2))
+
+    if args.baseline:
+        with open(args.baseline) as stored:
+            regressions = compare(result, json.load(stored), args.threshold)
+        for regression in regressions:
+            print("REGRESSION {metric}: {baseline} -> {current} ({change_pct:+}%)".format(**regression))
+        if regressions:
+            return 1
+        print(f"No metric regressed by more than {args.threshold:.0%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,144 @@
+"""
+Stub market-data upstream serving synthetic CoinGecko-style market payloads.
+
+Run with: python -m benchmarks.stub_upstream [port] [quota]
+With a quota (requests/s), requests beyond it are refused with 429 and a
+Retry-After, like a rate-limited market API. Any path answers GET with a JSON list of market objects. Query parameters:
+  per_page  records per page (default 100)
+  page      page number; coin ids continue across pages
+  seed      price seed; vary it between ingests to move prices (ids stay fixed)
+  changed   fraction of coins whose prices follow `seed` (default 1.0); the
+            rest keep seed-0 prices, to exercise change-only ingest
+  etag      1 (default) sends an ETag and answers a matching If-None-Match
+            with 304; 0 omits it, leaving only the content hash to match
+  status    answer with this status and no body instead (e.g. 503, an
+            upstream that is down)
+"""
+import hashlib
+import json
+import math
+import random
+import sys
+import threading
+import time
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+@lru_cache(maxsize=64)
+def payload(per_page: int, page: int = 1, seed: int = 0, changed: float = 1.0) -> bytes:
+    """Encoded page of `per_page` synthetic market objects."""
+    records = []
+    first = (page - 1) * per_page
+    for k in range(first, first + per_page):
+        moved = random.Random(k).random() < changed
+        rnd = random.Random(k * 1_000_003 + (seed if moved else 0))
+        price = rnd.uniform(0.01, 50_000)
+        supply = random.Random(k).uniform(1e6, 1e10)
+        records.append({
+            "id": f"coin-{k}",
+            "symbol": f"c{k}",
+            "name": f"Coin {k}",
+            "current_price": price,
+            "market_cap": price * supply,
+            "total_volume": price * supply * rnd.uniform(0.01, 0.2),
+            "price_change_24h": price * rnd.uniform(-0.1, 0.1),
+            "price_change_percentage_24h": rnd.uniform(-10, 10),
+            "high_24h": price * 1.05,
+            "low_24h": price * 0.95,
+            "circulating_supply": supply,
+            "max_supply": None if k % 3 else supply * 2,
+            "ath": price * 2,
+            "ath_change_percentage": -50.0,
+        })
+    return json.dumps(records).encode()
+
+
+class Quota:
+    """Token bucket enforced by the stub: `rate` requests/s, bursts of `burst`."""
+
+    def __init__(self, rate: float, burst: int = None):
+        self.rate = rate
+        self.burst = burst or max(1, int(rate))
+        self.served = 0
+        self.rejected = 0
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def admit(self) -> float:
+        """0 if the request is within quota, else the seconds until it would be."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                self.served += 1
+                return 0.0
+            self.rejected += 1
+            return (1 - self._tokens) / self.rate
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        quota = getattr(self.server, "quota", None)
+        wait = quota.admit() if quota is not None else 0.0
+        if wait:
+            self.send_response(429)
+            self.send_header("Retry-After", str(math.ceil(wait)))
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        query = parse_qs(urlparse(self.path).query)
+
+        def param(name, default, cast=int):
+            return cast(query.get(name, [default])[0])
+
+        status = param("status", 200)
+        if status != 200:
+            self.send_response(status)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        body = payload(
+            param("per_page", 100), param("page", 1), param("seed", 0), param("changed", 1.0, float)
+        )
+        # Validators, like a CDN in front of a real market API; etag=0 turns them off
+        etag = f'"{hashlib.sha1(body).hexdigest()}"' if param("etag", 1) else None
+        if etag is not None and self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        if etag is not None:
+            self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start(port: int = 0, host: str = "127.0.0.1", quota: Quota = None) -> ThreadingHTTPServer:
+    """Serve in a daemon thread; the bound port is `server.server_address[1]`."""
+    server = ThreadingHTTPServer((host, port), _Handler)
+    server.daemon_threads = True
+    server.quota = quota
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    server = ThreadingHTTPServer(("127.0.0.1", int(sys.argv[1]) if len(sys.argv) > 1 else 8900), _Handler)
+    server.quota = Quota(float(sys.argv[2])) if len(sys.argv) > 2 else None
+    print(f"Stub upstream on http://127.0.0.1:{server.server_address[1]}/coins")
+    server.serve_forever()
@@ -52,16 +52,27 @@ function Home() {
     setLoading(true);
 
     try {
-      await axios.post(
+      const headers = { Authorization: `Bearer ${token}` };
+      const { data } = await axios.post(
         "https://data-drive-d7kc.onrender.com/ingest",
         { url },
-        {
-          headers: {
-            Authorization: `Bearer ${token}`,
-          },
-        }
+        { headers }
       );
 
+      // Ingest runs as a background job: wait for it to finish
+      let job = { status: data.status };
+      while (job.status === "queued" || job.status === "running") {
+        await new Promise((resolve) => setTimeout(resolve, 1000));
+        ({ data: job } = await axios.get(
+          `https://data-drive-d7kc.onrender.com/ingest/jobs/${data.job_id}`,
+          { headers }
+        ));
+      }
+      if (job.status === "failed") {
+        alert(job.error || "Backend error while ingesting data");
+        return;
+      }
+
       window.open(
         "https://scraper-project-data07drive.streamlit.app/",
         "_blank"
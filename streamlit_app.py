@@ -1,5 +1,6 @@
 import streamlit as st
 import pandas as pd
+import pyarrow as pa
 import requests
 import plotly.express as px
 
@@ -56,23 +57,69 @@ def format_big_number(num):
         return f"${num/1e6:.2f}M"
     return f"${num:,.0f}"
 
+def format_number(num, spec):
+    try:
+        return format(float(num), spec)
+    except Exception:
+        return "N/A"
+
+def loaded_analytics(frame):
+    """Overview and concentration of rows already loaded, shaped like the analytics API's."""
+    caps = frame["market_cap"]
+    change = frame["price_change_pct_24h"]
+    weighted = caps.notna() & change.notna()
+    weight = caps[weighted].sum()
+    shares = caps[caps > 0].sort_values(ascending=False)
+    shares = shares / shares.sum()
+    hhi = float((shares ** 2).sum()) if len(shares) else None
+    overview = {
+        "total_market_cap": caps.sum(),
+        "average_price": frame["current_price"].mean(),
+        "top_asset": {"name": frame.iloc[0]["name"]} if len(frame) else None,
+        "average_change_pct_24h": change.mean(),
+        "weighted_change_pct_24h": (change[weighted] * caps[weighted]).sum() / weight if weight else None,
+        "advancers": int((change > 0).sum()),
+        "decliners": int((change < 0).sum()),
+    }
+    concentration = {
+        "hhi_points": hhi * 10_000 if hhi else None,
+        "effective_coins": 1 / hhi if hhi else None,
+        "top_shares": {"5": shares.head(5).sum() if len(shares) else None},
+    }
+    return overview, concentration
+
+def read_arrow(response):
+    """DataFrame from an Arrow IPC response; columns arrive already typed."""
+    return pa.ipc.open_stream(response.content).read_pandas()
+
 # ================= LOAD DATA =================
 @st.cache_data(ttl=60)
 def load_latest():
-    r = requests.get(f"{API_BASE_URL}/report/latest?limit=50", timeout=15)
+    r = requests.get(
+        f"{API_BASE_URL}/report/latest",
+        params={"limit": 50, "format": "arrow"},
+        timeout=15,
+    )
     r.raise_for_status()
-    df = pd.DataFrame(r.json())
-
-    # enforce numeric columns
-    numeric_cols = [
-        "current_price", "market_cap", "total_volume",
-        "price_change_pct_24h", "high_24h", "low_24h"
-    ]
-    for col in numeric_cols:
-        if col in df.columns:
-            df[col] = pd.to_numeric(df[col], errors="coerce")
+    return read_arrow(r)
 
-    return df
+@st.cache_data(ttl=60)
+def load_analytics(endpoint, **params):
+    """Server-computed analytics, cached there per ingest batch."""
+    r = requests.get(f"{API_BASE_URL}/analytics/{endpoint}", params=params, timeout=15)
+    r.raise_for_status()
+    return r.json()
+
+@st.cache_data(ttl=300)
+def load_history(coin_id, resolution, days):
+    start = (pd.Timestamp.now(tz="UTC") - pd.Timedelta(days=days)).isoformat()
+    r = requests.get(
+        f"{API_BASE_URL}/report/coin/{coin_id}/rollup",
+        params={"resolution": resolution, "from": start, "format": "arrow"},
+        timeout=15,
+    )
+    r.raise_for_status()
+    return read_arrow(r)
 
 try:
     df = load_latest()
@@ -95,6 +142,9 @@ metric = st.sidebar.selectbox(
     ["market_cap", "current_price", "total_volume", "price_change_pct_24h"]
 )
 
+history_days = st.sidebar.slider("History (days)", 1, 90, 30)
+history_resolution = st.sidebar.radio("History resolution", ["1h", "1d"], horizontal=True)
+
 show_raw = st.sidebar.checkbox("Show raw table")
 
 # ================= FILTER =================
@@ -108,15 +158,43 @@ if search:
 
 df_top = df.head(top_n).copy()
 
+# Overview, concentration and movers of the top 50 coins: one small request,
+# computed once per ingest on the server
+try:
+    summary = load_analytics("summary", universe=50, n=top_n)
+except Exception:
+    st.error("❌ Failed to load analytics from backend API")
+    st.stop()
+
+overview = summary["overview"]
+concentration = summary["concentration"]
+if search:
+    # The server's figures cover the whole top 50; a search narrows them to its matches
+    overview, concentration = loaded_analytics(df)
+
 # ================= HEADER =================
 st.markdown("## 📌 Market Overview")
 
 c1, c2, c3, c4 = st.columns(4)
 
-c1.metric("Total Market Cap", format_big_number(df["market_cap"].sum()))
-c2.metric("Average Price", f"${df['current_price'].mean():,.2f}")
-c3.metric("Top Asset", df.iloc[0]["name"])
-c4.metric("Avg 24h Change", f"{df['price_change_pct_24h'].mean():.2f}%")
+c1.metric("Total Market Cap", format_big_number(overview["total_market_cap"]))
+c2.metric("Average Price", "$" + format_number(overview["average_price"], ",.2f"))
+c3.metric("Top Asset", overview["top_asset"]["name"] if overview["top_asset"] else "N/A")
+c4.metric("Avg 24h Change", format_number(overview["average_change_pct_24h"], ".2f") + "%")
+
+c5, c6, c7, c8 = st.columns(4)
+
+c5.metric("Cap-Weighted 24h Change", format_number(overview["weighted_change_pct_24h"], ".2f") + "%")
+c6.metric("Advancers / Decliners", f"{overview['advancers']} / {overview['decliners']}")
+c7.metric("Market Cap HHI", format_number(concentration["hhi_points"], ",.0f"))
+c8.metric("Top 5 Share", format_number(concentration["top_shares"].get("5"), ".1%"))
+
+st.markdown(f"""
+<div class="insight">
+• HHI runs from 10,000 (one asset holds all market cap) down to 10,000 / N when all N are equal.<br>
+• The market cap is spread like {format_number(concentration['effective_coins'], '.1f')} equal-sized assets.
+</div>
+""", unsafe_allow_html=True)
 
 st.divider()
 
@@ -147,6 +225,30 @@ st.markdown("""
 </div>
 """, unsafe_allow_html=True)
 
+# ================= TOP MOVERS =================
+st.markdown("## 🏁 Top Movers")
+
+m1, m2 = st.columns(2)
+
+for column, title, key, colour in (
+    (m1, "Gainers", "gainers", "#9bff00"),
+    (m2, "Losers", "losers", "#ff4d4d"),
+):
+    movers = pd.DataFrame(summary["movers"][key])
+    column.markdown(f"### {title}")
+    if movers.empty:
+        column.info("No movers")
+        continue
+    movers_fig = px.bar(movers, x="price_change_pct_24h", y="name", orientation="h")
+    movers_fig.update_traces(marker_color=colour)
+    movers_fig.update_layout(
+        plot_bgcolor="#000000",
+        paper_bgcolor="#000000",
+        font_color="white",
+        yaxis={"autorange": "reversed"},
+    )
+    column.plotly_chart(movers_fig, use_container_width=True)
+
 # ================= PIE =================
 st.markdown("## 🧩 Metric Share (Top Assets)")
 
@@ -202,14 +304,23 @@ st.markdown("""
 # ================= VOLATILITY =================
 st.markdown("## ⚠️ Intraday Volatility")
 
-df_top["volatility"] = df_top["high_24h"] - df_top["low_24h"]
+# The top N coins (of the search's matches, if any) ranked by absolute 24h high-low range
+if search:
+    volatility = df_top.assign(range=df_top["high_24h"] - df_top["low_24h"]).sort_values("range", ascending=False)
+else:
+    try:
+        volatility = pd.DataFrame(load_analytics("volatility", universe=top_n, n=top_n, by="range"))
+    except Exception:
+        st.error("❌ Failed to load volatility from backend API")
+        st.stop()
 
 vol_fig = px.bar(
-    df_top.sort_values("volatility", ascending=False),
+    volatility,
     x="name",
-    y="volatility",
-    color="volatility",
+    y="range",
+    color="range",
     color_continuous_scale="Oranges",
+    labels={"range": "24h high-low range"},
 )
 
 vol_fig.update_layout(
@@ -227,6 +338,88 @@ st.markdown("""
 </div>
 """, unsafe_allow_html=True)
 
+# ================= PRICE HISTORY =================
+st.markdown("## 📈 Price History")
+
+history_coin = st.selectbox(
+    "Asset",
+    df_top["coin_id"].tolist(),
+    format_func=lambda coin_id: df_top.loc[df_top["coin_id"] == coin_id, "name"].iloc[0],
+)
+
+try:
+    hist = load_history(history_coin, history_resolution, history_days)
+except Exception:
+    hist = pd.DataFrame()
+    st.warning("Price history is unavailable right now")
+
+if not hist.empty:
+    hist_fig = px.line(hist, x="timestamp", y="close")
+    hist_fig.update_traces(line_color="#9bff00")
+    hist_fig.update_layout(
+        plot_bgcolor="#000000",
+        paper_bgcolor="#000000",
+        font_color="white",
+    )
+    st.plotly_chart(hist_fig, use_container_width=True)
+
+    st.markdown("""
+<div class="insight">
+• Served from hourly and daily rollups, so long ranges load as fast as short ones.<br>
+• Each point is the closing price of its bucket.
+</div>
+""", unsafe_allow_html=True)
+
+# ================= CROSS-ASSET RETURNS =================
+st.markdown("## 🔗 Rolling Returns & Correlation")
+
+window = 24 if history_resolution == "1h" else 7
+
+try:
+    returns = load_analytics(
+        "returns", top=min(top_n, 10), resolution=history_resolution, days=history_days, window=window
+    )
+    corr = load_analytics("correlation", top=min(top_n, 10), resolution=history_resolution, days=history_days)
+except Exception:
+    returns = corr = None
+    st.warning("Return analytics are unavailable right now")
+
+if returns and returns["coins"]:
+    names = dict(zip(df["coin_id"], df["name"]))
+    returns_df = pd.DataFrame(returns["returns"], index=pd.to_datetime(returns["timestamps"]))
+    returns_df = returns_df.rename(columns=names) * 100
+
+    ret_fig = px.line(returns_df, labels={"value": f"{window}-bucket return (%)", "index": "", "variable": ""})
+    ret_fig.update_layout(
+        plot_bgcolor="#000000",
+        paper_bgcolor="#000000",
+        font_color="white",
+    )
+    st.plotly_chart(ret_fig, use_container_width=True)
+
+    corr_labels = [names.get(coin, coin) for coin in corr["coins"]]
+    corr_fig = px.imshow(
+        corr["matrix"],
+        x=corr_labels,
+        y=corr_labels,
+        zmin=-1,
+        zmax=1,
+        color_continuous_scale=["#ff4d4d", "#000000", "#9bff00"],
+    )
+    corr_fig.update_layout(
+        plot_bgcolor="#000000",
+        paper_bgcolor="#000000",
+        font_color="white",
+    )
+    st.plotly_chart(corr_fig, use_container_width=True)
+
+    st.markdown("""
+<div class="insight">
+• Rolling returns compound each asset's closes over the trailing window of rollup buckets.<br>
+• Highly correlated assets offer little diversification against each other.
+</div>
+""", unsafe_allow_html=True)
+
 # ================= RAW =================
 if show_raw:
     st.markdown("## 📄 Raw Data")
@@ -0,0 +1,48 @@
+"""
+Report cache: every encoding of a report is its own representation, with its
+own strong ETag, and any of them revalidates.
+"""
+from starlette.requests import Request
+
+from app.services.cache import cached_report, report_cache
+
+REPORT = [{"coin_id": f"coin-{k}", "price": k * 1.5} for k in range(500)]
+
+
+def _request(**headers):
+    return Request({
+        "type": "http",
+        "method": "GET",
+        "path": "/report",
+        "headers": [(name.replace("_", "-").encode(), value.encode()) for name, value in headers.items()],
+    })
+
+
+def _serve(**headers):
+    return cached_report(_request(**headers), "test_report", (), lambda: REPORT)
+
+
+def test_each_encoding_has_its_own_etag():
+    # Pins the current batch without a database
+    report_cache.invalidate(1)
+    identity = _serve()
+    gzip = _serve(accept_encoding="gzip")
+
+    assert gzip.headers["content-encoding"] == "gzip"
+    assert "content-encoding" not in identity.headers
+    assert identity.headers["etag"] != gzip.headers["etag"]
+    assert not gzip.headers["etag"].startswith("W/")
+
+
+def test_any_encodings_etag_revalidates():
+    report_cache.invalidate(1)
+    gzip_etag = _serve(accept_encoding="gzip").headers["etag"]
+    identity_etag = _serve().headers["etag"]
+
+    not_modified = _serve(accept_encoding="gzip", if_none_match=gzip_etag)
+    assert not_modified.status_code == 304
+    assert not_modified.headers["etag"] == gzip_etag
+    assert _serve(if_none_match=identity_etag).status_code == 304
+
+    report_cache.invalidate(2)
+    assert _serve(accept_encoding="gzip", if_none_match=gzip_etag).status_code == 200
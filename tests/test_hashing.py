@@ -0,0 +1,42 @@
+"""
+Hashing executor: a caller that gives up does not free its slot while its
+hash is still running, so the queue bound holds.
+"""
+import asyncio
+import threading
+
+import pytest
+from fastapi import HTTPException
+
+from app.services.hashing import HashingExecutor
+
+
+def test_cancelled_caller_keeps_its_slot_until_the_hash_ends():
+    executor = HashingExecutor(workers=1, max_queue=0)
+    release = threading.Event()
+
+    async def run():
+        caller = asyncio.ensure_future(executor.run(release.wait))
+        await asyncio.sleep(0.05)
+        caller.cancel()
+        await asyncio.gather(caller, return_exceptions=True)
+
+        # The hash is still running, so the pool is still full
+        assert executor.stats()["in_flight"] == 1
+        with pytest.raises(HTTPException) as rejected:
+            await executor.run(release.wait)
+        assert rejected.value.status_code == 503
+
+        release.set()
+        for _ in range(100):
+            if executor.stats()["completed"] == 1:
+                break
+            await asyncio.sleep(0.01)
+        return executor.stats()
+
+    try:
+        stats = asyncio.run(run())
+    finally:
+        release.set()
+        executor.shutdown()
+    assert (stats["in_flight"], stats["completed"]) == (0, 1)
@@ -0,0 +1,40 @@
+"""
+Job runner: a worker survives database errors while recording a job's outcome.
+"""
+import asyncio
+
+import psycopg2
+
+from app.services import jobs
+
+
+def test_worker_survives_failure_to_record_outcome(monkeypatch):
+    queue = [{"id": n, "source_url": f"http://upstream/{n}", "pages": 1, "page_param": "page",
+              "stream": False, "delta": False} for n in (1, 2)]
+    finished = []
+
+    def finish_job(job_id, result):
+        if job_id == 1:
+            raise psycopg2.OperationalError("server closed the connection unexpectedly")
+        finished.append(job_id)
+
+    async def ingest(url, **kwargs):
+        return {"status": "success"}
+
+    monkeypatch.setattr(jobs, "claim_job", lambda: queue.pop(0) if queue else None)
+    monkeypatch.setattr(jobs, "ingest", ingest)
+    monkeypatch.setattr(jobs, "finish_job", finish_job)
+
+    async def run():
+        runner = jobs.JobRunner(workers=1, poll_interval=0.01)
+        runner.start()
+        for _ in range(200):
+            if finished:
+                break
+            await asyncio.sleep(0.01)
+        alive = not runner._tasks[0].done()
+        await runner.stop()
+        return alive
+
+    assert asyncio.run(run())
+    assert finished == [2]
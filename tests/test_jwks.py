@@ -0,0 +1,42 @@
+"""
+JWKS cache file: only a private, regular file is trusted.
+"""
+import json
+import os
+
+from app.services.jwks import JWKSCache
+
+JWKS = {"keys": [{"kid": "k1", "kty": "RSA", "n": "abc", "e": "AQAB"}]}
+
+
+def _cache_file(tmp_path, mode):
+    path = tmp_path / "jwks.json"
+    path.write_text(json.dumps(JWKS))
+    os.chmod(path, mode)
+    return path
+
+
+def test_private_cache_file_is_loaded(tmp_path):
+    cache = JWKSCache(url=None, cache_path=str(_cache_file(tmp_path, 0o600)))
+    assert cache.load_cached()
+    assert cache.get_key("k1") == JWKS["keys"][0]
+
+
+def test_writable_by_others_is_refused(tmp_path):
+    for mode in (0o666, 0o620):
+        cache = JWKSCache(url=None, cache_path=str(_cache_file(tmp_path, mode)))
+        assert not cache.load_cached()
+        assert cache.get_key("k1") is None
+
+
+def test_symlink_is_refused(tmp_path):
+    link = tmp_path / "link.json"
+    link.symlink_to(_cache_file(tmp_path, 0o600))
+    assert not JWKSCache(url=None, cache_path=str(link)).load_cached()
+
+
+def test_no_cache_path_by_default():
+    cache = JWKSCache(url=None, cache_path=None)
+    assert not cache.load_cached()
+    # No tenant: an unknown kid is not fetched from anywhere
+    assert cache.get_key("k1") is None
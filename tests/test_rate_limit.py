@@ -0,0 +1,92 @@
+"""
+Upstream rate limiter against the stub upstream: pacing settles under a
+quota without losing requests, and the retry budget bounds retries when
+the upstream is down.
+"""
+import asyncio
+
+import httpx
+
+from app.services.rate_limit import RateLimitedTransport, RetryBudget, UpstreamLimiter
+from benchmarks import stub_upstream
+
+FETCHERS = 8
+QUOTA = 40.0
+
+
+class _Counting(httpx.AsyncBaseTransport):
+    """Counts the requests that actually reach the upstream."""
+
+    def __init__(self):
+        self.sent = 0
+        self._transport = httpx.AsyncHTTPTransport()
+
+    async def handle_async_request(self, request):
+        self.sent += 1
+        return await self._transport.handle_async_request(request)
+
+    async def aclose(self):
+        await self._transport.aclose()
+
+
+async def _fetch_all(client, url: str, requests: int) -> list:
+    """Status of each of `requests` GETs, from FETCHERS concurrent fetchers."""
+    pending = list(range(requests))
+    statuses = []
+
+    async def fetcher():
+        while pending:
+            pending.pop()
+            statuses.append((await client.get(url)).status_code)
+
+    await asyncio.gather(*(fetcher() for _ in range(FETCHERS)))
+    return statuses
+
+
+def test_pacing_settles_under_quota():
+    server = stub_upstream.start(quota=stub_upstream.Quota(QUOTA))
+    url = f"http://127.0.0.1:{server.server_address[1]}/coins?per_page=10&etag=0"
+    # Starts well above the quota, so AIMD has to find it
+    limiter = UpstreamLimiter(ceiling=QUOTA * 2.5, burst=10, increase=0.1, budget=RetryBudget())
+
+    async def run():
+        transport = RateLimitedTransport(httpx.AsyncHTTPTransport(), limiter)
+        async with httpx.AsyncClient(transport=transport, timeout=30) as client:
+            warmup = await _fetch_all(client, url, 200)
+            rejected = server.quota.rejected
+            settled = await _fetch_all(client, url, 200)
+            return warmup, settled, server.quota.rejected - rejected
+
+    try:
+        warmup, settled, rejected_settled = asyncio.run(run())
+    finally:
+        server.shutdown()
+
+    # Every request completes: throttled ones were retried
+    assert warmup.count(200) == 200 and settled.count(200) == 200
+    assert limiter.host("127.0.0.1").rate < QUOTA * 2.5
+    # Once settled, only the occasional additive-increase probe is refused
+    assert rejected_settled <= 3
+
+
+def test_retry_budget_caps_retries_when_upstream_is_down():
+    server = stub_upstream.start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/coins?status=503"
+    budget = RetryBudget(ratio=0.1, min_per_sec=0)
+    limiter = UpstreamLimiter(ceiling=0, max_retries=4, base_delay=0.001, max_delay=0.01, budget=budget)
+    upstream = _Counting()
+
+    async def run():
+        async with httpx.AsyncClient(transport=RateLimitedTransport(upstream, limiter), timeout=30) as client:
+            return await _fetch_all(client, url, 100)
+
+    try:
+        statuses = asyncio.run(run())
+    finally:
+        server.shutdown()
+
+    # The upstream's own status comes back once retries are denied
+    assert statuses == [503] * 100
+    retries = upstream.sent - 100
+    # 0.1 retry per request plus the budget's starting capacity of 1, not 4 per request
+    assert 0 < retries <= 100 * 0.1 + 1
@@ -0,0 +1,49 @@
+"""
+Slow-query log: slow statements are all recorded, but only report queries
+are re-run under EXPLAIN ANALYZE.
+"""
+from app.services.slow_queries import SlowQueryLog
+
+LOCKS = [
+    "SELECT pg_advisory_lock(%s)",
+    "SELECT pg_advisory_xact_lock(%s)",
+    "/* ingest_lock */ SELECT pg_advisory_xact_lock(%s)",
+    "/* claim_job */ SELECT id FROM ingest_jobs WHERE status = 'queued' FOR UPDATE SKIP LOCKED",
+    "/* next_seq */ SELECT nextval('ingest_batch_seq')",
+]
+
+
+class _Explainer:
+    def __init__(self):
+        self.submitted = []
+
+    def submit(self, fn, entry, sql, params):
+        self.submitted.append(sql)
+
+
+def _log():
+    log = SlowQueryLog(threshold_ms=1, sample=1.0)
+    log._explainer = _Explainer()
+    return log
+
+
+def test_lock_statements_are_recorded_but_never_explained():
+    log = _log()
+    for sql in LOCKS:
+        log.record(sql, (72170417,), 0.5, 1)
+    assert [entry["sql"] for entry in reversed(log.entries())] == LOCKS
+    assert log._explainer.submitted == []
+
+
+def test_untagged_select_is_not_explained():
+    log = _log()
+    log.record("SELECT count(*) FROM market_snapshots", None, 0.5, 1)
+    assert len(log.entries()) == 1
+    assert log._explainer.submitted == []
+
+
+def test_report_query_is_explained():
+    log = _log()
+    sql = "/* report_latest */ SELECT * FROM market_snapshots WHERE batch_id = %s"
+    log.record(sql, (1,), 0.5, 10)
+    assert log._explainer.submitted == [sql]